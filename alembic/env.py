@@ -1 +1,91 @@
- 
\ No newline at end of file
+"""Alembic environment; the database URL comes from the application settings.
+
+    alembic upgrade head
+    alembic -x tenant=north upgrade head       # a branch database from TENANT_DATABASE_URLS
+    alembic -x lock_budget=60 upgrade head     # accept longer write locks this once
+    alembic -x allow_unestimated=true upgrade head   # run revisions the lock check cannot render
+
+Online upgrades first estimate the write-blocking lock time of every pending
+revision and stop when one exceeds MIGRATION_LOCK_BUDGET_SECONDS (see
+app.db.migrations). Each revision runs in its own transaction, so
+CONCURRENTLY index builds and batched backfills can commit on their own.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.core.config import settings
+from app.db import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.db.migrations import check_lock_budget, pending_revisions, prepare_connection
+from app.db.session import Base
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+arguments = context.get_x_argument(as_dictionary=True)
+
+
+def database_url() -> str:
+    tenant = arguments.get("tenant")
+    if tenant is None:
+        return settings.DATABASE_URL
+    if tenant not in settings.TENANT_DATABASE_URLS:
+        raise ValueError(f"Unknown tenant: {tenant}")
+    return settings.TENANT_DATABASE_URLS[tenant]
+
+
+def upgrading() -> bool:
+    """Whether the command is an upgrade; stamp, current and downgrade have nothing to estimate."""
+    command = getattr(config.cmd_opts, "cmd", None)
+    if command is not None:
+        return command[0].__name__ == "upgrade"
+    # Called through alembic.command: only commands that move the database have a destination
+    try:
+        context.get_revision_argument()
+    except KeyError:
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    engine = create_engine(database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        prepare_connection(connection)
+        if upgrading():
+            budget = arguments.get("lock_budget")
+            check_lock_budget(
+                connection,
+                pending_revisions(context.script, connection, context.get_revision_argument()),
+                float(budget) if budget is not None else None,
+                arguments.get("allow_unestimated", "").lower() in ("1", "true", "yes")
+            )
+            # End the check's transaction so every revision gets its own
+            connection.commit()
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
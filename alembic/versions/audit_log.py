@@ -0,0 +1,36 @@
+"""audit log
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'audit_log',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('changes', sa.JSON(), nullable=True),
+        sa.Column('actor', sa.String(), nullable=True),
+        sa.Column('route', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_log_entity_entity_id_id', 'audit_log', ['entity', 'entity_id', 'id'], unique=False)
+    op.create_index(op.f('ix_audit_log_actor'), 'audit_log', ['actor'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_audit_log_actor'), table_name='audit_log')
+    op.drop_index('ix_audit_log_entity_entity_id_id', table_name='audit_log')
+    op.drop_table('audit_log')
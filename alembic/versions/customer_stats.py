@@ -0,0 +1,64 @@
+"""customer stats
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 18:00:00.000000
+
+Adds the per-customer aggregates behind the customer history, filled from
+the existing services, and the index the history pages by. Instances still
+running the previous release do not update the aggregates; once none is
+left, rebuild them with ``python -m app.db.customer_stats``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('customer_id', 'visit_count', 'lifetime_spend', 'first_visit', 'last_visit', 'updated_at')
+
+def _bookings() -> sa.Subquery:
+    """Non-deleted live and archived services."""
+    return sa.union_all(*[
+        sa.select(t.c.customer_id, t.c.total_price, t.c.start_time).where(t.c.deleted_at.is_(None))
+        for t in (
+            sa.table(table, sa.column('customer_id'), sa.column('total_price'), sa.column('start_time'),
+                     sa.column('deleted_at'))
+            for table in ('services', 'services_archive')
+        )
+    ]).subquery()
+
+def upgrade() -> None:
+    create_index_concurrently('ix_services_customer_id_start_time', 'services', ['customer_id', 'start_time'])
+    stats = op.create_table(
+        'customer_stats',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('visit_count', sa.Integer(), nullable=False),
+        sa.Column('lifetime_spend', sa.Float(), nullable=False),
+        sa.Column('first_visit', sa.DateTime(), nullable=True),
+        sa.Column('last_visit', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('customer_id')
+    )
+    bookings = _bookings()
+    op.execute(sa.insert(stats).from_select(
+        list(COLUMNS),
+        sa.select(
+            bookings.c.customer_id,
+            sa.func.count(),
+            sa.func.coalesce(sa.func.sum(bookings.c.total_price), 0.0),
+            sa.func.min(bookings.c.start_time),
+            sa.func.max(bookings.c.start_time),
+            sa.func.current_timestamp(),
+        ).where(bookings.c.customer_id.is_not(None)).group_by(bookings.c.customer_id)
+    ))
+
+def downgrade() -> None:
+    op.drop_table('customer_stats')
+    op.drop_index('ix_services_customer_id_start_time', table_name='services')
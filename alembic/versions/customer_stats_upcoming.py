@@ -0,0 +1,73 @@
+"""customer stats upcoming bookings
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19 20:00:00.000000
+
+Counts upcoming bookings apart from visits in the customer aggregates, and
+adds the index the roll-over job finds the rows whose next visit has started
+by. The aggregates are then rebuilt from the services; instances still
+running the previous release count upcoming bookings as visits, so once none
+is left, rebuild them again with ``python -m app.db.customer_stats``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    'customer_id', 'visit_count', 'lifetime_spend', 'first_visit', 'last_visit', 'upcoming_count', 'next_visit',
+    'updated_at',
+)
+
+def _bookings() -> sa.Subquery:
+    """Non-deleted live and archived services."""
+    return sa.union_all(*[
+        sa.select(t.c.customer_id, t.c.total_price, t.c.start_time).where(t.c.deleted_at.is_(None))
+        for t in (
+            sa.table(table, sa.column('customer_id'), sa.column('total_price'), sa.column('start_time'),
+                     sa.column('deleted_at'))
+            for table in ('services', 'services_archive')
+        )
+    ]).subquery()
+
+def _utcnow() -> sa.sql.ColumnElement:
+    """The current time as the naive UTC the application stores."""
+    if op.get_context().dialect.name == 'postgresql':
+        return sa.func.timezone('utc', sa.func.now())
+    return sa.func.current_timestamp()
+
+def upgrade() -> None:
+    op.add_column('customer_stats', sa.Column('upcoming_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('customer_stats', sa.Column('next_visit', sa.DateTime(), nullable=True))
+    create_index_concurrently('ix_customer_stats_next_visit', 'customer_stats', ['next_visit'])
+    stats = sa.table('customer_stats', *[sa.column(name) for name in COLUMNS])
+    bookings = _bookings()
+    now = _utcnow()
+    started = bookings.c.start_time < now
+    upcoming = bookings.c.start_time >= now
+    op.execute(sa.delete(stats))
+    op.execute(sa.insert(stats).from_select(
+        list(COLUMNS),
+        sa.select(
+            bookings.c.customer_id,
+            sa.func.count(sa.case((started, 1))),
+            sa.func.coalesce(sa.func.sum(sa.case((started, bookings.c.total_price))), 0.0),
+            sa.func.min(sa.case((started, bookings.c.start_time))),
+            sa.func.max(sa.case((started, bookings.c.start_time))),
+            sa.func.count(sa.case((upcoming, 1))),
+            sa.func.min(sa.case((upcoming, bookings.c.start_time))),
+            now,
+        ).where(bookings.c.customer_id.is_not(None)).group_by(bookings.c.customer_id)
+    ))
+
+def downgrade() -> None:
+    op.drop_index('ix_customer_stats_next_visit', table_name='customer_stats')
+    op.drop_column('customer_stats', 'next_visit')
+    op.drop_column('customer_stats', 'upcoming_count')
@@ -0,0 +1,26 @@
+"""indexes for the today dashboard
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_services_start_date'), 'services', ['start_date'], unique=False)
+    op.create_index(op.f('ix_services_end_date'), 'services', ['end_date'], unique=False)
+    op.create_index('ix_tasks_is_completed_due_date', 'tasks', ['is_completed', 'due_date'], unique=False)
+    op.create_index('ix_notifications_user_id_is_read', 'notifications', ['user_id', 'is_read'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_user_id_is_read', table_name='notifications')
+    op.drop_index('ix_tasks_is_completed_due_date', table_name='tasks')
+    op.drop_index(op.f('ix_services_end_date'), table_name='services')
+    op.drop_index(op.f('ix_services_start_date'), table_name='services')
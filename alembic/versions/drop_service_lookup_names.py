@@ -0,0 +1,73 @@
+"""drop service type and staff names
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 17:30:00.000000
+
+Apply once no instance of the release before 010 is running: rows those
+instances wrote after 010's backfill are filled in first, then the string
+columns are dropped.
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import backfill, backfills
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('services', 'services_archive', 'service_series')
+
+service_types = sa.table('service_types', sa.column('id'), sa.column('name'), sa.column('created_at'))
+users = sa.table('users', sa.column('id'), sa.column('email'), sa.column('full_name'))
+
+def _missing(t: sa.Table) -> sa.ColumnElement:
+    return sa.or_(
+        sa.and_(t.c.service_type_id.is_(None), t.c.service_type.is_not(None)),
+        sa.and_(t.c.handled_by_id.is_(None), t.c.handled_by.is_not(None)),
+    )
+
+def _ids(t: sa.Table) -> dict:
+    return {
+        'service_type_id': sa.func.coalesce(
+            t.c.service_type_id,
+            sa.select(service_types.c.id).where(service_types.c.name == t.c.service_type).scalar_subquery()
+        ),
+        'handled_by_id': sa.func.coalesce(
+            t.c.handled_by_id,
+            sa.select(sa.func.min(users.c.id))
+            .where(sa.or_(users.c.email == t.c.handled_by, users.c.full_name == t.c.handled_by))
+            .scalar_subquery()
+        ),
+    }
+
+def upgrade() -> None:
+    for table in TABLES:
+        names = sa.table(table, sa.column('service_type'))
+        op.execute(sa.insert(service_types).from_select(
+            ['name', 'created_at'],
+            sa.select(names.c.service_type, sa.func.current_timestamp()).distinct().where(
+                names.c.service_type.is_not(None),
+                names.c.service_type.not_in(sa.select(service_types.c.name))
+            )
+        ))
+        filled = backfill(f'011_{table}_lookup_ids', table, values=_ids, where=_missing)
+        if filled:
+            logger.info("Filled the lookup ids of %s %s rows written during the rollout", filled, table)
+    for table in TABLES:
+        op.drop_column(table, 'handled_by')
+        op.drop_column(table, 'service_type')
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('service_type', sa.String(), nullable=True))
+        op.add_column(table, sa.Column('handled_by', sa.String(), nullable=True))
+    op.execute(sa.delete(backfills).where(backfills.c.name.in_([f'011_{table}_lookup_ids' for table in TABLES])))
+    # 010's downgrade fills them in from the ids
@@ -0,0 +1,62 @@
+"""drop task template service type names
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19 21:30:00.000000
+
+Apply once no instance of the release before 014 is running: templates those
+instances created after 014's backfill are filled in first, then the name
+column is dropped. On SQLite 014 dropped it already.
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import backfill, backfills
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger(__name__)
+
+service_types = sa.table('service_types', sa.column('id'), sa.column('name'), sa.column('created_at'))
+templates = sa.table('task_templates', sa.column('service_type'))
+
+def _ids(t: sa.Table) -> dict:
+    return {
+        'service_type_id': sa.select(service_types.c.id)
+            .where(service_types.c.name == t.c.service_type).scalar_subquery(),
+    }
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        return
+    op.execute(sa.insert(service_types).from_select(
+        ['name', 'created_at'],
+        sa.select(templates.c.service_type, sa.func.current_timestamp()).distinct().where(
+            templates.c.service_type.is_not(None),
+            templates.c.service_type.not_in(sa.select(service_types.c.name))
+        )
+    ))
+    filled = backfill(
+        '015_task_templates_service_type_id', 'task_templates', values=_ids,
+        where=lambda t: sa.and_(t.c.service_type_id.is_(None), t.c.service_type.is_not(None))
+    )
+    if filled:
+        logger.info("Filled the service type ids of %s task templates created during the rollout", filled)
+    op.alter_column('task_templates', 'service_type_id', existing_type=sa.SmallInteger(), nullable=False)
+    op.drop_index(op.f('ix_task_templates_service_type'), table_name='task_templates')
+    op.drop_column('task_templates', 'service_type')
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        return
+    op.add_column('task_templates', sa.Column('service_type', sa.String(), nullable=True))
+    op.create_index(op.f('ix_task_templates_service_type'), 'task_templates', ['service_type'], unique=False)
+    op.alter_column('task_templates', 'service_type_id', existing_type=sa.SmallInteger(), nullable=True)
+    op.execute(sa.delete(backfills).where(backfills.c.name == '015_task_templates_service_type_id'))
+    # 014's downgrade fills them in from the ids
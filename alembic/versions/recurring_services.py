@@ -0,0 +1,62 @@
+"""recurring services
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import add_foreign_key
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'service_series',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=True),
+        sa.Column('service_provider_id', sa.Integer(), nullable=True),
+        sa.Column('service_type', sa.String(), nullable=True),
+        sa.Column('rrule', sa.String(), nullable=False),
+        sa.Column('start_date', sa.DateTime(), nullable=True),
+        sa.Column('end_date', sa.DateTime(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=True),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('total_price', sa.Float(), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('handled_by', sa.String(), nullable=True),
+        sa.Column('materialized_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+        sa.ForeignKeyConstraint(['service_provider_id'], ['service_providers.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_service_series_id'), 'service_series', ['id'], unique=False)
+    op.create_index(op.f('ix_service_series_materialized_until'), 'service_series', ['materialized_until'], unique=False)
+    op.create_index(op.f('ix_service_series_deleted_at'), 'service_series', ['deleted_at'], unique=False)
+
+    op.add_column('services', sa.Column('series_id', sa.Integer(), nullable=True))
+    add_foreign_key('fk_services_series_id', 'services', 'service_series', ['series_id'], ['id'])
+    op.add_column('services_archive', sa.Column('series_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_services_series_id'), 'services', ['series_id'], unique=False)
+    op.create_index('ux_services_series_id_start_time', 'services', ['series_id', 'start_time'], unique=True)
+    op.create_index('ix_services_provider_id_start_time', 'services', ['service_provider_id', 'start_time'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_services_provider_id_start_time', table_name='services')
+    op.drop_index('ux_services_series_id_start_time', table_name='services')
+    op.drop_index(op.f('ix_services_series_id'), table_name='services')
+    op.drop_column('services_archive', 'series_id')
+    op.drop_column('services', 'series_id')
+    op.drop_index(op.f('ix_service_series_deleted_at'), table_name='service_series')
+    op.drop_index(op.f('ix_service_series_materialized_until'), table_name='service_series')
+    op.drop_index(op.f('ix_service_series_id'), table_name='service_series')
+    op.drop_table('service_series')
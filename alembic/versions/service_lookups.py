@@ -0,0 +1,149 @@
+"""service type and staff lookups
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 17:00:00.000000
+
+Services name their type and staff member by id instead of repeating the
+strings. This revision adds and backfills the id columns and keeps the old
+string columns, nullable, for instances still running the previous release;
+011 drops them once every instance writes ids.
+"""
+import secrets
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.security import get_password_hash
+from app.db.migrations import add_foreign_key, backfill, backfills, create_index_concurrently
+from app.db.models import UserRole
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+# Tables whose rows name a service type and a staff member
+TABLES = ('services', 'services_archive', 'service_series')
+
+service_types = sa.table('service_types', sa.column('id'), sa.column('name'), sa.column('created_at'))
+users = sa.table(
+    'users',
+    sa.column('id'), sa.column('email'), sa.column('full_name'), sa.column('hashed_password'),
+    sa.column('role', sa.Enum(UserRole)), sa.column('is_active'), sa.column('created_at'), sa.column('updated_at')
+)
+
+def _named(column: str) -> sa.Select:
+    """Distinct non-null values of ``column`` across TABLES."""
+    names = sa.union(*[
+        sa.select(sa.table(table, sa.column(column)).c[column].label('name')) for table in TABLES
+    ]).subquery()
+    return sa.select(names.c.name).where(names.c.name.is_not(None))
+
+def _ids(t: sa.Table) -> dict:
+    return {
+        'service_type_id': sa.select(service_types.c.id)
+            .where(service_types.c.name == t.c.service_type).scalar_subquery(),
+        # The first user whose email or full name matches, as app.db.models.staff resolves it
+        'handled_by_id': sa.select(sa.func.min(users.c.id))
+            .where(sa.or_(users.c.email == t.c.handled_by, users.c.full_name == t.c.handled_by))
+            .scalar_subquery(),
+    }
+
+def _names(t: sa.Table) -> dict:
+    return {
+        'service_type': sa.select(service_types.c.name)
+            .where(service_types.c.id == t.c.service_type_id).scalar_subquery(),
+        'handled_by': sa.select(sa.func.coalesce(users.c.full_name, users.c.email))
+            .where(users.c.id == t.c.handled_by_id).scalar_subquery(),
+    }
+
+def _add_placeholder_staff() -> None:
+    # handled_by was free text; names that match no user become inactive
+    # users that cannot sign in, so no service loses its staff member
+    bind = op.get_bind()
+    known = sa.union(
+        sa.select(users.c.email).where(users.c.email.is_not(None)),
+        sa.select(users.c.full_name).where(users.c.full_name.is_not(None))
+    ).subquery()
+    names = _named('handled_by').subquery()
+    unmatched = bind.execute(
+        sa.select(names.c.name).where(names.c.name.not_in(sa.select(known.c[0]))).order_by(names.c.name)
+    ).scalars().all()
+    if unmatched:
+        now = sa.func.current_timestamp()
+        bind.execute(sa.insert(users).values(created_at=now, updated_at=now), [
+            {
+                'email': f'staff-{secrets.token_hex(8)}@placeholder.invalid',
+                'full_name': name,
+                'hashed_password': get_password_hash(secrets.token_urlsafe(32)),
+                'role': UserRole.STAFF,
+                'is_active': False,
+            }
+            for name in unmatched
+        ])
+
+def _expand() -> None:
+    op.create_table(
+        'service_types',
+        sa.Column('id', sa.SmallInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    for table in TABLES:
+        op.add_column(table, sa.Column('service_type_id', sa.SmallInteger(), nullable=True))
+        op.add_column(table, sa.Column('handled_by_id', sa.Integer(), nullable=True))
+    # The new release writes only the ids. SQLite databases come from
+    # create_all, whose columns are nullable already, and cannot alter them
+    if op.get_context().dialect.name != 'sqlite':
+        op.alter_column('services', 'service_type', existing_type=sa.String(), nullable=True)
+        op.alter_column('services', 'handled_by', existing_type=sa.String(), nullable=True)
+
+    op.execute(sa.insert(service_types).from_select(
+        ['name', 'created_at'],
+        _named('service_type').add_columns(sa.func.current_timestamp())
+    ))
+    if not op.get_context().as_sql:
+        _add_placeholder_staff()
+
+def upgrade() -> None:
+    # Everything up to the first backfill commits as one, so a rerun after an
+    # interrupted backfill skips it and resumes the backfill
+    if op.get_context().as_sql or not sa.inspect(op.get_bind()).has_table('service_types'):
+        _expand()
+    for table in TABLES:
+        backfill(f'010_{table}_lookup_ids', table, values=_ids)
+    add_foreign_key('fk_services_service_type_id', 'services', 'service_types', ['service_type_id'], ['id'])
+    add_foreign_key('fk_services_handled_by_id', 'services', 'users', ['handled_by_id'], ['id'])
+    add_foreign_key('fk_service_series_service_type_id', 'service_series', 'service_types', ['service_type_id'], ['id'])
+    add_foreign_key('fk_service_series_handled_by_id', 'service_series', 'users', ['handled_by_id'], ['id'])
+    create_index_concurrently(op.f('ix_services_service_type_id'), 'services', ['service_type_id'])
+    create_index_concurrently(op.f('ix_services_handled_by_id'), 'services', ['handled_by_id'])
+
+def downgrade() -> None:
+    # Rows written by the new release only have ids
+    for table in TABLES:
+        backfill(
+            f'010_{table}_lookup_names', table, values=_names,
+            where=lambda t: sa.or_(t.c.service_type.is_(None), t.c.handled_by.is_(None))
+        )
+    op.execute(sa.delete(backfills).where(
+        backfills.c.name.in_([f'010_{table}_{kind}' for table in TABLES for kind in ('lookup_ids', 'lookup_names')])
+    ))
+    if op.get_context().dialect.name != 'sqlite':
+        op.alter_column('services', 'handled_by', existing_type=sa.String(), nullable=False)
+        op.alter_column('services', 'service_type', existing_type=sa.String(), nullable=False)
+    op.drop_index(op.f('ix_services_handled_by_id'), table_name='services')
+    op.drop_index(op.f('ix_services_service_type_id'), table_name='services')
+    if op.get_context().dialect.name != 'sqlite':
+        op.drop_constraint('fk_service_series_handled_by_id', 'service_series', type_='foreignkey')
+        op.drop_constraint('fk_service_series_service_type_id', 'service_series', type_='foreignkey')
+        op.drop_constraint('fk_services_handled_by_id', 'services', type_='foreignkey')
+        op.drop_constraint('fk_services_service_type_id', 'services', type_='foreignkey')
+    for table in TABLES:
+        op.drop_column(table, 'handled_by_id')
+        op.drop_column(table, 'service_type_id')
+    op.drop_table('service_types')
@@ -0,0 +1,80 @@
+"""soft delete and archive tables
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    for table in ('services', 'tasks', 'notifications'):
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.create_index(op.f(f'ix_{table}_deleted_at'), table, ['deleted_at'], unique=False)
+
+    op.create_table(
+        'services_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=True),
+        sa.Column('service_provider_id', sa.Integer(), nullable=True),
+        sa.Column('service_type', sa.String(), nullable=True),
+        sa.Column('start_date', sa.DateTime(), nullable=True),
+        sa.Column('end_date', sa.DateTime(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=True),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('total_price', sa.Float(), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('handled_by', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_services_archive_customer_id', 'services_archive', ['customer_id'], unique=False)
+    op.create_index('ix_services_archive_start_date', 'services_archive', ['start_date'], unique=False)
+
+    op.create_table(
+        'tasks_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('is_completed', sa.Boolean(), nullable=True),
+        sa.Column('due_date', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tasks_archive_service_id', 'tasks_archive', ['service_id'], unique=False)
+
+    op.create_table(
+        'notifications_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('is_read', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notifications_archive_user_id', 'notifications_archive', ['user_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_table('notifications_archive')
+    op.drop_table('tasks_archive')
+    op.drop_table('services_archive')
+    for table in ('notifications', 'tasks', 'services'):
+        op.drop_index(op.f(f'ix_{table}_deleted_at'), table_name=table)
+        op.drop_column(table, 'deleted_at')
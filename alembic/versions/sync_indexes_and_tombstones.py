@@ -0,0 +1,35 @@
+"""updated_at indexes and tombstones for delta sync
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    for table in ('customers', 'services', 'tasks'):
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+    op.create_table(
+        'tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tombstones_id'), 'tombstones', ['id'], unique=False)
+    op.create_index(op.f('ix_tombstones_deleted_at'), 'tombstones', ['deleted_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_table('tombstones')
+    for table in ('tasks', 'services', 'customers'):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
@@ -0,0 +1,82 @@
+"""task template service type ids
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19 21:00:00.000000
+
+Task templates name their service type by id, as services do. This revision
+adds and backfills the id column and keeps the name column, nullable, for
+instances still running the previous release; 015 drops it once every
+instance writes ids. SQLite databases are served by a single process and
+cannot make the column nullable, so there the name column is dropped here.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import add_foreign_key, backfill, backfills, create_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+service_types = sa.table('service_types', sa.column('id'), sa.column('name'), sa.column('created_at'))
+templates = sa.table('task_templates', sa.column('service_type'))
+
+def _ids(t: sa.Table) -> dict:
+    return {
+        'service_type_id': sa.select(service_types.c.id)
+            .where(service_types.c.name == t.c.service_type).scalar_subquery(),
+    }
+
+def _names(t: sa.Table) -> dict:
+    return {
+        'service_type': sa.select(service_types.c.name)
+            .where(service_types.c.id == t.c.service_type_id).scalar_subquery(),
+    }
+
+def _expand() -> None:
+    op.add_column('task_templates', sa.Column('service_type_id', sa.SmallInteger(), nullable=True))
+    if op.get_context().dialect.name != 'sqlite':
+        op.alter_column('task_templates', 'service_type', existing_type=sa.String(), nullable=True)
+    op.execute(sa.insert(service_types).from_select(
+        ['name', 'created_at'],
+        sa.select(templates.c.service_type, sa.func.current_timestamp()).distinct().where(
+            templates.c.service_type.not_in(sa.select(service_types.c.name))
+        )
+    ))
+
+def upgrade() -> None:
+    # Everything up to the backfill commits as one, so a rerun after an
+    # interrupted backfill skips it and resumes the backfill
+    if op.get_context().as_sql or not any(
+        column['name'] == 'service_type_id' for column in sa.inspect(op.get_bind()).get_columns('task_templates')
+    ):
+        _expand()
+    backfill('014_task_templates_service_type_id', 'task_templates', values=_ids)
+    add_foreign_key(
+        'fk_task_templates_service_type_id', 'task_templates', 'service_types', ['service_type_id'], ['id']
+    )
+    create_index_concurrently(op.f('ix_task_templates_service_type_id'), 'task_templates', ['service_type_id'])
+    if op.get_context().dialect.name == 'sqlite':
+        op.drop_index(op.f('ix_task_templates_service_type'), table_name='task_templates')
+        op.drop_column('task_templates', 'service_type')
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        op.add_column('task_templates', sa.Column('service_type', sa.String(), nullable=True))
+        op.create_index(op.f('ix_task_templates_service_type'), 'task_templates', ['service_type'], unique=False)
+    # Templates created by the new release only have ids
+    backfill(
+        '014_task_templates_service_type_names', 'task_templates', values=_names,
+        where=lambda t: t.c.service_type.is_(None)
+    )
+    op.execute(sa.delete(backfills).where(backfills.c.name.in_([
+        '014_task_templates_service_type_id', '014_task_templates_service_type_names'
+    ])))
+    if op.get_context().dialect.name != 'sqlite':
+        op.alter_column('task_templates', 'service_type', existing_type=sa.String(), nullable=False)
+        op.drop_constraint('fk_task_templates_service_type_id', 'task_templates', type_='foreignkey')
+    op.drop_index(op.f('ix_task_templates_service_type_id'), table_name='task_templates')
+    op.drop_column('task_templates', 'service_type_id')
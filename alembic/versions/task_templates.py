@@ -0,0 +1,47 @@
+"""task templates
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import add_foreign_key
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'task_templates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_type', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('anchor', sa.Enum('START', 'END', name='taskanchor'), nullable=False),
+        sa.Column('offset_minutes', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_task_templates_id'), 'task_templates', ['id'], unique=False)
+    op.create_index(op.f('ix_task_templates_service_type'), 'task_templates', ['service_type'], unique=False)
+
+    op.add_column('tasks', sa.Column('template_id', sa.Integer(), nullable=True))
+    add_foreign_key('fk_tasks_template_id', 'tasks', 'task_templates', ['template_id'], ['id'])
+    op.add_column('tasks_archive', sa.Column('template_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_tasks_service_id'), 'tasks', ['service_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tasks_service_id'), table_name='tasks')
+    op.drop_column('tasks_archive', 'template_id')
+    op.drop_column('tasks', 'template_id')
+    op.drop_index(op.f('ix_task_templates_service_type'), table_name='task_templates')
+    op.drop_index(op.f('ix_task_templates_id'), table_name='task_templates')
+    op.drop_table('task_templates')
+    sa.Enum(name='taskanchor').drop(op.get_bind(), checkfirst=True)
@@ -1,11 +1,22 @@
-from fastapi import APIRouter
-from app.api.api_v1.endpoints import auth, users, customers, services, tasks, notifications
+from fastapi import APIRouter, Depends
+from app.api.api_v1.endpoints import auth, users, customers, services, tasks, notifications, metrics, diagnostics, sync, dashboard, jobs, task_templates, audit, reports, batch, providers
+from app.core.throttling import rate_limit
 
-api_router = APIRouter()
+api_router = APIRouter(dependencies=[Depends(rate_limit)])
 
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(customers.router, prefix="/customers", tags=["customers"])
 api_router.include_router(services.router, prefix="/services", tags=["services"])
+api_router.include_router(providers.router, prefix="/providers", tags=["providers"])
 api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
-api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"]) 
\ No newline at end of file
+api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"]) 
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+api_router.include_router(diagnostics.router, prefix="/diagnostics", tags=["diagnostics"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(task_templates.router, prefix="/task-templates", tags=["task templates"])
+api_router.include_router(audit.router, prefix="/audit", tags=["audit"])
+api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
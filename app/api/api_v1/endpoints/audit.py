@@ -0,0 +1,38 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.db.session import get_read_db
+from app.db.models import User, UserRole, AuditLog
+from app.schemas.models import AuditEntry
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/", response_model=List[AuditEntry])
+def read_audit_log(
+    *,
+    db: Session = Depends(get_read_db),
+    entity: str,
+    entity_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Retrieve audit entries for an entity type or one row, newest first.
+
+    Pass the last id of a page as before_id to get the next one. Entries
+    are written in the background and can lag writes by about a second.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    query = db.query(AuditLog).filter(AuditLog.entity == entity)
+    if entity_id is not None:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if before_id is not None:
+        query = query.filter(AuditLog.id < before_id)
+    return query.order_by(AuditLog.id.desc()).limit(min(limit, 1000)).all()
@@ -6,18 +6,24 @@ from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 
 from app.core.config import settings
+from app.core.context import batch_user, current_tenant
 from app.core.security import create_access_token, verify_password
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.db.models import User
+from app.db.repository import get_user_by_email
 from app.schemas.models import User as UserSchema
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 def get_current_user(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
+    # Sub-requests of POST /batch reuse the batch's authenticated user
+    user = batch_user.get()
+    if user is not None:
+        return user
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -31,7 +37,7 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = get_user_by_email(db, email)
     if user is None:
         raise credentials_exception
     return user
@@ -42,7 +48,7 @@ def login(
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     # Try to find user by email first, then by username
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = get_user_by_email(db, form_data.username)
     if not user:
         user = db.query(User).filter(User.username == form_data.username).first()
     
@@ -54,8 +60,13 @@ def login(
         )
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = {"sub": user.email}
+    # Users of a branch log in with X-Tenant; later requests are routed by the claim
+    tenant = current_tenant.get()
+    if tenant is not None:
+        claims["tenant"] = tenant
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=claims, expires_delta=access_token_expires
     )
     return {
         "access_token": access_token,
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.context import batch_session, batch_user
+from app.db.session import get_db
+from app.db.models import User
+from app.schemas.models import BatchItem, BatchRequest, BatchResponse
+from app.api.api_v1.endpoints.auth import get_current_user
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+
+async def dispatch(request: Request, item: BatchItem) -> dict:
+    """Run one sub-request through the app in-process and capture its response.
+
+    It passes through the app's middleware like any other request, so it
+    counts towards load shedding and gets its own request context.
+    """
+    method = item.method.upper()
+    if method not in METHODS or not item.path.startswith("/") or item.path.startswith("/batch"):
+        return {"id": item.id, "status": status.HTTP_400_BAD_REQUEST, "body": {"detail": "Invalid sub-request"}}
+
+    path, _, query = item.path.partition("?")
+    path = settings.API_V1_STR + path
+    body = b"" if item.body is None else json.dumps(item.body).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": "1.1",
+        "method": method,
+        "scheme": request.url.scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": headers,
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server"),
+    }
+    received = False
+    response = {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "headers": [], "body": []}
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", method, path)
+        return {"id": item.id, "status": status.HTTP_500_INTERNAL_SERVER_ERROR, "body": {"detail": "Internal Server Error"}}
+
+    content = b"".join(response["body"])
+    content_type = dict(response["headers"]).get(b"content-type", b"")
+    if content and content_type.startswith(b"application/json"):
+        result = json.loads(content)
+    else:
+        result = content.decode("utf-8", "replace") or None
+    return {"id": item.id, "status": response["status"], "body": result}
+
+@router.post("/", response_model=BatchResponse)
+async def run_batch(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    batch_in: BatchRequest,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Run several API requests in one round trip and return their responses in order.
+
+    The caller is authenticated once for the whole batch. Consecutive GETs
+    run concurrently; any other request waits for everything before it and
+    runs alone on a session shared by the batch, so later requests see its
+    writes.
+    """
+    items = batch_in.requests
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_MAX_REQUESTS} requests per batch"
+        )
+
+    # Keep the loaded user usable from every sub-request's thread after commits
+    await run_in_threadpool(Session.object_session(current_user).expunge, current_user)
+    user_token = batch_user.set(current_user)
+    session_token = batch_session.set(db)
+    limit = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def read(item: BatchItem) -> dict:
+        # Sessions are not thread-safe, so each concurrent read takes its own
+        batch_session.set(None)
+        async with limit:
+            return await dispatch(request, item)
+
+    async def write(item: BatchItem) -> dict:
+        try:
+            return await dispatch(request, item)
+        finally:
+            # Drop anything a failed request left pending before the next one runs
+            await run_in_threadpool(db.rollback)
+
+    results = []
+    try:
+        start = 0
+        while start < len(items):
+            end = start
+            while end < len(items) and items[end].method.upper() == "GET":
+                end += 1
+            if end > start:
+                results += await asyncio.gather(*(read(item) for item in items[start:end]))
+            else:
+                results.append(await write(items[start]))
+                end = start + 1
+            start = end
+    finally:
+        batch_session.reset(session_token)
+        batch_user.reset(user_token)
+    return {"responses": results}
@@ -1,17 +1,21 @@
-from typing import Any, List
+from datetime import datetime
+from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import or_, select, union_all
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
-from app.db.models import User, Customer
-from app.schemas.models import Customer as CustomerSchema, CustomerCreate
+from app.db.session import get_db, get_read_db
+from app.db.crud import patch_row, with_names
+from app.db.models import User, Customer, CustomerStats, Service, services_archive
+from app.db.repository import get_by_id
+from app.schemas.models import Customer as CustomerSchema, CustomerCreate, CustomerHistory, CustomerUpdate
 from app.api.api_v1.endpoints.auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=List[CustomerSchema])
 def read_customers(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user)
@@ -41,14 +45,14 @@ def create_customer(
 @router.get("/{customer_id}", response_model=CustomerSchema)
 def read_customer(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     customer_id: int,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get customer by ID.
     """
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    customer = get_by_id(db, Customer, customer_id)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -56,6 +60,78 @@ def read_customer(
         )
     return customer
 
+@router.get("/{customer_id}/history", response_model=CustomerHistory)
+def read_customer_history(
+    *,
+    db: Session = Depends(get_read_db),
+    customer_id: int,
+    before_start: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get a customer's bookings, newest first, with their visit count, spend and visit frequency.
+
+    Archived and upcoming bookings are listed, deleted ones are not. The visit
+    count, spend and visit frequency cover the bookings that have started;
+    upcoming ones are counted in upcoming_count. Pass the next_before_start
+    and next_before_id of a page to get the next one.
+    """
+    if before_id is not None and before_start is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="before_id requires before_start"
+        )
+    customer = get_by_id(db, Customer, customer_id)
+    if not customer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found"
+        )
+    limit = min(limit, 1000)
+    # Each table is paged on its own index first, so long histories are not sorted whole
+    pages = []
+    for table in (Service.__table__, services_archive):
+        query = select(*[table.c[c.name] for c in Service.__table__.columns]).where(
+            table.c.customer_id == customer_id,
+            table.c.deleted_at.is_(None)
+        )
+        if before_start is not None:
+            query = query.where(table.c.start_time <= before_start)
+            if before_id is not None:
+                query = query.where(or_(table.c.start_time < before_start, table.c.id < before_id))
+            else:
+                query = query.where(table.c.start_time < before_start)
+        pages.append(select(
+            query.order_by(table.c.start_time.desc(), table.c.id.desc()).limit(limit).subquery()
+        ))
+    rows = union_all(*pages).subquery()
+    bookings = db.execute(
+        select(rows).order_by(rows.c.start_time.desc(), rows.c.id.desc()).limit(limit)
+    ).mappings().all()
+
+    stats = db.get(CustomerStats, customer_id)
+    visits = stats.visit_count if stats else 0
+    history = {
+        "customer_id": customer_id,
+        "visit_count": visits,
+        "lifetime_spend": stats.lifetime_spend if stats else 0.0,
+        "first_visit": stats.first_visit if stats else None,
+        "last_visit": stats.last_visit if stats else None,
+        "upcoming_count": stats.upcoming_count if stats else 0,
+        "next_visit": stats.next_visit if stats else None,
+        "bookings": [with_names(row) for row in bookings],
+    }
+    if visits > 1 and stats.first_visit is not None:
+        history["days_between_visits"] = round(
+            (stats.last_visit - stats.first_visit).total_seconds() / 86400 / (visits - 1), 1
+        )
+    if len(bookings) == limit:
+        history["next_before_start"] = bookings[-1]["start_time"]
+        history["next_before_id"] = bookings[-1]["id"]
+    return history
+
 @router.put("/{customer_id}", response_model=CustomerSchema)
 def update_customer(
     *,
@@ -67,7 +143,7 @@ def update_customer(
     """
     Update customer.
     """
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    customer = get_by_id(db, Customer, customer_id)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -82,6 +158,27 @@ def update_customer(
     db.refresh(customer)
     return customer
 
+@router.patch("/{customer_id}", response_model=CustomerSchema)
+def patch_customer(
+    *,
+    db: Session = Depends(get_db),
+    customer_id: int,
+    customer_in: CustomerUpdate,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Partially update customer, writing only the fields that changed.
+    """
+    customer = patch_row(
+        db, Customer, [Customer.id == customer_id], customer_in.model_dump(exclude_unset=True)
+    )
+    if not customer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found"
+        )
+    return customer
+
 @router.delete("/{customer_id}", response_model=CustomerSchema)
 def delete_customer(
     *,
@@ -92,7 +189,7 @@ def delete_customer(
     """
     Delete customer.
     """
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    customer = get_by_id(db, Customer, customer_id)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
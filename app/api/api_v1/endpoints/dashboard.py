@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from typing import Any
+from fastapi import APIRouter, Depends
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.context import current_tenant
+from app.db.session import get_read_db
+from app.db.models import User, Customer, Service, Task, Notification
+from app.db.crud import with_names
+from app.schemas.models import DashboardToday
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+# Per-user (and tenant) dashboards, dropped whenever a service or task write commits
+dashboard_cache = LRUCache(maxsize=10_000, ttl=settings.DASHBOARD_CACHE_SECONDS)
+WATCHED = (Service, Task)
+
+@event.listens_for(Session, "after_flush")
+def _flag_dashboard_flush(session, flush_context):
+    if any(isinstance(obj, WATCHED) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["dashboard_stale"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_dashboard_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in WATCHED:
+        orm_execute_state.session.info["dashboard_stale"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_dashboards(session):
+    if session.info.pop("dashboard_stale", False):
+        dashboard_cache.clear()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dashboard_flag(session):
+    session.info.pop("dashboard_stale", None)
+
+def bookings(db: Session, column, start: datetime, end: datetime) -> list:
+    rows = db.execute(
+        select(Service, Customer.name)
+        .outerjoin(Customer, Customer.id == Service.customer_id)
+        .where(column >= start, column < end, Service.deleted_at.is_(None))
+        .order_by(Service.start_time)
+    ).all()
+    return [
+        dict(
+            with_names({c.name: getattr(service, c.name) for c in Service.__table__.columns}),
+            customer_name=customer_name
+        )
+        for service, customer_name in rows
+    ]
+
+@router.get("/today", response_model=DashboardToday)
+def read_today(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get today's check-ins, check-outs, overdue tasks, unread count and KPIs in one call.
+    """
+    cache_key = (current_tenant.get(), current_user.id)
+    cached = dashboard_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+
+    check_ins = bookings(db, Service.start_date, today, tomorrow)
+    check_outs = bookings(db, Service.end_date, today, tomorrow)
+    overdue_tasks = db.query(Task).filter(
+        Task.is_completed == False,
+        Task.due_date < now,
+        Task.deleted_at.is_(None)
+    ).order_by(Task.due_date).limit(settings.DASHBOARD_OVERDUE_LIMIT).all()
+
+    live_services = Service.deleted_at.is_(None)
+    open_tasks = (Task.is_completed == False, Task.deleted_at.is_(None))
+    counts = db.execute(select(
+        select(func.count(Notification.id)).where(
+            Notification.user_id == current_user.id,
+            Notification.is_read == False,
+            Notification.deleted_at.is_(None)
+        ).scalar_subquery(),
+        select(func.count(Service.id)).where(
+            Service.start_date <= now, Service.end_date > now, live_services
+        ).scalar_subquery(),
+        select(func.coalesce(func.sum(Service.total_price), 0.0)).where(
+            Service.start_date >= today, Service.start_date < tomorrow, live_services
+        ).scalar_subquery(),
+        select(func.count(Task.id)).where(
+            *open_tasks, Task.due_date >= today, Task.due_date < tomorrow
+        ).scalar_subquery(),
+        select(func.count(Task.id)).where(*open_tasks, Task.due_date < now).scalar_subquery(),
+    )).one()
+    unread, active_stays, revenue_today, tasks_due_today, overdue_count = counts
+
+    result = DashboardToday.model_validate({
+        "date": today,
+        "check_ins": check_ins,
+        "check_outs": check_outs,
+        "overdue_tasks": overdue_tasks,
+        "unread_notifications": unread,
+        "kpis": {
+            "active_stays": active_stays,
+            "check_ins": len(check_ins),
+            "check_outs": len(check_outs),
+            "revenue_today": revenue_today,
+            "tasks_due_today": tasks_due_today,
+            "overdue_tasks": overdue_count,
+        },
+    }, from_attributes=True)
+    dashboard_cache.set(cache_key, result)
+    return result
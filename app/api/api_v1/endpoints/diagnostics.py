@@ -0,0 +1,37 @@
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.db.models import User, UserRole
+from app.db.diagnostics import slow_queries
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/slow-queries", response_model=List[dict])
+def read_slow_queries(
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get slow statements grouped by fingerprint, slowest in total first.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return slow_queries.entries()
+
+@router.delete("/slow-queries", response_model=dict)
+def clear_slow_queries(
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Reset the slow-query log.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    slow_queries.clear()
+    return {"cleared": True}
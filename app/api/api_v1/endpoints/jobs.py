@@ -0,0 +1,55 @@
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db, get_read_db
+from app.db.models import User, UserRole, Job
+from app.db.jobs import enqueue
+from app.db.repository import get_by_id
+from app.schemas.models import Job as JobSchema, JobCreate
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+@router.post("/", response_model=JobSchema, status_code=status.HTTP_202_ACCEPTED)
+def create_job(
+    *,
+    db: Session = Depends(get_db),
+    job_in: JobCreate,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Queue a background job for the job workers.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    try:
+        return enqueue(
+            db, job_in.name, job_in.payload, priority=job_in.priority, created_by=current_user.id
+        )
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+@router.get("/{job_id}", response_model=JobSchema)
+def read_job(
+    *,
+    db: Session = Depends(get_read_db),
+    job_id: int,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get a background job's status, progress and result.
+    """
+    job = get_by_id(db, Job, job_id)
+    if not job or (job.created_by != current_user.id and current_user.role != UserRole.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
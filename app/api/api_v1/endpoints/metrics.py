@@ -0,0 +1,22 @@
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.db.models import User, UserRole
+from app.core.throttling import counters
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/throttling", response_model=dict)
+def read_throttling_counters(
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get counters for rate-limited and shed requests.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return counters.snapshot()
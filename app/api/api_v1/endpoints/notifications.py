@@ -1,26 +1,43 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import DateTime, insert, literal, select
 from sqlalchemy.orm import Session
+from datetime import datetime
 
-from app.db.session import get_db
-from app.db.models import User, Notification
-from app.schemas.models import Notification as NotificationSchema, NotificationCreate
+from app.db.session import get_db, get_read_db
+from app.core.config import settings
+from app.db.models import User, UserRole, Notification
+from app.db.archive import live_and_archived
+from app.db.repository import get_notification, list_unread_notifications
+from app.schemas.models import (
+    Notification as NotificationSchema, NotificationCreate,
+    NotificationBroadcast, NotificationBroadcastResult
+)
 from app.api.api_v1.endpoints.auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=List[NotificationSchema])
 def read_notifications(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Retrieve notifications for the current user.
     """
+    if include_archived:
+        rows = live_and_archived(Notification)
+        return db.execute(
+            select(rows).where(
+                rows.c.user_id == current_user.id
+            ).order_by(rows.c.id).offset(skip).limit(limit)
+        ).mappings().all()
     notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id
+        Notification.user_id == current_user.id,
+        Notification.deleted_at.is_(None)
     ).offset(skip).limit(limit).all()
     return notifications
 
@@ -40,20 +57,88 @@ def create_notification(
     db.refresh(notification)
     return notification
 
+@router.post("/broadcast", response_model=NotificationBroadcastResult)
+def broadcast_notification(
+    *,
+    db: Session = Depends(get_db),
+    broadcast_in: NotificationBroadcast,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Send a notification to every active user with a role, or to a list of users.
+
+    All notifications are written in one transaction, so a failed broadcast
+    sends nothing and can simply be retried.
+    """
+    if (broadcast_in.role is None) == (broadcast_in.user_ids is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide exactly one of role or user_ids"
+        )
+    if broadcast_in.role is not None and broadcast_in.role not in {r.value for r in UserRole}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown role"
+        )
+
+    chunk_size = settings.NOTIFICATION_BROADCAST_CHUNK_SIZE
+    now = datetime.utcnow()
+
+    def insert_for(*criteria) -> int:
+        # INSERT ... SELECT straight from users, so unknown or inactive ids are skipped
+        result = db.execute(
+            insert(Notification).from_select(
+                ["user_id", "title", "message", "is_read", "created_at"],
+                select(
+                    User.id,
+                    literal(broadcast_in.title),
+                    literal(broadcast_in.message),
+                    literal(False),
+                    literal(now, DateTime)
+                ).where(User.is_active == True, *criteria)
+            )
+        )
+        return result.rowcount
+
+    recipients = 0
+    if broadcast_in.user_ids is not None:
+        user_ids = sorted(set(broadcast_in.user_ids))
+        for start in range(0, len(user_ids), chunk_size):
+            recipients += insert_for(User.id.in_(user_ids[start:start + chunk_size]))
+        db.commit()
+        return {"recipients": recipients}
+
+    # Walk the role's users in id ranges of chunk_size, one statement per range
+    role = UserRole(broadcast_in.role)
+    last_id = 0
+    while True:
+        upper = db.execute(
+            select(User.id).where(
+                User.role == role,
+                User.is_active == True,
+                User.id > last_id
+            ).order_by(User.id).offset(chunk_size - 1).limit(1)
+        ).scalar()
+        criteria = [User.role == role, User.id > last_id]
+        if upper is not None:
+            criteria.append(User.id <= upper)
+        recipients += insert_for(*criteria)
+        if upper is None:
+            db.commit()
+            return {"recipients": recipients}
+        last_id = upper
+
 @router.get("/{notification_id}", response_model=NotificationSchema)
 def read_notification(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     notification_id: int,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get notification by ID.
     """
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    notification = get_notification(db, notification_id, current_user.id)
     if not notification:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -71,10 +156,7 @@ def mark_notification_read(
     """
     Mark notification as read.
     """
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    notification = get_notification(db, notification_id, current_user.id)
     if not notification:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -89,16 +171,13 @@ def mark_notification_read(
 
 @router.get("/unread/", response_model=List[NotificationSchema])
 def read_unread_notifications(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get all unread notifications for the current user.
     """
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).all()
+    notifications = list_unread_notifications(db, current_user.id)
     return notifications
 
 @router.delete("/{notification_id}", response_model=NotificationSchema)
@@ -111,16 +190,15 @@ def delete_notification(
     """
     Delete notification.
     """
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    notification = get_notification(db, notification_id, current_user.id)
     if not notification:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Notification not found"
         )
     
-    db.delete(notification)
+    notification.deleted_at = datetime.utcnow()
+    db.add(notification)
     db.commit()
+    db.refresh(notification)
     return notification 
\ No newline at end of file
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.core.context import current_tenant
+from app.db.session import get_read_db
+from app.db.models import User, service_types
+from app.db.provider_load import load_index
+from app.schemas.base import naive_utc
+from app.schemas.models import ProviderSuggestion
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/suggest", response_model=List[ProviderSuggestion])
+def suggest_providers(
+    db: Session = Depends(get_read_db),
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    service_type: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Suggest providers with room for a booking from `start` to `end`, least loaded first.
+
+    Providers are ranked by their most simultaneous bookings in the window,
+    then by minutes booked in the window, then by minutes booked on the
+    window's days. With `service_type`, providers who have served that type
+    before come first; the others are still suggested when they have room.
+    Times with an offset are converted to UTC.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be after start"
+        )
+    index = load_index(current_tenant.get())
+    index.refresh(db)
+    return index.suggest(service_types.id(service_type), start, end, limit)
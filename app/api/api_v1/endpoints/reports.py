@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.context import current_tenant
+from app.db.session import tenant_session
+from app.db.models import User, UserRole, Customer, Service, Task
+from app.schemas.models import TenantReport
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+def tenant_summary(tenant: str, start: datetime, end: datetime) -> dict:
+    """Totals of one branch, read from its own database in a single query."""
+    in_window = [Service.start_date >= start, Service.start_date < end, Service.deleted_at.is_(None)]
+    try:
+        with tenant_session(tenant) as db:
+            row = db.execute(select(
+                select(func.count(Customer.id)).scalar_subquery(),
+                select(func.count(Service.id)).where(*in_window).scalar_subquery(),
+                select(func.coalesce(func.sum(Service.total_price), 0.0)).where(*in_window).scalar_subquery(),
+                select(func.count(Task.id)).where(
+                    Task.is_completed == False,
+                    Task.deleted_at.is_(None)
+                ).scalar_subquery(),
+            )).one()
+    except Exception as exc:
+        return {"tenant": tenant, "error": str(exc)}
+    customers, bookings, revenue, open_tasks = row
+    return {
+        "tenant": tenant,
+        "customers": customers,
+        "bookings": bookings,
+        "revenue": float(revenue),
+        "open_tasks": open_tasks,
+    }
+
+@router.get("/tenants", response_model=TenantReport)
+def read_tenant_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get customer, booking, revenue and open task totals for every branch.
+
+    Branches are queried in parallel, each on its own database. Defaults to
+    bookings starting in the last 30 days.
+    """
+    # Only administrators of the default database can see across branches
+    if current_user.role != UserRole.ADMIN or current_tenant.get() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    tenants = sorted(settings.TENANT_DATABASE_URLS)
+    summaries = []
+    if tenants:
+        workers = min(len(tenants), settings.TENANT_REPORT_CONCURRENCY)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            summaries = list(pool.map(lambda tenant: tenant_summary(tenant, start, end), tenants))
+    totals = {
+        "tenant": "all",
+        "customers": sum(s.get("customers", 0) for s in summaries),
+        "bookings": sum(s.get("bookings", 0) for s in summaries),
+        "revenue": sum(s.get("revenue", 0.0) for s in summaries),
+        "open_tasks": sum(s.get("open_tasks", 0) for s in summaries),
+    }
+    return {"start": start, "end": end, "tenants": summaries, "totals": totals}
@@ -1,26 +1,61 @@
-from typing import Any, List
+from itertools import accumulate
+from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import Date, cast, func, select
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from app.db.session import get_db
-from app.db.models import User, Service, Customer, ServiceProvider
-from app.schemas.models import Service as ServiceSchema, ServiceCreate
+from app.core.config import settings
+from app.db.session import get_db, get_read_db
+from app.db.models import User, Service, ServiceSeries, Customer, ServiceProvider, Task, service_types
+from app.db.archive import live_and_archived
+from app.db import customer_stats  # noqa: F401  (keeps customer_stats current as services are written)
+from app.db.crud import patch_row, resolve_names, with_names
+from app.db.recurrence import materialize, parse_rule
+from app.db.task_templates import generate_tasks, reschedule_tasks
+from app.db.repository import get_by_id
+from app.schemas.models import (
+    Service as ServiceSchema, ServiceCreate, ServiceUpdate, ServiceCalendar,
+    ServiceSeries as ServiceSeriesSchema, ServiceSeriesCreate, ServiceSeriesResult
+)
 from app.api.api_v1.endpoints.auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=List[ServiceSchema])
 def read_services(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
+    include_archived: bool = False,
+    series_id: Optional[int] = None,
+    service_type: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Retrieve services.
     """
-    services = db.query(Service).offset(skip).limit(limit).all()
+    service_type_id = service_types.id(service_type)
+    if service_type is not None and service_type_id is None:
+        return []
+    if include_archived:
+        rows = live_and_archived(Service)
+        query = select(rows)
+        if series_id is not None:
+            query = query.where(rows.c.series_id == series_id)
+        if service_type_id is not None:
+            query = query.where(rows.c.service_type_id == service_type_id)
+        return [
+            with_names(row) for row in db.execute(
+                query.order_by(rows.c.id).offset(skip).limit(limit)
+            ).mappings()
+        ]
+    query = db.query(Service).filter(Service.deleted_at.is_(None))
+    if series_id is not None:
+        query = query.filter(Service.series_id == series_id)
+    if service_type_id is not None:
+        query = query.filter(Service.service_type_id == service_type_id)
+    services = query.offset(skip).limit(limit).all()
     return services
 
 @router.post("/", response_model=ServiceSchema)
@@ -34,7 +69,7 @@ def create_service(
     Create new service.
     """
     # Verify customer exists
-    customer = db.query(Customer).filter(Customer.id == service_in.customer_id).first()
+    customer = get_by_id(db, Customer, service_in.customer_id)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -42,30 +77,224 @@ def create_service(
         )
     
     # Verify service provider exists
-    provider = db.query(ServiceProvider).filter(ServiceProvider.id == service_in.service_provider_id).first()
+    provider = get_by_id(db, ServiceProvider, service_in.service_provider_id)
     if not provider:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Service provider not found"
         )
     
-    service = Service(**service_in.model_dump())
+    fields = resolve_names(db, service_in.model_dump())
+    
+    service = Service(**fields)
     db.add(service)
+    db.flush()
+    generate_tasks(db, [service])
     db.commit()
     db.refresh(service)
     return service
 
+@router.post("/series/", response_model=ServiceSeriesResult)
+def create_service_series(
+    *,
+    db: Session = Depends(get_db),
+    series_in: ServiceSeriesCreate,
+    skip_conflicts: bool = False,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Create a recurring booking and its occurrences up to the recurrence horizon.
+
+    Occurrences that overlap another booking of the same provider fail the
+    request with 409, or are left out when skip_conflicts is set.
+    """
+    try:
+        parse_rule(series_in.rrule, series_in.start_time)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    
+    # Verify customer exists
+    customer = get_by_id(db, Customer, series_in.customer_id)
+    if not customer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found"
+        )
+    
+    # Verify service provider exists
+    provider = get_by_id(db, ServiceProvider, series_in.service_provider_id)
+    if not provider:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service provider not found"
+        )
+    
+    fields = resolve_names(db, series_in.model_dump())
+    
+    series = ServiceSeries(**fields)
+    db.add(series)
+    db.flush()
+    until = datetime.utcnow() + timedelta(days=settings.RECURRENCE_HORIZON_DAYS)
+    created, skipped = materialize(db, series, until, skip_conflicts=skip_conflicts)
+    if skipped and not skip_conflicts:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Service provider is already booked for {len(skipped)} occurrence(s), "
+                   f"first on {skipped[0].isoformat()}"
+        )
+    db.commit()
+    db.refresh(series)
+    return {"series": series, "created": created, "skipped": skipped}
+
+@router.get("/series/{series_id}", response_model=ServiceSeriesSchema)
+def read_service_series(
+    *,
+    db: Session = Depends(get_read_db),
+    series_id: int,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get recurring booking by ID.
+    """
+    series = get_by_id(db, ServiceSeries, series_id)
+    if not series:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service series not found"
+        )
+    return series
+
+@router.delete("/series/{series_id}", response_model=ServiceSeriesSchema)
+def delete_service_series(
+    *,
+    db: Session = Depends(get_db),
+    series_id: int,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    End a recurring booking, deleting its occurrences that have not started yet.
+    """
+    series = get_by_id(db, ServiceSeries, series_id)
+    if not series:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service series not found"
+        )
+    
+    now = datetime.utcnow()
+    series.deleted_at = now
+    upcoming = select(Service.id).where(
+        Service.series_id == series_id,
+        Service.start_time >= now,
+        Service.deleted_at.is_(None)
+    ).scalar_subquery()
+    db.query(Task).filter(
+        Task.service_id.in_(upcoming),
+        Task.deleted_at.is_(None)
+    ).update({Task.deleted_at: now}, synchronize_session=False)
+    db.query(Service).filter(
+        Service.series_id == series_id,
+        Service.start_time >= now,
+        Service.deleted_at.is_(None)
+    ).update({Service.deleted_at: now}, synchronize_session=False)
+    db.add(series)
+    db.commit()
+    db.refresh(series)
+    return series
+
+# Calendar key for bookings without a service type
+UNTYPED = "untyped"
+
+@router.get("/calendar", response_model=ServiceCalendar)
+def read_service_calendar(
+    db: Session = Depends(get_read_db),
+    month: Optional[str] = None,
+    months: int = 1,
+    provider_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get per-day booking counts and occupancy for one or more months (month=YYYY-MM).
+
+    A booking counts on every day from its start date through its end date;
+    bookings without a service type are counted under "untyped".
+    """
+    try:
+        first = datetime.strptime(month, "%Y-%m").date() if month else date.today().replace(day=1)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="month must be formatted as YYYY-MM"
+        )
+    if not 1 <= months <= 12:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="months must be between 1 and 12"
+        )
+    year, month_index = divmod(first.month - 1 + months, 12)
+    end = date(first.year + year, month_index + 1, 1)
+    n_days = (end - first).days
+
+    criteria = [
+        Service.start_date < datetime.combine(end, datetime.min.time()),
+        Service.end_date >= datetime.combine(first, datetime.min.time()),
+        Service.deleted_at.is_(None),
+    ]
+    if provider_id is not None:
+        criteria.append(Service.service_provider_id == provider_id)
+    # Collapse bookings to (first day, last day, type) buckets in the database
+    if db.get_bind().dialect.name == "sqlite":
+        start_day, end_day = func.date(Service.start_date), func.date(Service.end_date)
+    else:
+        start_day, end_day = cast(Service.start_date, Date), cast(Service.end_date, Date)
+    rows = db.execute(
+        select(start_day, end_day, Service.service_type_id, func.count())
+        .where(*criteria)
+        .group_by(start_day, end_day, Service.service_type_id)
+    ).all()
+
+    # Sweep: add each bucket on its first day and remove it after its last day,
+    # then a running sum gives the number of bookings on every day
+    deltas = {}
+    for start_date, end_date, service_type_id, count in rows:
+        if isinstance(start_date, str):
+            start_date, end_date = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        service_type = UNTYPED if service_type_id is None else service_types.name(service_type_id)
+        diff = deltas.get(service_type)
+        if diff is None:
+            diff = deltas[service_type] = [0] * (n_days + 1)
+        diff[max(0, (start_date - first).days)] += count
+        diff[min(n_days, (max(end_date, start_date) - first).days + 1)] -= count
+    counts = {service_type: list(accumulate(diff))[:n_days] for service_type, diff in deltas.items()}
+
+    capacity = settings.CALENDAR_DAILY_CAPACITY
+    days = []
+    for offset in range(n_days):
+        by_type = {service_type: daily[offset] for service_type, daily in counts.items() if daily[offset]}
+        total = sum(by_type.values())
+        days.append({
+            "date": first + timedelta(days=offset),
+            "total": total,
+            "by_type": by_type,
+            "occupancy": round(total / capacity, 4) if capacity else None,
+        })
+    return {"start": first, "end": end - timedelta(days=1), "capacity": capacity, "days": days}
+
 @router.get("/{service_id}", response_model=ServiceSchema)
 def read_service(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     service_id: int,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get service by ID.
     """
-    service = db.query(Service).filter(Service.id == service_id).first()
+    service = get_by_id(db, Service, service_id)
     if not service:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -84,7 +313,7 @@ def update_service(
     """
     Update service.
     """
-    service = db.query(Service).filter(Service.id == service_id).first()
+    service = get_by_id(db, Service, service_id)
     if not service:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -92,7 +321,7 @@ def update_service(
         )
     
     # Verify customer exists
-    customer = db.query(Customer).filter(Customer.id == service_in.customer_id).first()
+    customer = get_by_id(db, Customer, service_in.customer_id)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -100,21 +329,71 @@ def update_service(
         )
     
     # Verify service provider exists
-    provider = db.query(ServiceProvider).filter(ServiceProvider.id == service_in.service_provider_id).first()
+    provider = get_by_id(db, ServiceProvider, service_in.service_provider_id)
     if not provider:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Service provider not found"
         )
     
-    for field, value in service_in.model_dump().items():
+    fields = resolve_names(db, service_in.model_dump())
+    
+    # Template tasks are due relative to start_time and end_time only, so a
+    # change to start_date or end_date alone leaves their due dates right
+    moved = (service.start_time, service.end_time) != (service_in.start_time, service_in.end_time)
+    for field, value in fields.items():
         setattr(service, field, value)
     
     db.add(service)
+    if moved:
+        db.flush()
+        reschedule_tasks(db, service)
     db.commit()
     db.refresh(service)
     return service
 
+@router.patch("/{service_id}", response_model=ServiceSchema)
+def patch_service(
+    *,
+    db: Session = Depends(get_db),
+    service_id: int,
+    service_in: ServiceUpdate,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Partially update service, writing only the fields that changed.
+    """
+    changes = resolve_names(db, service_in.model_dump(exclude_unset=True))
+    
+    if "customer_id" in changes:
+        customer = get_by_id(db, Customer, changes["customer_id"])
+        if not customer:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Customer not found"
+            )
+    
+    if "service_provider_id" in changes:
+        provider = get_by_id(db, ServiceProvider, changes["service_provider_id"])
+        if not provider:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Service provider not found"
+            )
+    
+    # As in update_service, start_date and end_date do not affect due dates
+    moved = "start_time" in changes or "end_time" in changes
+    service = patch_row(
+        db, Service, [Service.id == service_id, Service.deleted_at.is_(None)], changes,
+        on_update=reschedule_tasks if moved else None
+    )
+    if not service:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Service not found"
+        )
+    return service
+
 @router.delete("/{service_id}", response_model=ServiceSchema)
 def delete_service(
     *,
@@ -125,21 +404,29 @@ def delete_service(
     """
     Delete service.
     """
-    service = db.query(Service).filter(Service.id == service_id).first()
+    service = get_by_id(db, Service, service_id)
     if not service:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Service not found"
         )
     
-    db.delete(service)
+    now = datetime.utcnow()
+    service.deleted_at = now
+    db.query(Task).filter(
+        Task.service_id == service_id,
+        Task.deleted_at.is_(None)
+    ).update({Task.deleted_at: now}, synchronize_session=False)
+    db.add(service)
     db.commit()
+    db.refresh(service)
     return service
 
 @router.get("/upcoming/", response_model=List[ServiceSchema])
 def read_upcoming_services(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     days: int = 3,
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
@@ -148,8 +435,19 @@ def read_upcoming_services(
     today = datetime.utcnow()
     end_date = today + timedelta(days=days)
     
+    if include_archived:
+        rows = live_and_archived(Service)
+        return [
+            with_names(row) for row in db.execute(
+                select(rows).where(
+                    rows.c.start_date >= today,
+                    rows.c.start_date <= end_date
+                )
+            ).mappings()
+        ]
     services = db.query(Service).filter(
         Service.start_date >= today,
-        Service.start_date <= end_date
+        Service.start_date <= end_date,
+        Service.deleted_at.is_(None)
     ).all()
     return services 
\ No newline at end of file
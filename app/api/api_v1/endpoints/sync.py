@@ -0,0 +1,185 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import and_, func, or_, select, union_all
+from sqlalchemy.orm import Query, Session
+
+from app.core.config import settings
+from app.db.session import get_db
+from app.db.models import User, Customer, Service, Task, Tombstone
+from app.schemas.models import SyncResponse
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+# A sync token holds the moment its round of calls started from (`since`,
+# None for a full download). While the round has more pages it also holds the
+# moment the round began (`until`) and, per kind of row, the keyset cursor of
+# the last row sent, or None once that kind is exhausted.
+
+def encode_token(state: dict) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps(state, default=datetime.isoformat, separators=(",", ":")).encode()
+    ).decode()
+
+def _moment(value: Optional[str]) -> Optional[datetime]:
+    return None if value is None else datetime.fromisoformat(value)
+
+def decode_token(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        if not raw.startswith("{"):
+            # Tokens issued before sync was paged hold only the moment
+            return {"since": datetime.fromisoformat(raw)}
+        state = json.loads(raw)
+        decoded = {"since": _moment(state["since"])}
+        if "until" in state:
+            decoded["until"] = datetime.fromisoformat(state["until"])
+            decoded["after"] = {
+                kind: None if cursor is None else (
+                    [datetime.fromisoformat(cursor[0]), int(cursor[1])] if len(cursor) == 2 else [int(cursor[0])]
+                )
+                for kind, cursor in state["after"].items()
+            }
+        return decoded
+    except (ValueError, KeyError, TypeError, AttributeError, IndexError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token"
+        )
+
+def latest_change(db: Session) -> Optional[datetime]:
+    # One statement of index-backed MAX() lookups, so an up-to-date client costs a single round trip
+    latest = union_all(
+        select(func.max(Customer.updated_at).label("changed_at")),
+        select(func.max(Service.updated_at)),
+        select(func.max(Service.deleted_at)),
+        select(func.max(Task.updated_at)),
+        select(func.max(Task.deleted_at)),
+        select(func.max(Tombstone.deleted_at)),
+    ).subquery()
+    return db.execute(select(func.max(latest.c.changed_at))).scalar()
+
+class Pager:
+    """Pages each kind of row by its keyset, recording where the next call resumes."""
+
+    def __init__(self, after: dict):
+        self.after = after
+        self.has_more = False
+
+    def page(self, kind: str, query: Query, keys: List[Any]) -> list:
+        if kind in self.after and self.after[kind] is None:
+            return []
+        cursor = self.after.get(kind)
+        if cursor is not None:
+            if len(keys) == 1:
+                query = query.filter(keys[0] > cursor[0])
+            else:
+                query = query.filter(and_(keys[0] >= cursor[0], or_(keys[0] > cursor[0], keys[1] > cursor[1])))
+        rows = query.order_by(*keys).limit(settings.SYNC_PAGE_SIZE).all()
+        if len(rows) == settings.SYNC_PAGE_SIZE:
+            self.has_more = True
+            self.after[kind] = [getattr(rows[-1], key.key) for key in keys]
+        else:
+            self.after[kind] = None
+        return rows
+
+@router.get("/", response_model=SyncResponse)
+def sync(
+    db: Session = Depends(get_db),
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get customers, services and tasks changed since a sync token, plus deletions.
+
+    Omit `since` for a full download. Each call returns up to SYNC_PAGE_SIZE
+    rows of each kind; while `has_more` is true, call again with the returned
+    `token`. Once it is false, pass the token on the next sync.
+    """
+    state = decode_token(since) if since is not None else {"since": None}
+    if "until" not in state:
+        # A new round: it covers changes up to now, later ones are left to the next round
+        now = datetime.utcnow()
+        if state["since"] is not None:
+            cutoff = state["since"] - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+            changed_at = latest_change(db)
+            if changed_at is None or changed_at <= cutoff:
+                return {"token": encode_token({"since": now})}
+        state = {"since": state["since"], "until": now, "after": {}}
+
+    until = state["until"]
+    pager = Pager(state["after"])
+    if state["since"] is None:
+        response = {
+            "customers": pager.page("customers", db.query(Customer), [Customer.id]),
+            "services": pager.page("services", db.query(Service).filter(Service.deleted_at.is_(None)), [Service.id]),
+            "tasks": pager.page("tasks", db.query(Task).filter(Task.deleted_at.is_(None)), [Task.id]),
+        }
+    else:
+        cutoff = state["since"] - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+        deleted = [
+            {"entity": "services", "id": row.id, "deleted_at": row.deleted_at}
+            for row in pager.page(
+                "deleted_services",
+                db.query(Service.id, Service.deleted_at).filter(
+                    Service.deleted_at > cutoff,
+                    Service.deleted_at <= until
+                ),
+                [Service.deleted_at, Service.id]
+            )
+        ]
+        deleted += [
+            {"entity": "tasks", "id": row.id, "deleted_at": row.deleted_at}
+            for row in pager.page(
+                "deleted_tasks",
+                db.query(Task.id, Task.deleted_at).filter(Task.deleted_at > cutoff, Task.deleted_at <= until),
+                [Task.deleted_at, Task.id]
+            )
+        ]
+        deleted += [
+            {"entity": row.entity, "id": row.entity_id, "deleted_at": row.deleted_at}
+            for row in pager.page(
+                "tombstones",
+                db.query(Tombstone.id, Tombstone.entity, Tombstone.entity_id, Tombstone.deleted_at).filter(
+                    Tombstone.deleted_at > cutoff,
+                    Tombstone.deleted_at <= until
+                ),
+                [Tombstone.deleted_at, Tombstone.id]
+            )
+        ]
+        response = {
+            "customers": pager.page(
+                "customers",
+                db.query(Customer).filter(Customer.updated_at > cutoff, Customer.updated_at <= until),
+                [Customer.updated_at, Customer.id]
+            ),
+            "services": pager.page(
+                "services",
+                db.query(Service).filter(
+                    Service.updated_at > cutoff,
+                    Service.updated_at <= until,
+                    Service.deleted_at.is_(None)
+                ),
+                [Service.updated_at, Service.id]
+            ),
+            "tasks": pager.page(
+                "tasks",
+                db.query(Task).filter(
+                    Task.updated_at > cutoff,
+                    Task.updated_at <= until,
+                    Task.deleted_at.is_(None)
+                ),
+                [Task.updated_at, Task.id]
+            ),
+            "deleted": deleted,
+        }
+
+    if pager.has_more:
+        response["token"] = encode_token(state)
+        response["has_more"] = True
+    else:
+        response["token"] = encode_token({"since": until})
+    return response
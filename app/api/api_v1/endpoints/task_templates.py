@@ -0,0 +1,80 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.context import current_tenant
+from app.db.session import get_db, get_read_db
+from app.db.crud import resolve_names
+from app.db.models import User, UserRole, ServiceType, Task, TaskTemplate
+from app.db.task_templates import template_cache
+from app.db.repository import get_by_id
+from app.schemas.models import TaskTemplate as TaskTemplateSchema, TaskTemplateCreate
+from app.api.api_v1.endpoints.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/", response_model=List[TaskTemplateSchema])
+def read_task_templates(
+    db: Session = Depends(get_read_db),
+    service_type: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Retrieve task templates, optionally for one service type.
+    """
+    query = db.query(TaskTemplate).join(ServiceType, TaskTemplate.service_type_id == ServiceType.id)
+    if service_type is not None:
+        query = query.filter(ServiceType.name == service_type)
+    return query.order_by(ServiceType.name, TaskTemplate.id).all()
+
+@router.post("/", response_model=TaskTemplateSchema)
+def create_task_template(
+    *,
+    db: Session = Depends(get_db),
+    template_in: TaskTemplateCreate,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Create new task template. Applies to services created from now on.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    template = TaskTemplate(**resolve_names(db, template_in.model_dump()))
+    db.add(template)
+    db.commit()
+    db.refresh(template)
+    template_cache.pop((current_tenant.get(), template.service_type_id))
+    return template
+
+@router.delete("/{template_id}", response_model=TaskTemplateSchema)
+def delete_task_template(
+    *,
+    db: Session = Depends(get_db),
+    template_id: int,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Delete task template. Tasks already generated from it are kept.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    template = get_by_id(db, TaskTemplate, template_id)
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task template not found"
+        )
+    
+    db.query(Task).filter(Task.template_id == template_id).update(
+        {Task.template_id: None}, synchronize_session=False
+    )
+    db.delete(template)
+    db.commit()
+    template_cache.pop((current_tenant.get(), template.service_type_id))
+    return template
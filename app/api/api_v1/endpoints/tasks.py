@@ -1,26 +1,38 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.db.models import User, Task, Service
-from app.schemas.models import Task as TaskSchema, TaskCreate
+from app.db.archive import live_and_archived
+from app.db.crud import patch_row
+from app.db.repository import get_by_id
+from app.schemas.models import Task as TaskSchema, TaskCreate, TaskUpdate
 from app.api.api_v1.endpoints.auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=List[TaskSchema])
 def read_tasks(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Retrieve tasks.
     """
-    tasks = db.query(Task).offset(skip).limit(limit).all()
+    if include_archived:
+        rows = live_and_archived(Task)
+        return db.execute(
+            select(rows).order_by(rows.c.id).offset(skip).limit(limit)
+        ).mappings().all()
+    tasks = db.query(Task).filter(
+        Task.deleted_at.is_(None)
+    ).offset(skip).limit(limit).all()
     return tasks
 
 @router.post("/", response_model=TaskSchema)
@@ -34,7 +46,7 @@ def create_task(
     Create new task.
     """
     # Verify service exists
-    service = db.query(Service).filter(Service.id == task_in.service_id).first()
+    service = get_by_id(db, Service, task_in.service_id)
     if not service:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -50,14 +62,14 @@ def create_task(
 @router.get("/{task_id}", response_model=TaskSchema)
 def read_task(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     task_id: int,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get task by ID.
     """
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = get_by_id(db, Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -76,7 +88,7 @@ def update_task(
     """
     Update task.
     """
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = get_by_id(db, Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -84,7 +96,7 @@ def update_task(
         )
     
     # Verify service exists
-    service = db.query(Service).filter(Service.id == task_in.service_id).first()
+    service = get_by_id(db, Service, task_in.service_id)
     if not service:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,6 +111,37 @@ def update_task(
     db.refresh(task)
     return task
 
+@router.patch("/{task_id}", response_model=TaskSchema)
+def patch_task(
+    *,
+    db: Session = Depends(get_db),
+    task_id: int,
+    task_in: TaskUpdate,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Partially update task, writing only the fields that changed.
+    """
+    changes = task_in.model_dump(exclude_unset=True)
+    
+    if "service_id" in changes:
+        service = get_by_id(db, Service, changes["service_id"])
+        if not service:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Service not found"
+            )
+    
+    task = patch_row(
+        db, Task, [Task.id == task_id, Task.deleted_at.is_(None)], changes
+    )
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    return task
+
 @router.delete("/{task_id}", response_model=TaskSchema)
 def delete_task(
     *,
@@ -109,26 +152,37 @@ def delete_task(
     """
     Delete task.
     """
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = get_by_id(db, Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
     
-    db.delete(task)
+    task.deleted_at = datetime.utcnow()
+    db.add(task)
     db.commit()
+    db.refresh(task)
     return task
 
 @router.get("/pending/", response_model=List[TaskSchema])
 def read_pending_tasks(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get all pending tasks.
     """
-    tasks = db.query(Task).filter(Task.is_completed == False).all()
+    if include_archived:
+        rows = live_and_archived(Task)
+        return db.execute(
+            select(rows).where(rows.c.is_completed == False)
+        ).mappings().all()
+    tasks = db.query(Task).filter(
+        Task.is_completed == False,
+        Task.deleted_at.is_(None)
+    ).all()
     return tasks
 
 @router.put("/{task_id}/complete", response_model=TaskSchema)
@@ -141,7 +195,7 @@ def complete_task(
     """
     Mark task as completed.
     """
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = get_by_id(db, Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
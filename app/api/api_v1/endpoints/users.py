@@ -1,10 +1,13 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import exists, or_, select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
-from app.db.models import User, UserRole
-from app.schemas.models import User as UserSchema, UserCreate
+from app.db.session import get_db, get_read_db
+from app.db.crud import patch_row
+from app.db.models import Service, ServiceSeries, User, UserRole, services_archive
+from app.db.repository import get_by_id, get_user_by_email
+from app.schemas.models import User as UserSchema, UserCreate, UserUpdate
 from app.core.security import get_password_hash
 from app.api.api_v1.endpoints.auth import get_current_user
 
@@ -12,7 +15,7 @@ router = APIRouter()
 
 @router.get("/", response_model=List[UserSchema])
 def read_users(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user)
@@ -44,7 +47,7 @@ def create_user(
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.email == user_in.email).first()
+    user = get_user_by_email(db, user_in.email)
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -65,7 +68,7 @@ def create_user(
 @router.get("/{user_id}", response_model=UserSchema)
 def read_user(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user_id: int,
     current_user: User = Depends(get_current_user)
 ) -> Any:
@@ -78,7 +81,7 @@ def read_user(
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = get_by_id(db, User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -103,7 +106,7 @@ def update_user(
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = get_by_id(db, User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -122,6 +125,42 @@ def update_user(
     db.refresh(user)
     return user
 
+@router.patch("/{user_id}", response_model=UserSchema)
+def patch_user(
+    *,
+    db: Session = Depends(get_db),
+    user_id: int,
+    user_in: UserUpdate,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Partially update user, writing only the fields that changed.
+    """
+    if current_user.role != UserRole.ADMIN and current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    user_data = user_in.model_dump(exclude_unset=True)
+    if "email" in user_data:
+        existing = db.query(User).filter(User.email == user_data["email"], User.id != user_id).first()
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+    if "password" in user_data:
+        user_data["hashed_password"] = get_password_hash(user_data.pop("password"))
+    
+    user = patch_row(db, User, [User.id == user_id], user_data)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
 @router.delete("/{user_id}", response_model=UserSchema)
 def delete_user(
     *,
@@ -131,6 +170,9 @@ def delete_user(
 ) -> Any:
     """
     Delete user.
+
+    Users who handle bookings, live, archived or recurring, cannot be deleted
+    while those bookings name them; reassign the bookings first.
     """
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
@@ -138,13 +180,24 @@ def delete_user(
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = get_by_id(db, User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
+    handles_bookings = db.execute(select(or_(
+        exists().where(Service.handled_by_id == user_id),
+        exists().where(ServiceSeries.handled_by_id == user_id),
+        exists().where(services_archive.c.handled_by_id == user_id),
+    ))).scalar()
+    if handles_bookings:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User handles bookings; reassign them before deleting the user"
+        )
+    
     db.delete(user)
     db.commit()
     return user 
\ No newline at end of file
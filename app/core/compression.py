@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+from typing import Optional
+
+from app.core.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    b"application/json",
+    b"text/",
+    b"application/javascript",
+    b"application/xml",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding from an ``Accept-Encoding`` header."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """Compress complete, uncompressed text and JSON responses with brotli or gzip.
+
+    Bodies smaller than ``minimum_size``, streamed bodies and responses that
+    already carry a Content-Encoding are passed through untouched. When
+    ``cache_size`` is non-zero, compressed bodies are cached by ETag (or by
+    body digest when the response has none) so hot resources are only
+    compressed once.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        cache_size: int = 0
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = LRUCache(cache_size) if cache_size else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                if b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streaming or too small to be worth it
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = [
+                (name, value) for name, value in start_message.get("headers", [])
+                if name not in (b"content-length", b"vary")
+            ]
+            original = dict(start_message.get("headers", []))
+            compressed = self._compress(body, encoding, original.get(b"etag"))
+            vary = original.get(b"vary")
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            await send(dict(start_message, headers=headers))
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, compressing_send)
+
+    def _compress(self, body: bytes, encoding: str, etag: Optional[bytes]) -> bytes:
+        key = None
+        if self.cache is not None:
+            key = (encoding, etag or hashlib.blake2b(body, digest_size=16).digest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if key is not None:
+            self.cache.set(key, compressed)
+        return compressed
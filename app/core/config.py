@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 import secrets
 
 class Settings(BaseSettings):
@@ -14,7 +14,124 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    # Optional read-only replica used by GET endpoints
+    READ_REPLICA_URL: Optional[str] = None
+    READ_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    READ_REPLICA_CHECK_INTERVAL_SECONDS: float = 2.0
+    # Users read from the primary for this long after they write
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    # redis:// URL where workers share who wrote recently; defaults to
+    # RATE_LIMIT_BACKEND_URL. Without one, each process only knows its own writes
+    READ_YOUR_WRITES_BACKEND_URL: Optional[str] = None
+    # Branch name -> database URL (a separate database, or a schema selected
+    # through the URL); tokens carrying a tenant claim use that database
+    TENANT_DATABASE_URLS: Dict[str, str] = {}
+    # Tenant engines kept open at once; the least recently used is disposed
+    TENANT_ENGINE_CACHE_SIZE: int = 16
+    TENANT_REPORT_CONCURRENCY: int = 8
+    # Compiled statements kept per engine
+    DB_COMPILED_CACHE_SIZE: int = 1000
+    # Prepared statements: SQLite keeps this many per connection; psycopg 3
+    # prepares a statement server-side once it has run this often
+    DB_STATEMENT_CACHE_SIZE: int = 256
+    DB_PREPARE_THRESHOLD: int = 5
     
+    # Rate limiting and load shedding
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: int = 120
+    RATE_LIMIT_BURST: int = 60
+    RATE_LIMIT_ROUTE_OVERRIDES: dict = {}
+    RATE_LIMIT_BACKEND_URL: Optional[str] = None
+    LOAD_SHED_MAX_IN_FLIGHT: int = 200
+    LOAD_SHED_MAX_POOL_WAIT_MS: int = 500
+    
+    # Idempotency keys
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    
+    # Archival of old rows
+    ARCHIVE_HORIZON_DAYS: int = 365
+    ARCHIVE_BATCH_SIZE: int = 1000
+    
+    # Notifications
+    NOTIFICATION_BROADCAST_CHUNK_SIZE: int = 5000
+    
+    # Slow query diagnostics
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: int = 200
+    SLOW_QUERY_MAX_ENTRIES: int = 500
+    SLOW_QUERY_EXPLAIN: bool = True
+    
+    # Delta sync: changes this close to the previous token are sent again to
+    # cover transactions that committed after the token was issued
+    SYNC_OVERLAP_SECONDS: int = 5
+    # Rows of each kind per sync response; larger syncs continue over several calls
+    SYNC_PAGE_SIZE: int = 1000
+    
+    # Response compression
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    # Number of compressed bodies to keep; 0 disables the cache
+    COMPRESSION_CACHE_SIZE: int = 256
+    
+    # Dashboard
+    DASHBOARD_CACHE_SECONDS: int = 5
+    DASHBOARD_OVERDUE_LIMIT: int = 100
+    
+    # Bookings calendar: bookings per day treated as full occupancy (None to omit)
+    CALENDAR_DAILY_CAPACITY: Optional[int] = None
+    
+    # Provider suggestions: simultaneous bookings a provider can take, and how
+    # often the in-memory load index picks up changes from other processes
+    PROVIDER_MAX_CONCURRENT_BOOKINGS: int = 1
+    PROVIDER_INDEX_REFRESH_SECONDS: float = 30.0
+
+    # Recurring bookings: occurrences are created this far ahead and topped up later
+    RECURRENCE_HORIZON_DAYS: int = 90
+    RECURRENCE_MAX_OCCURRENCES: int = 1000
+
+    # Background jobs
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: int = 30
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    # Running jobs without a heartbeat for this long are handed to another worker
+    JOB_LOCK_TIMEOUT_SECONDS: int = 300
+
+    # Task templates are cached per service type for this long
+    TASK_TEMPLATE_CACHE_SECONDS: int = 60
+
+    # Staff names and emails that handled_by is resolved through are cached for this long
+    STAFF_LOOKUP_CACHE_SECONDS: int = 60
+
+    # Audit log, written behind by a background thread
+    AUDIT_ENABLED: bool = True
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    # A tenant's entries that fail this many writes in a row are spilled instead of retried
+    AUDIT_MAX_ATTEMPTS: int = 5
+    # Entries that overflow the queue or outlive the process are appended here
+    AUDIT_FALLBACK_PATH: str = "audit-fallback.jsonl"
+
+    # POST /batch: sub-requests per batch, and reads run at once
+    BATCH_MAX_REQUESTS: int = 25
+    BATCH_MAX_CONCURRENCY: int = 8
+
+    # Customer deduplication: pairs scoring at least the threshold are merged;
+    # blocking keys shared by more customers than the block size are too
+    # common to tell anyone apart and are not compared
+    DEDUPE_THRESHOLD: float = 0.8
+    DEDUPE_MAX_BLOCK_SIZE: int = 50
+    DEDUPE_BATCH_SIZE: int = 10000
+
+    # Migrations: write-blocking lock time allowed per revision, how long DDL
+    # waits for a lock before failing, and the pace of batched backfills
+    MIGRATION_LOCK_BUDGET_SECONDS: float = 5.0
+    MIGRATION_LOCK_TIMEOUT_SECONDS: float = 5.0
+    MIGRATION_BACKFILL_BATCH_SIZE: int = 5000
+    MIGRATION_BACKFILL_PAUSE_SECONDS: float = 0.1
+
     # CORS
     BACKEND_CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:3001", "http://localhost:8000", "http://localhost:8080"]
     
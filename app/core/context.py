@@ -0,0 +1,61 @@
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from app.core.security import token_claims
+
+# ASGI scope of the request being served; routing adds the matched route to it
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+# JWT subject (user email) of the request being served
+current_subject: ContextVar[Optional[str]] = ContextVar("current_subject", default=None)
+# Branch whose database serves the request; None for the default database
+current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+# Set while POST /batch runs its sub-requests: the caller, authenticated once,
+# and the session that sequential sub-requests share
+batch_user: ContextVar[Optional[Any]] = ContextVar("batch_user", default=None)
+batch_session: ContextVar[Optional[Any]] = ContextVar("batch_session", default=None)
+
+
+def current_route() -> Optional[str]:
+    """"METHOD /path" of the request being served, for diagnostics and audit entries.
+
+    The path is the matched route's template (``/services/{service_id}``), so
+    requests for different rows count as one route; before routing, or when
+    no route matched, it is the requested path.
+    """
+    scope = current_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+
+class RequestContextMiddleware:
+    """Expose the current route, caller and tenant to code that has no access to the request.
+
+    The tenant comes from the token's ``tenant`` claim; requests without a
+    valid token (such as login) may name it in the ``X-Tenant`` header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        authorization = headers.get(b"authorization")
+        claims = token_claims(authorization.decode("latin-1")) if authorization else None
+        if claims is not None:
+            tenant = claims.get("tenant")
+        else:
+            tenant = headers.get(b"x-tenant", b"").decode("latin-1") or None
+        scope_token = current_scope.set(scope)
+        subject_token = current_subject.set(claims.get("sub") if claims else None)
+        tenant_token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(scope_token)
+            current_subject.reset(subject_token)
+            current_tenant.reset(tenant_token)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.security import token_claims
+from app.db.models import IdempotencyKey
+from app.db.session import SessionLocal
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# Purge expired keys once every this many stored responses
+PURGE_EVERY = 500
+# Responses saying the request was not attempted (not authenticated, not
+# allowed, throttled); like 5xx they release the key so a retry runs again
+NOT_ATTEMPTED = {401, 403, 429}
+
+# key -> (request_hash, status_code, content_type, body); status_code is None while pending
+StoredResponse = Tuple[str, Optional[int], Optional[str], Optional[bytes]]
+
+
+class IdempotencyStore:
+    """Stored responses in the ``idempotency_keys`` table with a hot LRU in front."""
+
+    def __init__(self, cache_size: int, ttl: timedelta):
+        self.ttl = ttl
+        self.cache = LRUCache(cache_size, ttl=ttl.total_seconds())
+        self._stores = 0
+
+    def lookup(self, key: str) -> Optional[StoredResponse]:
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit
+        with SessionLocal() as db:
+            row = db.execute(
+                select(IdempotencyKey).where(
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.expires_at > datetime.utcnow()
+                )
+            ).scalar_one_or_none()
+            if row is None:
+                return None
+            stored = (row.request_hash, row.status_code, row.content_type, row.response_body)
+        if stored[1] is not None:
+            self.cache.set(key, stored)
+        return stored
+
+    def reserve(self, key: str, request_hash: str) -> bool:
+        """Insert a pending row for ``key``. Returns False if another request holds it."""
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            db.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at <= now
+            ))
+            db.add(IdempotencyKey(
+                key=key,
+                request_hash=request_hash,
+                created_at=now,
+                expires_at=now + self.ttl
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False
+        return True
+
+    def save(self, key: str, request_hash: str, status_code: int, content_type: Optional[str], body: bytes) -> None:
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            row = db.get(IdempotencyKey, key)
+            if row is None:
+                return
+            row.status_code = status_code
+            row.content_type = content_type
+            row.response_body = body
+            self._stores += 1
+            if self._stores % PURGE_EVERY == 0:
+                db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+            db.commit()
+        self.cache.set(key, (request_hash, status_code, content_type, body))
+
+    def release(self, key: str) -> None:
+        self.cache.pop(key)
+        with SessionLocal() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            db.commit()
+
+
+store = IdempotencyStore(
+    settings.IDEMPOTENCY_CACHE_SIZE,
+    timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+)
+
+
+class IdempotencyMiddleware:
+    """Replay stored responses for POST requests carrying an ``Idempotency-Key``.
+
+    The first request with a key runs normally and its final response is
+    stored; server errors, throttling and auth failures are not, so the
+    request can be retried with the same key.
+    Retries with the same key and payload get the stored response back
+    without reaching the endpoint; reusing a key for a different payload
+    is rejected with 422, and a retry that arrives while the original is
+    still running gets 409.
+    """
+
+    def __init__(self, app, prefix: str = ""):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        client_key = headers.get(HEADER)
+        if client_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": "Invalid Idempotency-Key header"})
+            return
+
+        body = await _read_body(receive)
+        claims = token_claims(headers.get(b"authorization", b"").decode("latin-1")) or {}
+        # Keys are scoped to the caller, and to their branch since emails repeat across branches
+        caller = f"{claims.get('tenant') or ''}\0{claims.get('sub') or ''}"
+        key = hashlib.sha256(caller.encode() + b"\0" + client_key).hexdigest()
+        request_hash = hashlib.sha256(
+            scope["path"].encode() + b"?" + scope.get("query_string", b"") + b"\0" + body
+        ).hexdigest()
+
+        stored = await run_in_threadpool(store.lookup, key)
+        if stored is None and not await run_in_threadpool(store.reserve, key, request_hash):
+            stored = await run_in_threadpool(store.lookup, key)
+        if stored is not None:
+            await _replay(send, stored, request_hash)
+            return
+
+        captured = {"status": 500, "content_type": None, "body": []}
+
+        async def replay_receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["content_type"] = dict(message.get("headers", [])).get(b"content-type")
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await run_in_threadpool(store.release, key)
+            raise
+
+        if captured["status"] >= 500 or captured["status"] in NOT_ATTEMPTED:
+            await run_in_threadpool(store.release, key)
+            return
+        content_type = captured["content_type"].decode("latin-1") if captured["content_type"] else None
+        await run_in_threadpool(
+            store.save, key, request_hash, captured["status"], content_type, b"".join(captured["body"])
+        )
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _replay(send, stored: StoredResponse, request_hash: str) -> None:
+    stored_hash, status_code, content_type, body = stored
+    if stored_hash != request_hash:
+        await _send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request"})
+        return
+    if status_code is None:
+        await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"})
+        return
+    headers = [(b"content-length", str(len(body)).encode()), (b"idempotent-replayed", b"true")]
+    if content_type:
+        headers.append((b"content-type", content_type.encode("latin-1")))
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status_code: int, payload: dict) -> None:
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
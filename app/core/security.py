@@ -20,4 +20,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt 
\ No newline at end of file
+    return encoded_jwt 
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Return the verified claims of ``token``, or None when it is invalid."""
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+
+
+def token_claims(authorization: Optional[str]) -> Optional[dict]:
+    """Return the verified claims of an ``Authorization: Bearer`` header value."""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return decode_access_token(token)
+
+
+def token_subject(authorization: Optional[str]) -> Optional[str]:
+    """Extract the ``sub`` claim from an ``Authorization: Bearer`` header value."""
+    payload = token_claims(authorization)
+    return payload.get("sub") if payload else None
@@ -0,0 +1,233 @@
+import json
+import math
+import threading
+import time
+from collections import Counter
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.security import token_subject
+
+
+class ThrottleCounters:
+    """Thread-safe counters for throttled and shed requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = Counter()
+        self._routes = Counter()
+
+    def incr(self, reason: str, route: Optional[str] = None) -> None:
+        with self._lock:
+            self._totals[reason] += 1
+            if route:
+                self._routes[route] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"totals": dict(self._totals), "rate_limited_by_route": dict(self._routes)}
+
+
+counters = ThrottleCounters()
+
+
+class PoolWaitGauge:
+    """Exponentially weighted average of connection pool checkout time.
+
+    The average decays while no observations arrive, so a burst of slow
+    checkouts cannot keep the load shedder tripped after traffic stops.
+    """
+
+    def __init__(self, alpha: float = 0.2, half_life: float = 1.0):
+        self.alpha = alpha
+        self.half_life = half_life
+        self._value = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            current = self._decayed(now)
+            self._value = current + self.alpha * (seconds - current)
+            self._updated = now
+
+    def value(self) -> float:
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+    def _decayed(self, now: float) -> float:
+        return self._value * 0.5 ** ((now - self._updated) / self.half_life)
+
+
+pool_wait = PoolWaitGauge()
+
+
+class RateLimitBackend:
+    """Storage for token buckets. Subclass to share buckets between workers."""
+
+    def consume(self, key: str, rate: float, capacity: float) -> float:
+        """Take one token from ``key``'s bucket.
+
+        Returns 0 when the request is allowed, otherwise the number of
+        seconds until a token becomes available.
+        """
+        raise NotImplementedError
+
+
+class InMemoryBackend(RateLimitBackend):
+    """Per-process token buckets. Idle, refilled buckets are pruned lazily."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rate: float, capacity: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / rate
+            if len(self._buckets) > self.max_keys:
+                self._prune(now, rate, capacity)
+            return retry_after
+
+    def _prune(self, now: float, rate: float, capacity: float) -> None:
+        full_after = capacity / rate
+        self._buckets = {
+            key: (tokens, updated)
+            for key, (tokens, updated) in self._buckets.items()
+            if now - updated < full_after
+        }
+
+
+class RedisBackend(RateLimitBackend):
+    """Token buckets shared by every worker through Redis.
+
+    Requires the optional ``redis`` package.
+    """
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("RedisBackend requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key: str, rate: float, capacity: float) -> float:
+        return float(self._script(keys=[f"ratelimit:{key}"], args=[rate, capacity, time.time()]))
+
+
+def _default_backend() -> RateLimitBackend:
+    url = settings.RATE_LIMIT_BACKEND_URL
+    if url and url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    return InMemoryBackend()
+
+
+backend: RateLimitBackend = _default_backend()
+
+
+def set_backend(new_backend: RateLimitBackend) -> None:
+    global backend
+    backend = new_backend
+
+
+def _limits_for(route: str) -> Tuple[float, float]:
+    per_minute = settings.RATE_LIMIT_ROUTE_OVERRIDES.get(route, settings.RATE_LIMIT_PER_MINUTE)
+    return per_minute / 60.0, float(max(settings.RATE_LIMIT_BURST, 1))
+
+
+def rate_limit(request: Request) -> None:
+    """Router dependency enforcing a token bucket per user (or client) and route."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", request.url.path)
+    subject = token_subject(request.headers.get("Authorization"))
+    if subject is None:
+        subject = f"ip:{request.client.host if request.client else 'unknown'}"
+    rate, capacity = _limits_for(route_path)
+    retry_after = backend.consume(f"{subject}:{request.method}:{route_path}", rate, capacity)
+    if retry_after > 0:
+        counters.incr("rate_limited", f"{request.method} {route_path}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+class LoadSheddingMiddleware:
+    """Reject requests with 503 before they reach the database when overloaded.
+
+    Requests are shed when too many are already in flight or when the
+    average connection pool checkout time crosses its threshold.
+    """
+
+    def __init__(self, app, max_in_flight: int, max_pool_wait_ms: int):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_pool_wait = max_pool_wait_ms / 1000.0
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.in_flight >= self.max_in_flight:
+            counters.incr("shed_in_flight")
+            await self._reject(send)
+            return
+        if pool_wait.value() > self.max_pool_wait:
+            counters.incr("shed_pool_wait")
+            await self._reject(send)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": "Server is busy, please retry shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
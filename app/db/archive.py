@@ -0,0 +1,134 @@
+"""Move old and soft-deleted rows out of the hot tables.
+
+Rows are copied into the matching ``*_archive`` table and deleted from the
+live table in batches, leaving tombstones for sync clients where the table
+has them; each batch commits on its own, so an interrupted run simply
+resumes where it stopped the next time it is started::
+
+    python -m app.db.archive [--tenant NAME]
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import Table, and_, delete, insert, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.jobs import job
+from app.db.models import (
+    TOMBSTONED, Notification, Service, Task, Tombstone, notifications_archive, services_archive, tasks_archive
+)
+from app.db.session import add_tenant_argument, cli_session
+
+ARCHIVES: Dict[str, Table] = {
+    "services": services_archive,
+    "tasks": tasks_archive,
+    "notifications": notifications_archive,
+}
+
+
+def live_and_archived(model):
+    """Subquery over the non-deleted live and archived rows of ``model``."""
+    table = model.__table__
+    archive = ARCHIVES[table.name]
+    live = select(*table.columns).where(table.c.deleted_at.is_(None))
+    archived = select(*[archive.c[c.name] for c in table.columns]).where(archive.c.deleted_at.is_(None))
+    return union_all(live, archived).subquery(f"{table.name}_all")
+
+
+def _move(db: Session, table: Table, ids: list, archived_at: datetime) -> None:
+    archive = ARCHIVES[table.name]
+    names = [c.name for c in table.columns]
+    db.execute(
+        insert(archive).from_select(
+            names + ["archived_at"],
+            select(*table.columns, literal(archived_at)).where(table.c.id.in_(ids))
+        )
+    )
+    if table.name in TOMBSTONED:
+        # The Core delete skips the ORM's tombstones, so sync clients get them here
+        db.execute(insert(Tombstone).from_select(
+            ["entity", "entity_id", "deleted_at"],
+            select(literal(table.name), table.c.id, literal(archived_at)).where(table.c.id.in_(ids))
+        ))
+    db.execute(delete(table).where(table.c.id.in_(ids)))
+
+
+def _archive_batches(db: Session, model, condition, batch_size: int, with_tasks: bool = False) -> int:
+    table = model.__table__
+    moved = 0
+    while True:
+        ids = db.execute(
+            select(table.c.id).where(condition).order_by(table.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return moved
+        now = datetime.utcnow()
+        if with_tasks:
+            task_ids = db.execute(
+                select(Task.id).where(Task.service_id.in_(ids))
+            ).scalars().all()
+            if task_ids:
+                _move(db, Task.__table__, task_ids, now)
+        _move(db, table, ids, now)
+        db.commit()
+        moved += len(ids)
+
+
+def archive_tasks(db: Session, horizon: datetime, batch_size: int) -> int:
+    """Archive tasks completed or deleted before ``horizon``."""
+    condition = or_(
+        and_(Task.is_completed == True, Task.updated_at < horizon),
+        Task.deleted_at < horizon
+    )
+    return _archive_batches(db, Task, condition, batch_size)
+
+
+def archive_notifications(db: Session, horizon: datetime, batch_size: int) -> int:
+    """Archive notifications read or deleted before ``horizon``."""
+    condition = or_(
+        and_(Notification.is_read == True, Notification.created_at < horizon),
+        Notification.deleted_at < horizon
+    )
+    return _archive_batches(db, Notification, condition, batch_size)
+
+
+def archive_services(db: Session, horizon: datetime, batch_size: int) -> int:
+    """Archive services that ended or were deleted before ``horizon``, with their tasks."""
+    condition = or_(Service.end_date < horizon, Service.deleted_at < horizon)
+    return _archive_batches(db, Service, condition, batch_size, with_tasks=True)
+
+
+def archive_all(
+    db: Session,
+    horizon_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Dict[str, int]:
+    horizon = datetime.utcnow() - timedelta(days=horizon_days or settings.ARCHIVE_HORIZON_DAYS)
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    stages = (
+        ("tasks", archive_tasks),
+        ("notifications", archive_notifications),
+        ("services", archive_services),
+    )
+    moved = {}
+    for done, (name, archive) in enumerate(stages):
+        if progress:
+            progress(done / len(stages), f"Archiving {name}")
+        moved[name] = archive(db, horizon, batch_size)
+    return moved
+
+
+@job("archive")
+def run_archive(db: Session, ctx, payload: dict) -> Dict[str, int]:
+    return archive_all(db, payload.get("horizon_days"), payload.get("batch_size"), ctx.progress)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_tenant_argument(parser)
+    args = parser.parse_args()
+    with cli_session(args.tenant) as db:
+        print(archive_all(db))
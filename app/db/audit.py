@@ -0,0 +1,317 @@
+"""Write-behind audit log of changes to business tables.
+
+Session events capture a before/after diff of every audited row written
+through the unit of work, and a description of every bulk statement. The
+entries of a transaction are queued when it commits and written to
+``audit_log`` in batches by a background thread, so requests never wait on
+audit inserts. Each tenant's entries are written separately, so one tenant's
+database failing does not hold up the others. Entries that do not fit in the
+bounded queue, that fail ``AUDIT_MAX_ATTEMPTS`` writes in a row, or that are
+still queued at shutdown and cannot be written, are appended to
+``AUDIT_FALLBACK_PATH`` and written by ``replay`` on the next start.
+"""
+import atexit
+import enum
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.context import current_route, current_subject, current_tenant
+from app.db.models import AuditLog
+from app.db.session import tenant_engines
+
+logger = logging.getLogger(__name__)
+
+AUDITED = {
+    "users", "customers", "service_providers", "services", "service_series", "tasks", "task_templates",
+}
+# Never copied into the log
+REDACTED = {"hashed_password"}
+# Maintained by the ORM; not worth an entry of their own
+IGNORED = {"created_at", "updated_at"}
+# Execution option for statements whose caller records the change with capture()
+SKIP_OPTION = "audit_skip"
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _values(obj) -> Dict[str, Any]:
+    return {
+        attr.key: _jsonable(attr.value)
+        for attr in inspect(obj).attrs
+        if attr.key in obj.__table__.columns and attr.key not in REDACTED | IGNORED
+    }
+
+
+def _diff(obj) -> Dict[str, list]:
+    changes = {}
+    state = inspect(obj)
+    for column in obj.__table__.columns:
+        if column.key in REDACTED | IGNORED:
+            continue
+        history = state.attrs[column.key].history
+        if history.added or history.deleted:
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+            if before != after:
+                changes[column.key] = [_jsonable(before), _jsonable(after)]
+    return changes
+
+
+def capture(
+    session: Session,
+    entity: str,
+    entity_id: Optional[int],
+    action: str,
+    changes: Dict[str, Any]
+) -> None:
+    """Add an entry to the session's transaction; it is queued when the transaction commits."""
+    session.info.setdefault("audit_pending", []).append({
+        "entity": entity,
+        "entity_id": entity_id,
+        "action": action,
+        "changes": changes,
+        "actor": current_subject.get(),
+        "route": current_route(),
+        "created_at": datetime.utcnow(),
+        # Entries are written to the audit_log of the tenant's own database
+        "tenant": current_tenant.get(),
+    })
+
+
+def capture_patch(session: Session, obj, changes: Dict[str, Any]) -> None:
+    """Log a single-statement UPDATE of ``obj``; its previous values were not read, so only the new ones are."""
+    capture(
+        session, obj.__tablename__, obj.id, "update",
+        {key: [None, _jsonable(value)] for key, value in changes.items() if key not in REDACTED | IGNORED}
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _capture_flush(session, flush_context):
+    for obj in session.new:
+        if getattr(obj, "__tablename__", None) in AUDITED:
+            changes = {key: [None, value] for key, value in _values(obj).items() if value is not None}
+            capture(session, obj.__tablename__, obj.id, "create", changes)
+    for obj in session.dirty:
+        if getattr(obj, "__tablename__", None) in AUDITED and session.is_modified(obj):
+            changes = _diff(obj)
+            if changes:
+                capture(session, obj.__tablename__, obj.id, "update", changes)
+    for obj in session.deleted:
+        if getattr(obj, "__tablename__", None) in AUDITED:
+            changes = {key: [value, None] for key, value in _values(obj).items() if value is not None}
+            capture(session, obj.__tablename__, obj.id, "delete", changes)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _capture_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.local_table.name not in AUDITED:
+        return
+    if orm_execute_state.execution_options.get(SKIP_OPTION):
+        return
+    if orm_execute_state.is_insert:
+        parameters = orm_execute_state.parameters
+        action, changes = "bulk_insert", {"rows": len(parameters) if isinstance(parameters, list) else 1}
+    else:
+        action = "bulk_update" if orm_execute_state.is_update else "bulk_delete"
+        changes = {"statement": str(orm_execute_state.statement)}
+    capture(orm_execute_state.session, mapper.local_table.name, None, action, changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_committed(session):
+    pending = session.info.pop("audit_pending", None)
+    if pending and settings.AUDIT_ENABLED:
+        audit_queue.put(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("audit_pending", None)
+
+
+def _by_tenant(entries: List[dict]) -> Dict[Optional[str], List[dict]]:
+    by_tenant: Dict[Optional[str], List[dict]] = {}
+    for entry in entries:
+        by_tenant.setdefault(entry.get("tenant"), []).append(entry)
+    return by_tenant
+
+
+def _write_tenant(tenant: Optional[str], entries: List[dict]) -> None:
+    rows = [{key: value for key, value in entry.items() if key != "tenant"} for entry in entries]
+    with tenant_engines.get(tenant).begin() as conn:
+        conn.execute(insert(AuditLog.__table__), rows)
+
+
+def _write(entries: List[dict]) -> None:
+    for tenant, tenant_entries in _by_tenant(entries).items():
+        _write_tenant(tenant, tenant_entries)
+
+
+class AuditQueue:
+    """Bounded queue of audit entries, drained into ``audit_log`` by a background thread."""
+
+    def __init__(self, maxsize: int, batch_size: int, interval: float, fallback_path: str, max_attempts: int):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.interval = interval
+        self.fallback_path = fallback_path
+        self.max_attempts = max_attempts
+        # Writes failed in a row, per tenant
+        self._failures: Dict[Optional[str], int] = {}
+        self._entries: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, entries: List[dict]) -> None:
+        with self._lock:
+            self._entries.extend(entries)
+            overflow = [self._entries.popleft() for _ in range(max(0, len(self._entries) - self.maxsize))]
+        if overflow:
+            logger.warning("Audit queue full; spilling %s entries to %s", len(overflow), self.fallback_path)
+            self._spill(overflow)
+        self.start()
+        if len(self._entries) >= self.batch_size:
+            self._wake.set()
+
+    def start(self) -> None:
+        if self._thread is not None or self._stopping.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing audit entries failed; will retry")
+
+    def flush(self) -> int:
+        """Write queued entries in batches, one write per tenant in each batch.
+
+        A tenant whose write fails is not retried until the next flush; its
+        entries go back to the front of the queue while the other tenants'
+        are written. After ``max_attempts`` failures in a row they are spilled
+        to the fallback file instead.
+        """
+        written = 0
+        held: List[dict] = []
+        failed = set()
+        with self._flush_lock:
+            try:
+                while True:
+                    with self._lock:
+                        batch = [self._entries.popleft() for _ in range(min(self.batch_size, len(self._entries)))]
+                    if not batch:
+                        return written
+                    for tenant, entries in _by_tenant(batch).items():
+                        if tenant in failed:
+                            held.extend(entries)
+                            continue
+                        try:
+                            _write_tenant(tenant, entries)
+                        except Exception:
+                            failed.add(tenant)
+                            self._failures[tenant] = self._failures.get(tenant, 0) + 1
+                            if self._failures[tenant] < self.max_attempts:
+                                logger.exception("Writing audit entries of tenant %r failed; will retry", tenant)
+                                held.extend(entries)
+                            else:
+                                logger.exception(
+                                    "Writing audit entries of tenant %r failed %s times; spilling %s entries to %s",
+                                    tenant, self._failures[tenant], len(entries), self.fallback_path
+                                )
+                                self._failures.pop(tenant)
+                                self._spill(entries)
+                        else:
+                            self._failures.pop(tenant, None)
+                            written += len(entries)
+            finally:
+                if held:
+                    with self._lock:
+                        self._entries.extendleft(reversed(held))
+
+    def close(self) -> None:
+        """Stop the writer and flush; whatever cannot be written is spilled to the fallback file."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final audit flush failed")
+        with self._lock:
+            remaining = list(self._entries)
+            self._entries.clear()
+        if remaining:
+            self._spill(remaining)
+
+    def replay(self) -> int:
+        """Write the entries a previous process left in the fallback file."""
+        if not os.path.exists(self.fallback_path):
+            return 0
+        replaying = f"{self.fallback_path}.{os.getpid()}"
+        os.replace(self.fallback_path, replaying)
+        with open(replaying) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        for entry in entries:
+            entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+        written = 0
+        try:
+            for start in range(0, len(entries), self.batch_size):
+                _write(entries[start:start + self.batch_size])
+                written = start + self.batch_size
+        except Exception:
+            logger.exception("Replaying audit entries from %s failed", self.fallback_path)
+            self._spill(entries[written:])
+        os.remove(replaying)
+        return min(written, len(entries))
+
+    def _spill(self, entries: List[dict]) -> None:
+        with open(self.fallback_path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=_jsonable) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+audit_queue = AuditQueue(
+    settings.AUDIT_QUEUE_SIZE,
+    settings.AUDIT_BATCH_SIZE,
+    settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    settings.AUDIT_FALLBACK_PATH,
+    settings.AUDIT_MAX_ATTEMPTS,
+)
@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.db.audit import SKIP_OPTION, capture_patch
+from app.db.models import service_types, staff
+
+
+def patch_row(
+    db: Session,
+    model,
+    criteria: list,
+    changes: Dict[str, Any],
+    on_update: Optional[Callable[[Session, Any], None]] = None
+) -> Optional[Any]:
+    """Apply ``changes`` to the row matching ``criteria`` with a single UPDATE ... RETURNING.
+
+    Only columns whose value actually differs are compared, and the UPDATE
+    matches nothing when all of them are already equal, so unchanged rows
+    keep their ``updated_at``. Returns the updated (or unchanged) object,
+    or None when no row matches ``criteria``. ``on_update`` is called with
+    the updated object before the commit, so dependent writes share the
+    transaction.
+    """
+    if changes:
+        stmt = (
+            update(model)
+            .where(
+                *criteria,
+                or_(*[getattr(model, field).is_distinct_from(value) for field, value in changes.items()])
+            )
+            .values(**changes, updated_at=datetime.utcnow())
+            .returning(model)
+            .execution_options(**{SKIP_OPTION: True})
+        )
+        obj = db.execute(stmt).scalars().first()
+        if obj is not None:
+            capture_patch(db, obj, changes)
+            if on_update is not None:
+                on_update(db, obj)
+            # Detach before committing so the RETURNING values are not expired and reloaded
+            db.expunge(obj)
+            db.commit()
+            return obj
+        db.rollback()
+    return db.execute(select(model).where(*criteria)).scalars().first()
+
+
+def resolve_names(db: Session, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the ``service_type`` and ``handled_by`` names in ``fields`` with the ids rows store.
+
+    Service types that do not exist yet, and placeholder users for a
+    ``handled_by`` that matches no user's email or full name, are created in
+    ``db``'s transaction.
+    """
+    fields = dict(fields)
+    if "service_type" in fields:
+        fields["service_type_id"] = service_types.get_or_create(db, fields.pop("service_type"))
+    if "handled_by" in fields:
+        fields["handled_by_id"] = staff.get_or_create(db, fields.pop("handled_by"))
+    return fields
+
+
+def with_names(row) -> Dict[str, Any]:
+    """A service or series row as a dict, with its service type and staff member by name."""
+    row = dict(row)
+    row["service_type"] = service_types.name(row.get("service_type_id"))
+    row["handled_by"] = staff.name(row.get("handled_by_id"))
+    return row
@@ -0,0 +1,303 @@
+"""Per-customer booking aggregates, kept current as services are written.
+
+Every customer with a booking has one ``customer_stats`` row holding their
+visit count, lifetime spend and first and last visit, over their services
+that are not soft-deleted, live and archived, and have started. Bookings
+that have not started yet are counted apart, with the start of the next one.
+A customer without a row has no such service. Reading the row takes the same
+time however long the customer's history is.
+
+Rows are written in the transaction that writes the services:
+
+* services inserted by the ORM or a bulk INSERT add their price and start
+  to their customer's row;
+* a price change adds the difference;
+* any other change that can lower a row (a booking deleted, soft-deleted,
+  moved to another customer or to another time) recomputes the customers
+  involved from their services. Customers matched by a bulk UPDATE or
+  DELETE, whatever columns it sets, are recomputed just before the commit.
+
+Upcoming bookings start without anything being written, so a row stays as
+it is until ``roll_over`` recomputes it once its next visit has started. Run
+it every few minutes, as the ``roll_over_customer_stats`` job or with::
+
+    python -m app.db.customer_stats --roll-over [--tenant NAME]
+
+Core statements against the services table are not seen; code that runs
+them calls ``recompute`` itself. Rebuild every row with::
+
+    python -m app.db.customer_stats [--tenant NAME]
+"""
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import case, delete, event, func, insert, literal, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, attributes
+
+from app.db.archive import live_and_archived
+from app.db.jobs import job
+from app.db.models import CustomerStats, Service
+from app.db.session import add_tenant_argument, cli_session
+
+stats = CustomerStats.__table__
+services = Service.__table__
+
+# Service columns the aggregates depend on
+TRACKED = ("customer_id", "total_price", "start_time", "deleted_at")
+COLUMNS = [
+    "customer_id", "visit_count", "lifetime_spend", "first_visit", "last_visit", "upcoming_count", "next_visit",
+    "updated_at",
+]
+# Ids per IN list, within every backend's bound parameter limit
+BATCH_SIZE = 500
+
+
+def _aggregates(customer_ids: Optional[List[int]] = None):
+    rows = live_and_archived(Service)
+    now = datetime.utcnow()
+    # Bookings without a start time are neither visits nor upcoming
+    started = rows.c.start_time < now
+    upcoming = rows.c.start_time >= now
+    query = select(
+        rows.c.customer_id,
+        func.count(case((started, 1))),
+        func.coalesce(func.sum(case((started, rows.c.total_price))), 0.0),
+        func.min(case((started, rows.c.start_time))),
+        func.max(case((started, rows.c.start_time))),
+        func.count(case((upcoming, 1))),
+        func.min(case((upcoming, rows.c.start_time))),
+        literal(now),
+    ).group_by(rows.c.customer_id)
+    if customer_ids is None:
+        return query.where(rows.c.customer_id.is_not(None))
+    return query.where(rows.c.customer_id.in_(customer_ids))
+
+
+def recompute(connection: Connection, customer_ids: Iterable[Optional[int]]) -> None:
+    """Rewrite the rows of ``customer_ids`` from their services."""
+    customer_ids = sorted({customer_id for customer_id in customer_ids if customer_id is not None})
+    for start in range(0, len(customer_ids), BATCH_SIZE):
+        batch = customer_ids[start:start + BATCH_SIZE]
+        connection.execute(delete(stats).where(stats.c.customer_id.in_(batch)))
+        connection.execute(insert(stats).from_select(COLUMNS, _aggregates(batch)))
+
+
+def roll_over(db: Session) -> int:
+    """Recompute the customers whose next visit has started and commit; returns how many."""
+    due = db.execute(select(stats.c.customer_id).where(stats.c.next_visit <= datetime.utcnow())).scalars().all()
+    recompute(db.connection(), due)
+    db.commit()
+    return len(due)
+
+
+def rebuild(db: Session) -> int:
+    """Rewrite every row from the services and commit; returns the number of rows."""
+    db.execute(delete(stats))
+    db.execute(insert(stats).from_select(COLUMNS, _aggregates()))
+    db.commit()
+    return db.execute(select(func.count()).select_from(stats)).scalar()
+
+
+def _add(
+    deltas: Dict[int, dict],
+    customer_id: Optional[int],
+    bookings: int,
+    spend: Optional[float],
+    start: Optional[datetime]
+) -> None:
+    if customer_id is None or start is None:
+        return
+    delta = deltas.setdefault(customer_id, {
+        "visit_count": 0, "lifetime_spend": 0.0, "first_visit": None, "last_visit": None,
+        "upcoming_count": 0, "next_visit": None,
+    })
+    if start >= datetime.utcnow():
+        delta["upcoming_count"] += bookings
+        delta["next_visit"] = min(delta["next_visit"] or start, start)
+        return
+    delta["visit_count"] += bookings
+    delta["lifetime_spend"] += spend or 0.0
+    delta["first_visit"] = min(delta["first_visit"] or start, start)
+    delta["last_visit"] = max(delta["last_visit"] or start, start)
+
+
+def _increment(connection: Connection, deltas: Dict[int, dict]) -> None:
+    """Add ``deltas`` to their customers' rows, creating the missing ones."""
+    upsert = (postgresql if connection.dialect.name == "postgresql" else sqlite).insert(stats)
+    new = upsert.excluded
+    upsert = upsert.on_conflict_do_update(index_elements=[stats.c.customer_id], set_={
+        "visit_count": stats.c.visit_count + new.visit_count,
+        "lifetime_spend": stats.c.lifetime_spend + new.lifetime_spend,
+        "first_visit": case(
+            (or_(stats.c.first_visit.is_(None), new.first_visit < stats.c.first_visit), new.first_visit),
+            else_=stats.c.first_visit
+        ),
+        "last_visit": case(
+            (or_(stats.c.last_visit.is_(None), new.last_visit > stats.c.last_visit), new.last_visit),
+            else_=stats.c.last_visit
+        ),
+        "upcoming_count": stats.c.upcoming_count + new.upcoming_count,
+        "next_visit": case(
+            (or_(stats.c.next_visit.is_(None), new.next_visit < stats.c.next_visit), new.next_visit),
+            else_=stats.c.next_visit
+        ),
+        "updated_at": new.updated_at,
+    })
+    now = datetime.utcnow()
+    # Sorted, so concurrent transactions lock the rows in the same order
+    connection.execute(upsert, [
+        {"customer_id": customer_id, **delta, "updated_at": now} for customer_id, delta in sorted(deltas.items())
+    ])
+
+
+def _before(service: Service) -> Optional[dict]:
+    """The tracked values ``service`` had before this flush; None when one was never loaded."""
+    values = {}
+    for key in TRACKED:
+        history = attributes.get_history(service, key)
+        if history.deleted:
+            values[key] = history.deleted[0]
+        elif history.added:
+            return None
+        else:
+            values[key] = getattr(service, key)
+    return values
+
+
+@event.listens_for(Session, "before_flush")
+def _load_previous_customers(session, flush_context, instances):
+    # Services changed or deleted without their tracked columns loaded; what
+    # they held is still in the database until the flush
+    unknown = [
+        obj.id for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, Service) and obj.id is not None and _before(obj) is None
+    ]
+    if unknown:
+        session.info.setdefault("customer_stats_stale", set()).update(
+            session.connection().execute(select(services.c.customer_id).where(services.c.id.in_(unknown))).scalars()
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_flush(session, flush_context):
+    deltas: Dict[int, dict] = {}
+    stale: Set[int] = session.info.pop("customer_stats_stale", set())
+    for obj in session.new:
+        if isinstance(obj, Service) and obj.deleted_at is None:
+            _add(deltas, obj.customer_id, 1, obj.total_price, obj.start_time)
+    for obj in session.dirty:
+        if not isinstance(obj, Service):
+            continue
+        before = _before(obj)
+        after = {key: getattr(obj, key) for key in TRACKED}
+        if before is None:
+            stale.add(after["customer_id"])
+        elif before == after:
+            continue
+        elif before["deleted_at"] is not None:
+            if after["deleted_at"] is None:
+                _add(deltas, after["customer_id"], 1, after["total_price"], after["start_time"])
+        elif (
+            after["deleted_at"] is None
+            and before["customer_id"] == after["customer_id"]
+            and before["start_time"] == after["start_time"]
+        ):
+            _add(
+                deltas, after["customer_id"], 0,
+                (after["total_price"] or 0.0) - (before["total_price"] or 0.0), after["start_time"]
+            )
+        else:
+            stale.update((before["customer_id"], after["customer_id"]))
+    for obj in session.deleted:
+        if isinstance(obj, Service):
+            before = _before(obj)
+            if before is not None and before["deleted_at"] is None:
+                stale.add(before["customer_id"])
+    stale.discard(None)
+    # A recomputed row already counts everything flushed so far
+    deltas = {customer_id: delta for customer_id, delta in deltas.items() if customer_id not in stale}
+    if stale or deltas:
+        connection = session.connection()
+        if stale:
+            recompute(connection, stale)
+        if deltas:
+            _increment(connection, deltas)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _capture_bulk_services(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Service:
+        return
+    session = orm_execute_state.session
+    if orm_execute_state.is_insert:
+        parameters = orm_execute_state.parameters
+        deltas: Dict[int, dict] = {}
+        for row in parameters if isinstance(parameters, list) else [parameters or {}]:
+            if row.get("deleted_at") is None:
+                _add(deltas, row.get("customer_id"), 1, row.get("total_price"), row.get("start_time"))
+        if deltas:
+            # The INSERT follows on the same connection, before anything can read the rows
+            _increment(session.connection(), deltas)
+        return
+    statement, parameters = orm_execute_state.statement, orm_execute_state.parameters
+    # Which rows match is only known before the statement runs, and where
+    # they end up only after it, so both sides are recomputed at the commit.
+    # The columns an UPDATE sets are not exposed by the statement's public
+    # API, so its rows are recomputed whether or not it sets TRACKED ones
+    query = select(services.c.id, services.c.customer_id)
+    if isinstance(parameters, list):
+        query = query.where(services.c.id.in_([row["id"] for row in parameters]))
+    elif statement.whereclause is not None:
+        query = query.where(statement.whereclause)
+    matched = session.connection().execute(query).all()
+    session.info.setdefault("customer_stats_stale", set()).update(customer_id for _, customer_id in matched)
+    if orm_execute_state.is_update:
+        session.info.setdefault("customer_stats_matched", set()).update(service_id for service_id, _ in matched)
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_bulk(session):
+    stale = session.info.pop("customer_stats_stale", set())
+    matched = sorted(session.info.pop("customer_stats_matched", ()))
+    if not (stale or matched):
+        return
+    connection = session.connection()
+    for start in range(0, len(matched), BATCH_SIZE):
+        stale.update(connection.execute(
+            select(services.c.customer_id).where(services.c.id.in_(matched[start:start + BATCH_SIZE]))
+        ).scalars())
+    recompute(connection, stale)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    if not session.in_transaction():
+        session.info.pop("customer_stats_stale", None)
+        session.info.pop("customer_stats_matched", None)
+
+
+@job("roll_over_customer_stats")
+def run_roll_over_customer_stats(db: Session, ctx, payload: dict) -> Dict[str, int]:
+    return {"customers": roll_over(db)}
+
+
+@job("rebuild_customer_stats")
+def run_rebuild_customer_stats(db: Session, ctx, payload: dict) -> Dict[str, int]:
+    return {"customers": rebuild(db)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_tenant_argument(parser)
+    parser.add_argument(
+        "--roll-over", action="store_true", help="only recompute the customers whose next visit has started"
+    )
+    args = parser.parse_args()
+    with cli_session(args.tenant) as db:
+        print({"customers": roll_over(db) if args.roll_over else rebuild(db)})
@@ -0,0 +1,315 @@
+"""Find and merge duplicate customers.
+
+Customers are only compared with others that share a blocking key: their
+normalized email, the digits of their phone number or their sorted name
+tokens. Pairs scoring at least ``DEDUPE_THRESHOLD`` are clustered, and every
+cluster is merged into its oldest customer: services, archived services and
+series are re-pointed with one UPDATE per table, blank fields of the survivor
+are filled from its duplicates, and the duplicates are deleted. The whole
+merge is one transaction.
+
+Without ``--apply`` nothing is written and a report of what would be merged
+is printed::
+
+    python -m app.db.dedupe [--apply] [--tenant NAME]
+"""
+import argparse
+import json
+import re
+from collections import defaultdict
+from datetime import datetime
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.audit import SKIP_OPTION, capture
+from app.db.customer_stats import recompute
+from app.db.jobs import job
+from app.db.models import Customer, Service, ServiceSeries, Tombstone, services_archive
+from app.db.session import add_tenant_argument, cli_session
+
+# Clusters listed in full in the report
+SAMPLE_SIZE = 100
+# Names less alike than this never match, so a shared mailbox, phone and
+# address (a household) do not merge different people
+MIN_NAME_SIMILARITY = 0.75
+# Customer fields filled on the survivor when it has none
+FILLED = ("email", "phone", "address")
+
+# Duplicate -> survivor, filled per run on the merging connection
+merges = Table(
+    "customer_merges",
+    MetaData(),
+    Column("duplicate_id", Integer, primary_key=True),
+    Column("survivor_id", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+class Normalized(NamedTuple):
+    email: Optional[str]
+    phone: Optional[str]
+    name: Optional[str]
+    address: Optional[str]
+
+
+def _words(value: Optional[str]) -> List[str]:
+    return re.findall(r"[^\W_]+", (value or "").lower())
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lowercase and drop ``+tag`` suffixes, so aliases of one mailbox match."""
+    email = (email or "").strip().lower()
+    local, at, domain = email.partition("@")
+    if not at:
+        return email or None
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """The last ten digits, so numbers with and without a country code match."""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def normalize(name: Optional[str], email: Optional[str], phone: Optional[str], address: Optional[str]) -> Normalized:
+    return Normalized(
+        email=normalize_email(email),
+        phone=normalize_phone(phone),
+        # Token order is ignored, so "Smith, Jane" matches "Jane Smith"
+        name=" ".join(sorted(_words(name))) or None,
+        address=" ".join(_words(address)) or None,
+    )
+
+
+def blocking_keys(customer: Normalized) -> List[int]:
+    # Hashed to keep the blocks of millions of customers small; a collision
+    # only costs a comparison that then scores low
+    keys = []
+    for kind, value in (("email", customer.email), ("phone", customer.phone), ("name", customer.name)):
+        if value:
+            keys.append(hash((kind, value)))
+    return keys
+
+
+def score(a: Normalized, b: Normalized) -> float:
+    """Similarity in 0..1; a shared email or phone alone is not enough, nor is the name alone.
+
+    Customers whose names are missing or less alike than
+    ``MIN_NAME_SIMILARITY`` score 0, however many contact details they share.
+    """
+    if not (a.name and b.name):
+        return 0.0
+    similarity = SequenceMatcher(None, a.name, b.name).ratio()
+    if similarity < MIN_NAME_SIMILARITY:
+        return 0.0
+    # Squared, so relatives sharing a surname and a mailbox stay apart
+    total = 0.5 * similarity ** 2
+    if a.email and a.email == b.email:
+        total += 0.5
+    if a.phone and a.phone == b.phone:
+        total += 0.4
+    if a.address and a.address == b.address:
+        total += 0.3
+    return min(total, 1.0)
+
+
+def _blocks(db: Session, batch_size: int) -> Tuple[int, List[List[int]]]:
+    """Customer count and the blocks of customer ids worth comparing."""
+    blocks: Dict[int, List[int]] = defaultdict(list)
+    scanned = 0
+    rows = db.execute(
+        select(Customer.id, Customer.name, Customer.email, Customer.phone, Customer.address)
+        .execution_options(yield_per=batch_size)
+    )
+    for customer_id, name, email, phone, address in rows:
+        scanned += 1
+        for key in blocking_keys(normalize(name, email, phone, address)):
+            blocks[key].append(customer_id)
+    max_size = settings.DEDUPE_MAX_BLOCK_SIZE
+    return scanned, [ids for ids in blocks.values() if 1 < len(ids) <= max_size]
+
+
+def _candidates(db: Session, ids: List[int], batch_size: int) -> Dict[int, tuple]:
+    """id -> (row, normalized) of the customers that share a block with another."""
+    candidates = {}
+    for start in range(0, len(ids), batch_size):
+        for row in db.execute(
+            select(Customer.id, Customer.name, Customer.email, Customer.phone, Customer.address)
+            .where(Customer.id.in_(ids[start:start + batch_size]))
+        ):
+            candidates[row.id] = (row, normalize(row.name, row.email, row.phone, row.address))
+    return candidates
+
+
+def find_clusters(db: Session, threshold: float, batch_size: int) -> Tuple[Dict[str, int], List[dict]]:
+    """Scan customers and return counts plus clusters of ``survivor``, ``duplicates`` and ``score``."""
+    scanned, blocks = _blocks(db, batch_size)
+    candidates = _candidates(db, sorted({i for ids in blocks for i in ids}), batch_size)
+
+    parent: Dict[int, int] = {}
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = set()
+    weakest: Dict[int, float] = {}
+    for ids in blocks:
+        for a, b in combinations(sorted(ids), 2):
+            if (a, b) in compared:
+                continue
+            compared.add((a, b))
+            pair_score = score(candidates[a][1], candidates[b][1])
+            if pair_score < threshold:
+                continue
+            parent.setdefault(a, a)
+            parent.setdefault(b, b)
+            ra, rb = root(a), root(b)
+            if ra != rb:
+                # The oldest customer of a cluster is its root, and its survivor
+                ra, rb = min(ra, rb), max(ra, rb)
+                parent[rb] = ra
+                weakest[ra] = min(pair_score, weakest.get(ra, 1.0), weakest.pop(rb, 1.0))
+
+    members: Dict[int, List[int]] = defaultdict(list)
+    for i in parent:
+        members[root(i)].append(i)
+    clusters = [
+        {
+            "survivor": survivor,
+            "duplicates": sorted(i for i in ids if i != survivor),
+            "score": round(weakest[survivor], 3),
+            "customers": [dict(candidates[i][0]._mapping) for i in sorted(ids)],
+        }
+        for survivor, ids in sorted(members.items())
+    ]
+    counts = {"customers": scanned, "blocks": len(blocks), "compared": len(compared)}
+    return counts, clusters
+
+
+def _fills(cluster: dict) -> dict:
+    survivor, *duplicates = cluster["customers"]
+    values = {}
+    for field in FILLED:
+        if not survivor[field]:
+            value = next((d[field] for d in duplicates if d[field]), None)
+            if value:
+                values[field] = value
+    return values
+
+
+def merge(db: Session, clusters: List[dict], batch_size: int, dry_run: bool = True) -> Dict[str, int]:
+    """Merge ``clusters`` in one transaction; with ``dry_run`` it is rolled back.
+
+    Returns the number of rows that were (or would be) re-pointed per table.
+    """
+    now = datetime.utcnow()
+    conn = db.connection()
+    # SQLite can roll back the DROP below and leave the table on this pooled connection
+    merges.drop(conn, checkfirst=True)
+    merges.create(conn)
+    try:
+        rows = [
+            {"duplicate_id": duplicate, "survivor_id": cluster["survivor"]}
+            for cluster in clusters for duplicate in cluster["duplicates"]
+        ]
+        for start in range(0, len(rows), batch_size):
+            db.execute(insert(merges), rows[start:start + batch_size])
+
+        duplicates = select(merges.c.duplicate_id)
+        moved = {}
+        for table in (Service.__table__, services_archive, ServiceSeries.__table__):
+            matched = table.c.customer_id.in_(duplicates)
+            if dry_run:
+                moved[table.name] = db.execute(select(func.count()).select_from(table).where(matched)).scalar()
+                continue
+            survivor = select(merges.c.survivor_id).where(merges.c.duplicate_id == table.c.customer_id).scalar_subquery()
+            moved[table.name] = db.execute(
+                update(table).where(matched).values(customer_id=survivor, updated_at=now),
+                execution_options={SKIP_OPTION: True}
+            ).rowcount
+
+        if not dry_run:
+            # Core statements, unseen by the customer_stats listeners
+            recompute(conn, [
+                customer for cluster in clusters for customer in (cluster["survivor"], *cluster["duplicates"])
+            ])
+            fills = []
+            for cluster in clusters:
+                values = _fills(cluster)
+                if values:
+                    fills.append({"id": cluster["survivor"], "updated_at": now, **values})
+                capture(db, "customers", cluster["survivor"], "merge", {
+                    "duplicates": cluster["duplicates"], "score": cluster["score"], "filled": sorted(values),
+                })
+            if fills:
+                db.execute(update(Customer), fills, execution_options={SKIP_OPTION: True})
+            # A bulk delete skips the ORM's tombstones, so sync clients get them here
+            db.execute(insert(Tombstone).from_select(
+                ["entity", "entity_id", "deleted_at"],
+                select(literal("customers"), merges.c.duplicate_id, literal(now))
+            ))
+            db.execute(
+                delete(Customer).where(Customer.id.in_(duplicates)),
+                execution_options={SKIP_OPTION: True, "synchronize_session": False}
+            )
+    except Exception:
+        # On Postgres the failed transaction accepts no DROP until it is rolled
+        # back, which also undoes the CREATE; SQLite may keep the table, and the
+        # next merge drops it first
+        db.rollback()
+        raise
+    merges.drop(conn)
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+    return moved
+
+
+def dedupe_customers(
+    db: Session,
+    dry_run: bool = True,
+    threshold: Optional[float] = None,
+    progress=None
+) -> dict:
+    """Find duplicate customers and merge them, or only report them with ``dry_run``."""
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    batch_size = settings.DEDUPE_BATCH_SIZE
+    if progress:
+        progress(0.0, "Finding duplicate customers")
+    counts, clusters = find_clusters(db, threshold, batch_size)
+    if progress:
+        progress(0.5, f"{'Counting' if dry_run else 'Merging'} {len(clusters)} clusters")
+    moved = merge(db, clusters, batch_size, dry_run) if clusters else {}
+    return {
+        "dry_run": dry_run,
+        "threshold": threshold,
+        **counts,
+        "clusters": len(clusters),
+        "duplicates": sum(len(cluster["duplicates"]) for cluster in clusters),
+        "moved": moved,
+        "sample": clusters[:SAMPLE_SIZE],
+    }
+
+
+@job("dedupe_customers")
+def run_dedupe_customers(db: Session, ctx, payload: dict) -> dict:
+    return dedupe_customers(db, payload.get("dry_run", True), payload.get("threshold"), ctx.progress)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="merge the duplicates instead of reporting them")
+    parser.add_argument("--threshold", type=float, help=f"minimum pair score (default {settings.DEDUPE_THRESHOLD})")
+    add_tenant_argument(parser)
+    args = parser.parse_args()
+    with cli_session(args.tenant) as db:
+        print(json.dumps(dedupe_customers(db, not args.apply, args.threshold), indent=2, default=str))
@@ -0,0 +1,167 @@
+"""Slow-query log with asynchronous EXPLAIN capture.
+
+Statements slower than ``SLOW_QUERY_THRESHOLD_MS`` are grouped by a
+normalized SQL fingerprint (literals and IN-lists stripped), and for each
+new fingerprint the query plan is captured on a background thread so the
+request that ran the slow statement is not delayed further.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.context import current_route
+
+logger = logging.getLogger(__name__)
+
+# Connections used to capture plans are tagged so their statements are not timed
+SKIP_KEY = "diagnostics_skip"
+MAX_ROUTES_PER_ENTRY = 10
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|:\w+|\$\d+|%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?+)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize(statement).encode()).hexdigest()[:16]
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> Any:
+    """Describe bound parameters by type only, never by value."""
+    if executemany:
+        rows = list(parameters or [])
+        return {"executemany": len(rows), "row": parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+
+    def record(
+        self,
+        engine: Engine,
+        statement: str,
+        parameters: Any,
+        executemany: bool,
+        duration_ms: float
+    ) -> None:
+        key = fingerprint(statement)
+        route = current_route()
+        with self._lock:
+            entry = self._entries.get(key)
+            is_new = entry is None
+            if is_new:
+                entry = {
+                    "fingerprint": key,
+                    "sql": normalize(statement),
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "parameter_shape": parameter_shape(parameters, executemany),
+                    "routes": [],
+                    "plan": None,
+                    "first_seen": datetime.utcnow().isoformat(),
+                }
+                self._entries[key] = entry
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_seen"] = datetime.utcnow().isoformat()
+            if route and route not in entry["routes"] and len(entry["routes"]) < MAX_ROUTES_PER_ENTRY:
+                entry["routes"].append(route)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if is_new:
+            logger.warning("Slow query (%.1f ms) from %s: %s", duration_ms, route, entry["sql"])
+            if settings.SLOW_QUERY_EXPLAIN and not executemany:
+                self._explainer.submit(self._explain, engine, key, statement, parameters)
+
+    def _explain(self, engine: Engine, key: str, statement: str, parameters: Any) -> None:
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            return
+        prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            with engine.connect() as conn:
+                conn.info[SKIP_KEY] = True
+                try:
+                    rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+                finally:
+                    conn.info.pop(SKIP_KEY, None)
+                    conn.rollback()
+        except Exception as exc:
+            plan: List[str] = [f"EXPLAIN failed: {exc}"]
+        else:
+            plan = [" | ".join(str(col) for col in row) for row in rows]
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]["plan"] = plan
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = [dict(entry, routes=list(entry["routes"])) for entry in self._entries.values()]
+        for entry in entries:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 3)
+        return sorted(entries, key=lambda entry: entry["total_ms"], reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_queries = SlowQueryLog(settings.SLOW_QUERY_MAX_ENTRIES)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS and not conn.info.get(SKIP_KEY):
+        slow_queries.record(conn.engine, statement, parameters, executemany, duration_ms)
+
+
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection else None
+    if started:
+        started.pop()
+
+
+def install(engine: Engine) -> None:
+    """Time every statement run through ``engine``."""
+    if not settings.SLOW_QUERY_LOG_ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
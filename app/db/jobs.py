@@ -0,0 +1,263 @@
+"""Database-backed background job queue.
+
+Jobs are rows in the ``jobs`` table. A worker claims the highest-priority
+due job with a single ``UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP
+LOCKED)``, so concurrent workers on Postgres never wait on each other's rows.
+SQLite has no row locks; there the same statement is atomic because writers
+are serialized. Failed attempts are retried with exponential backoff, and a
+job whose worker stops sending heartbeats is handed to another worker.
+
+Run one or more workers next to the web processes, with the same settings::
+
+    python -m app.db.jobs
+
+A worker takes jobs from the default database and every tenant database in
+turn; ``--tenant`` limits it to the given tenants.
+"""
+import argparse
+import importlib
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.context import current_tenant
+from app.db.audit import audit_queue
+from app.db.models import Job, JobStatus
+from app.db.session import tenant_session
+
+logger = logging.getLogger(__name__)
+
+# Modules whose @job handlers are registered on import
+HANDLER_MODULES = ("app.db.archive", "app.db.customer_stats", "app.db.dedupe", "app.db.recurrence")
+# Progress is written at most this often, apart from completion
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+handlers: Dict[str, Callable[[Session, "JobContext", Dict[str, Any]], Any]] = {}
+
+
+def job(name: str):
+    """Register ``handler(db, ctx, payload)`` as the job called ``name``.
+
+    The handler's return value must be JSON serializable and is stored as the
+    job's result.
+    """
+    def register(handler):
+        handlers[name] = handler
+        return handler
+    return register
+
+
+def load_handlers() -> None:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def enqueue(
+    db: Session,
+    name: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    max_attempts: Optional[int] = None,
+    run_at: Optional[datetime] = None,
+    created_by: Optional[int] = None
+) -> Job:
+    load_handlers()
+    if name not in handlers:
+        raise ValueError(f"Unknown job: {name}")
+    queued = Job(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=run_at or datetime.utcnow(),
+        created_by=created_by,
+    )
+    db.add(queued)
+    db.commit()
+    db.refresh(queued)
+    return queued
+
+
+def claim(db: Session, worker_id: str) -> Optional[Job]:
+    """Lock the next due job for ``worker_id`` and return it, or None when idle."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    due = or_(
+        and_(Job.status == JobStatus.QUEUED, Job.run_at <= now),
+        and_(Job.status == JobStatus.RUNNING, Job.heartbeat_at < stale),
+    )
+    candidate = (
+        select(Job.id)
+        .where(due)
+        .order_by(Job.priority.desc(), Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    job_id = db.execute(
+        update(Job)
+        .where(Job.id == candidate, due)
+        .values(
+            status=JobStatus.RUNNING,
+            locked_by=worker_id,
+            heartbeat_at=now,
+            started_at=func.coalesce(Job.started_at, now),
+            attempts=Job.attempts + 1,
+        )
+        .returning(Job.id),
+        execution_options={"synchronize_session": False}
+    ).scalar()
+    db.commit()
+    return db.get(Job, job_id) if job_id is not None else None
+
+
+class JobContext:
+    """Handed to job handlers to report progress on the running job."""
+
+    def __init__(self, job_id: int, worker_id: str, tenant: Optional[str] = None):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.tenant = tenant
+        self._last_write = 0.0
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """Record progress in 0..1; written on its own transaction so pollers see it."""
+        now = time.monotonic()
+        if fraction < 1 and now - self._last_write < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+        self._write(progress=min(max(fraction, 0.0), 1.0), progress_message=message)
+
+    def heartbeat(self) -> None:
+        self._write()
+
+    def _write(self, **values) -> None:
+        with tenant_session(self.tenant) as db:
+            db.execute(
+                update(Job)
+                .where(Job.id == self.job_id, Job.locked_by == self.worker_id)
+                .values(heartbeat_at=datetime.utcnow(), **values)
+            )
+            db.commit()
+
+
+class Worker:
+    def __init__(self, worker_id: Optional[str] = None, tenants: Optional[List[Optional[str]]] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        # Databases polled, None being the default one
+        self.tenants = tenants if tenants is not None else [None, *sorted(settings.TENANT_DATABASE_URLS)]
+        self.stopping = threading.Event()
+
+    def run(self, burst: bool = False) -> None:
+        """Run jobs until stopped; with ``burst``, stop once the queue is empty."""
+        load_handlers()
+        logger.info("Job worker %s started", self.worker_id)
+        while not self.stopping.is_set():
+            if not self.run_once():
+                if burst:
+                    break
+                self.stopping.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+        logger.info("Job worker %s stopped", self.worker_id)
+
+    def run_once(self) -> bool:
+        """Run at most one due job from each database; False when none had one."""
+        ran = False
+        for tenant in self.tenants:
+            if self.stopping.is_set():
+                break
+            # Handlers and the audit trail they write see the job's tenant
+            token = current_tenant.set(tenant)
+            try:
+                with tenant_session(tenant) as db:
+                    claimed = claim(db, self.worker_id)
+                    if claimed is not None:
+                        self._execute(db, claimed, tenant)
+                        ran = True
+            finally:
+                current_tenant.reset(token)
+        return ran
+
+    def _execute(self, db: Session, claimed: Job, tenant: Optional[str] = None) -> None:
+        job_id, name, attempts, max_attempts = claimed.id, claimed.name, claimed.attempts, claimed.max_attempts
+        if attempts > max_attempts:
+            self._finish(db, job_id, JobStatus.FAILED, error="Worker stopped responding on the last attempt")
+            return
+        handler = handlers.get(name)
+        if handler is None:
+            self._finish(db, job_id, JobStatus.FAILED, error=f"No handler registered for {name}")
+            return
+
+        ctx = JobContext(job_id, self.worker_id, tenant)
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(ctx, done), daemon=True)
+        beat.start()
+        logger.info("Running job %s (%s) for tenant %s, attempt %s", job_id, name, tenant or "default", attempts)
+        try:
+            result = handler(db, ctx, dict(claimed.payload or {}))
+        except Exception:
+            db.rollback()
+            error = traceback.format_exc()
+            logger.exception("Job %s (%s) failed on attempt %s", job_id, name, attempts)
+            if attempts < max_attempts:
+                backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+                self._finish(
+                    db, job_id, JobStatus.QUEUED, error=error,
+                    run_at=datetime.utcnow() + timedelta(seconds=backoff)
+                )
+            else:
+                self._finish(db, job_id, JobStatus.FAILED, error=error)
+        else:
+            self._finish(db, job_id, JobStatus.SUCCEEDED, result=result, error=None, progress=1.0)
+        finally:
+            done.set()
+            beat.join()
+
+    def _heartbeat(self, ctx: JobContext, done: threading.Event) -> None:
+        interval = settings.JOB_LOCK_TIMEOUT_SECONDS / 3
+        while not done.wait(interval):
+            try:
+                ctx.heartbeat()
+            except Exception:
+                logger.exception("Heartbeat for job %s failed", ctx.job_id)
+
+    def _finish(self, db: Session, job_id: int, job_status: JobStatus, **values) -> None:
+        if job_status != JobStatus.QUEUED:
+            values["finished_at"] = datetime.utcnow()
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.locked_by == self.worker_id)
+            .values(status=job_status, locked_by=None, **values)
+        )
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", action="store_true", help="exit once the queue is empty")
+    parser.add_argument(
+        "--tenant", action="append", choices=sorted(settings.TENANT_DATABASE_URLS),
+        help="only run this tenant's jobs (repeatable; default: the default database and every tenant)"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    audit_queue.replay()
+    worker = Worker(tenants=args.tenant)
+    # Finish the current job, then exit
+    signal.signal(signal.SIGTERM, lambda *_: worker.stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: worker.stopping.set())
+    worker.run(burst=args.burst)
+
+
+if __name__ == "__main__":
+    main()
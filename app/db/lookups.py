@@ -0,0 +1,117 @@
+"""Two-way maps between the names the API uses and the small integer keys rows store.
+
+Services store ``service_type_id`` and ``handled_by_id`` instead of repeating
+the strings on every row, while requests and responses keep the names. The
+maps of a tenant are loaded whole on first use, since the tables behind them
+are small, and reloaded when a name or id is missing, so rows added by other
+processes are found. Reads use their own short session on the tenant's
+primary, so a caller's uncommitted rows never end up in the cache; pass the
+caller's session to ``name`` and ``id`` to also find the rows it inserted.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import Table, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.context import current_tenant
+from app.db.session import tenant_session
+
+
+class Lookup:
+    """Ids and names of a small table's rows, cached per tenant.
+
+    ``query`` selects ``(id, name, *aliases)``. An id is found by its name or
+    any alias; when several rows share one, the first row wins. With
+    ``table`` set, ``get_or_create`` inserts names that are not there yet,
+    as the row ``values(name)`` returns (by default just the name).
+    """
+
+    def __init__(
+        self,
+        query: Select,
+        table: Optional[Table] = None,
+        ttl: Optional[float] = None,
+        values: Optional[Callable[[str], Dict[str, Any]]] = None
+    ):
+        self._query = query
+        self._table = table
+        self._values = values or (lambda name: {"name": name})
+        self._cache = LRUCache(maxsize=settings.TENANT_ENGINE_CACHE_SIZE + 1, ttl=ttl)
+
+    def _maps(self, reload: bool = False) -> Tuple[Dict[str, int], Dict[int, str]]:
+        tenant = current_tenant.get()
+        maps = None if reload else self._cache.get(tenant)
+        if maps is None:
+            ids, names = {}, {}
+            with tenant_session(tenant) as db:
+                for id_, name, *aliases in db.execute(self._query):
+                    names[id_] = name
+                    for key in (name, *aliases):
+                        if key is not None:
+                            ids.setdefault(key, id_)
+            maps = (ids, names)
+            self._cache.set(tenant, maps)
+        return maps
+
+    def expire(self) -> None:
+        self._cache.pop(current_tenant.get())
+
+    def _created(self, db: Optional[Session]) -> Dict[str, int]:
+        """Names ``get_or_create`` inserted in ``db``'s transaction, not committed yet."""
+        if db is None:
+            return {}
+        return {name: id_ for (lookup, name), id_ in db.info.get("lookups_created", {}).items() if lookup is self}
+
+    def name(self, id_: Optional[int], db: Optional[Session] = None) -> Optional[str]:
+        if id_ is None:
+            return None
+        name = self._maps()[1].get(id_)
+        if name is None:
+            name = next((name for name, created in self._created(db).items() if created == id_), None)
+        return name if name is not None else self._maps(reload=True)[1].get(id_)
+
+    def id(self, name: Optional[str], db: Optional[Session] = None) -> Optional[int]:
+        if name is None:
+            return None
+        id_ = self._maps()[0].get(name)
+        if id_ is None:
+            id_ = self._created(db).get(name)
+        return id_ if id_ is not None else self._maps(reload=True)[0].get(name)
+
+    def get_or_create(self, db: Session, name: Optional[str]) -> Optional[int]:
+        """Id of ``name``, inserting it in ``db``'s transaction when it is new."""
+        id_ = self.id(name, db)
+        if id_ is not None or name is None:
+            return id_
+        created = db.info.setdefault("lookups_created", {})
+        values = self._values(name)
+        try:
+            # A concurrent request may insert the same name first
+            with db.begin_nested():
+                id_ = db.execute(insert(self._table).values(**values).returning(self._table.c.id)).scalar_one()
+        except IntegrityError:
+            id_ = db.execute(
+                select(self._table.c.id).where(*[self._table.c[key] == value for key, value in values.items()])
+            ).scalar_one()
+        created[(self, name)] = id_
+        return id_
+
+
+@event.listens_for(Session, "after_commit")
+def _expire_created(session):
+    if session.in_nested_transaction():
+        # Releasing get_or_create's savepoint; the rows are not committed yet
+        return
+    # Reloaded on next use, so the cache only ever holds committed rows
+    for lookup, _ in session.info.pop("lookups_created", {}):
+        lookup.expire()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_created(session):
+    if not session.in_nested_transaction():
+        session.info.pop("lookups_created", None)
@@ -0,0 +1,381 @@
+"""Helpers for migrations that must not stall writes on large tables.
+
+Use these instead of the plain ``op`` calls in revisions that touch big
+tables such as ``services`` and ``tasks``:
+
+* ``create_index_concurrently`` / ``drop_index_concurrently`` build and drop
+  indexes without blocking writes on Postgres.
+* ``add_foreign_key`` checks the existing rows without blocking writes.
+* ``backfill`` fills a column in primary-key batches, each committed on its
+  own with a pause in between, and resumes from its last batch when rerun.
+
+Before ``alembic upgrade`` runs anything, ``alembic/env.py`` renders the
+pending revisions to SQL and estimates how long each would hold locks that
+block writes, from the statements and the tables' row counts. A revision
+over ``MIGRATION_LOCK_BUDGET_SECONDS`` stops the upgrade, and so does one
+that cannot be rendered without a database. The same check can gate a
+deploy on its own::
+
+    python -m app.db.migrations [--budget SECONDS] [--allow-unestimated]
+"""
+import argparse
+import io
+import logging
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import sqlalchemy as sa
+from alembic import op
+from alembic.config import Config
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from alembic.script import Script, ScriptDirectory
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough throughput of the work done while holding a lock that blocks writes
+INDEX_BUILD_ROWS_PER_SECOND = 500_000
+TABLE_REWRITE_ROWS_PER_SECOND = 200_000
+TABLE_SCAN_ROWS_PER_SECOND = 2_000_000
+UPDATE_ROWS_PER_SECOND = 100_000
+
+_TABLE = r'"?(?P<table>\w+)"?'
+# (pattern, rows per second); None marks statements that do not block writes
+LOCK_RULES = [
+    (r"^(CREATE|DROP) (UNIQUE )?INDEX CONCURRENTLY", None),
+    (rf"^CREATE (UNIQUE )?INDEX .*? ON {_TABLE}", INDEX_BUILD_ROWS_PER_SECOND),
+    (rf"^ALTER TABLE {_TABLE} ALTER COLUMN \S+ (SET DATA )?TYPE", TABLE_REWRITE_ROWS_PER_SECOND),
+    (rf"^ALTER TABLE {_TABLE} ALTER COLUMN \S+ SET NOT NULL", TABLE_SCAN_ROWS_PER_SECOND),
+    (rf"^ALTER TABLE {_TABLE} ADD CONSTRAINT \S+ (UNIQUE|PRIMARY KEY)", INDEX_BUILD_ROWS_PER_SECOND),
+    (rf"^ALTER TABLE {_TABLE} ADD CONSTRAINT (?!.*NOT VALID)", TABLE_SCAN_ROWS_PER_SECOND),
+    # SQLite's batch mode copies the whole table
+    (r"^INSERT INTO _alembic_tmp_(?P<table>\w+)", TABLE_REWRITE_ROWS_PER_SECOND),
+    (rf"^UPDATE {_TABLE}", UPDATE_ROWS_PER_SECOND),
+    (rf"^DELETE FROM {_TABLE}", UPDATE_ROWS_PER_SECOND),
+]
+_RULES = [(re.compile(pattern, re.IGNORECASE | re.DOTALL), rate) for pattern, rate in LOCK_RULES]
+_COMMENT = re.compile(r"^\s*--[^\n]*\n", re.MULTILINE)
+
+# Progress of backfills, so an interrupted one resumes where it stopped
+backfills = sa.Table(
+    "migration_backfills",
+    sa.MetaData(),
+    sa.Column("name", sa.String, primary_key=True),
+    sa.Column("last_id", sa.Integer, nullable=False),
+    sa.Column("finished_at", sa.DateTime),
+    sa.Column("updated_at", sa.DateTime),
+)
+
+
+class LockBudgetExceeded(Exception):
+    pass
+
+
+def prepare_connection(connection: Connection) -> None:
+    """Make DDL give up instead of queueing every other writer behind a long transaction."""
+    if connection.dialect.name == "postgresql":
+        timeout_ms = int(settings.MIGRATION_LOCK_TIMEOUT_SECONDS * 1000)
+        connection.exec_driver_sql(f"SET lock_timeout = {timeout_ms}")
+
+
+def create_index_concurrently(
+    index_name: str,
+    table_name: str,
+    columns: List[str],
+    unique: bool = False,
+    **kw
+) -> None:
+    """``op.create_index`` that lets writes continue while the index is built on Postgres.
+
+    CONCURRENTLY cannot run inside a transaction, so the build runs in an
+    autocommit block. An invalid index left behind by an interrupted build is
+    dropped first, so rerunning the revision retries it. Other databases get
+    a plain CREATE INDEX.
+    """
+    context = op.get_context()
+    if context.dialect.name != "postgresql":
+        op.create_index(index_name, table_name, columns, unique=unique, **kw)
+        return
+    with context.autocommit_block():
+        if not context.as_sql and _invalid_index(op.get_bind(), index_name):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+        op.create_index(
+            index_name, table_name, columns, unique=unique,
+            postgresql_concurrently=True, if_not_exists=True, **kw
+        )
+
+
+def drop_index_concurrently(index_name: str, table_name: str, **kw) -> None:
+    context = op.get_context()
+    if context.dialect.name != "postgresql":
+        op.drop_index(index_name, table_name=table_name, **kw)
+        return
+    with context.autocommit_block():
+        op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True, **kw)
+
+
+def add_foreign_key(
+    constraint_name: str,
+    source_table: str,
+    referent_table: str,
+    local_cols: List[str],
+    remote_cols: List[str]
+) -> None:
+    """``op.create_foreign_key`` that lets writes continue while the existing rows are checked.
+
+    On Postgres the constraint is added NOT VALID, and the lock that takes is
+    released by committing before the rows are validated under one that does
+    not block writes. SQLite cannot add constraints to an existing table, so
+    nothing is done there.
+    """
+    context = op.get_context()
+    if context.dialect.name == "sqlite":
+        return
+    if context.dialect.name != "postgresql":
+        op.create_foreign_key(constraint_name, source_table, referent_table, local_cols, remote_cols)
+        return
+    op.create_foreign_key(
+        constraint_name, source_table, referent_table, local_cols, remote_cols, postgresql_not_valid=True
+    )
+    with context.autocommit_block():
+        op.execute(f"ALTER TABLE {source_table} VALIDATE CONSTRAINT {constraint_name}")
+
+
+def _invalid_index(bind: Connection, index_name: str) -> bool:
+    return bind.execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": index_name}).first() is not None
+
+
+def backfill(
+    name: str,
+    table_name: str,
+    values: Callable[[sa.Table], Dict[str, object]],
+    where: Optional[Callable[[sa.Table], sa.ColumnElement]] = None,
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None
+) -> int:
+    """UPDATE ``table_name`` in primary-key ranges, committing each batch.
+
+    ``values`` and ``where`` receive the reflected table and return the SET
+    values and an optional extra filter. Batches pause between them so
+    replicas and other writers keep up, and progress is recorded under
+    ``name``: a rerun continues after the last committed batch, and a
+    finished backfill is skipped. Rows inserted after the backfill starts
+    are not visited, so the application must already write the new values.
+    Returns the number of rows updated.
+
+    Nothing is emitted in offline (``--sql``) mode, since the batches depend
+    on the data.
+    """
+    context = op.get_context()
+    if context.as_sql:
+        logger.info("Backfill %s only runs against a live database; skipped in --sql output", name)
+        return 0
+    batch_size = batch_size or settings.MIGRATION_BACKFILL_BATCH_SIZE
+    pause = settings.MIGRATION_BACKFILL_PAUSE_SECONDS if pause is None else pause
+    bind = op.get_bind()
+    table = sa.Table(table_name, sa.MetaData(), autoload_with=bind)
+    key = list(table.primary_key.columns)[0]
+
+    updated = 0
+    with context.autocommit_block():
+        backfills.create(bind, checkfirst=True)
+        progress = bind.execute(
+            sa.select(backfills.c.last_id, backfills.c.finished_at).where(backfills.c.name == name)
+        ).first()
+        if progress is not None and progress.finished_at is not None:
+            logger.info("Backfill %s already finished", name)
+            return 0
+        last = progress.last_id if progress is not None else None
+        if last is None:
+            first = bind.execute(sa.select(sa.func.min(key))).scalar()
+            last = first - 1 if first is not None else 0
+            bind.execute(sa.insert(backfills).values(name=name, last_id=last, updated_at=datetime.utcnow()))
+        end = bind.execute(sa.select(sa.func.max(key))).scalar() or 0
+
+        while last < end:
+            upper = min(last + batch_size, end)
+            criteria = [key > last, key <= upper]
+            if where is not None:
+                criteria.append(where(table))
+            updated += bind.execute(sa.update(table).where(*criteria).values(values(table))).rowcount
+            bind.execute(
+                sa.update(backfills).where(backfills.c.name == name)
+                .values(last_id=upper, updated_at=datetime.utcnow())
+            )
+            logger.debug("Backfill %s: %s/%s", name, upper, end)
+            last = upper
+            if pause and last < end:
+                time.sleep(pause)
+        bind.execute(
+            sa.update(backfills).where(backfills.c.name == name).values(finished_at=datetime.utcnow())
+        )
+    logger.info("Backfill %s updated %s rows", name, updated)
+    return updated
+
+
+def pending_revisions(script: ScriptDirectory, connection: Connection, destination: str = "heads") -> List[Script]:
+    """Revisions an upgrade to ``destination`` would run, oldest first; empty for downgrades."""
+    current = MigrationContext.configure(connection).get_current_heads()
+    try:
+        revisions = list(script.iterate_revisions(destination, current or "base"))
+    except Exception:
+        # Downgrades and relative targets are not checked
+        return []
+    return list(reversed(revisions))
+
+
+def render_sql(revision: Script, dialect_name: str) -> List[str]:
+    """The statements ``revision``'s upgrade emits, rendered without a database."""
+    buffer = io.StringIO()
+    context = MigrationContext.configure(
+        dialect_name=dialect_name,
+        opts={"as_sql": True, "output_buffer": buffer, "literal_binds": True},
+    )
+    with Operations.context(context):
+        revision.module.upgrade()
+    statements = []
+    for statement in buffer.getvalue().split(";\n"):
+        statement = _COMMENT.sub("", statement).strip()
+        if statement:
+            statements.append(" ".join(statement.split()))
+    return statements
+
+
+def _row_count(connection: Connection, table: str, cache: Dict[str, int]) -> int:
+    if table not in cache:
+        if not sa.inspect(connection).has_table(table):
+            cache[table] = 0
+        elif connection.dialect.name == "postgresql":
+            # The planner's estimate; exact counts of huge tables are too slow here
+            estimate = connection.execute(
+                sa.text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+            ).scalar()
+            cache[table] = max(int(estimate or 0), 0)
+        else:
+            cache[table] = connection.execute(sa.select(sa.func.count()).select_from(sa.table(table))).scalar()
+    return cache[table]
+
+
+def estimate_locks(connection: Connection, revisions: List[Script]) -> List[dict]:
+    """Per revision, the estimated seconds of write-blocking locks and the statements behind them.
+
+    Revisions that cannot be rendered without a database on this dialect are
+    reported with ``seconds`` None and the ``error`` that stopped them.
+    """
+    counts: Dict[str, int] = {}
+    estimates = []
+    for revision in revisions:
+        try:
+            statements = render_sql(revision, connection.dialect.name)
+        except Exception as exc:
+            logger.warning("Could not estimate the locks of revision %s: %s", revision.revision, exc)
+            estimates.append({
+                "revision": revision.revision,
+                "description": revision.doc,
+                "seconds": None,
+                "statements": [],
+                "error": f"{type(exc).__name__}: {exc}",
+            })
+            continue
+        blocking = []
+        for statement in statements:
+            for pattern, rate in _RULES:
+                match = pattern.match(statement)
+                if match is None:
+                    continue
+                if rate is not None:
+                    table = match.group("table")
+                    rows = _row_count(connection, table, counts)
+                    blocking.append({
+                        "statement": statement[:200],
+                        "table": table,
+                        "rows": rows,
+                        "seconds": round(rows / rate, 2),
+                    })
+                break
+        estimates.append({
+            "revision": revision.revision,
+            "description": revision.doc,
+            "seconds": round(sum(item["seconds"] for item in blocking), 2),
+            "statements": blocking,
+        })
+    return estimates
+
+
+def check_lock_budget(
+    connection: Connection,
+    revisions: List[Script],
+    budget: Optional[float] = None,
+    allow_unestimated: bool = False
+) -> List[dict]:
+    """Raise LockBudgetExceeded when any revision is estimated to block writes longer than ``budget``.
+
+    Revisions that could not be estimated count as over the budget unless
+    ``allow_unestimated`` is set.
+    """
+    budget = settings.MIGRATION_LOCK_BUDGET_SECONDS if budget is None else budget
+    estimates = estimate_locks(connection, revisions)
+    over = [estimate for estimate in estimates if estimate["seconds"] is not None and estimate["seconds"] > budget]
+    unestimated = [] if allow_unestimated else [estimate for estimate in estimates if estimate["seconds"] is None]
+    if over or unestimated:
+        lines = []
+        if over:
+            lines.append(f"Estimated write locks exceed the budget of {budget}s:")
+        for estimate in over:
+            lines.append(f"  {estimate['revision']} ({estimate['description']}): {estimate['seconds']}s")
+            for item in estimate["statements"]:
+                lines.append(f"    {item['seconds']}s on {item['table']} ({item['rows']} rows): {item['statement']}")
+        if unestimated:
+            lines.append("Write locks could not be estimated for:")
+        for estimate in unestimated:
+            lines.append(f"  {estimate['revision']} ({estimate['description']}): {estimate['error']}")
+        if over:
+            lines.append(
+                "Use create_index_concurrently / backfill from app.db.migrations, "
+                "or pass -x lock_budget=SECONDS to accept the downtime."
+            )
+        if unestimated:
+            lines.append("Pass -x allow_unestimated=true once they have been reviewed by hand.")
+        raise LockBudgetExceeded("\n".join(lines))
+    return estimates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, help=f"seconds (default {settings.MIGRATION_LOCK_BUDGET_SECONDS})")
+    parser.add_argument("--config", default="alembic.ini", help="alembic config file")
+    parser.add_argument("--destination", default="heads", help="revision to upgrade to")
+    parser.add_argument(
+        "--allow-unestimated", action="store_true", help="pass revisions whose locks could not be estimated"
+    )
+    args = parser.parse_args()
+
+    script = ScriptDirectory.from_config(Config(args.config))
+    engine = sa.create_engine(settings.DATABASE_URL)
+    with engine.connect() as connection:
+        revisions = pending_revisions(script, connection, args.destination)
+        try:
+            estimates = check_lock_budget(connection, revisions, args.budget, args.allow_unestimated)
+        except LockBudgetExceeded as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(1)
+    for estimate in estimates:
+        if estimate["seconds"] is None:
+            print(f"{estimate['revision']} ({estimate['description']}): not estimated, {estimate['error']}")
+        else:
+            print(f"{estimate['revision']} ({estimate['description']}): {estimate['seconds']}s")
+    if not estimates:
+        print("No pending migrations")
+
+
+if __name__ == "__main__":
+    main()
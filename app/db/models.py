@@ -1,14 +1,25 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, Text, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, SmallInteger, String, DateTime, Float, Text, Enum, LargeBinary, Table, Index, JSON
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session, relationship
 from datetime import datetime
 import enum
+import secrets
 
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.db.lookups import Lookup
 from app.db.session import Base
 
 class UserRole(str, enum.Enum):
     ADMIN = "admin"
     STAFF = "staff"
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -30,10 +41,27 @@ class Customer(Base):
     phone = Column(String)
     address = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     services = relationship("Service", back_populates="customer")
 
+class CustomerStats(Base):
+    """A customer's visits and spend, kept current by app.db.customer_stats."""
+    __tablename__ = "customer_stats"
+    __table_args__ = (
+        Index("ix_customer_stats_next_visit", "next_visit"),
+    )
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    # Over the bookings that have started
+    visit_count = Column(Integer, nullable=False, default=0)
+    lifetime_spend = Column(Float, nullable=False, default=0.0)
+    first_visit = Column(DateTime)
+    last_visit = Column(DateTime)
+    upcoming_count = Column(Integer, nullable=False, default=0)
+    next_visit = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class ServiceProvider(Base):
     __tablename__ = "service_providers"
 
@@ -46,43 +74,125 @@ class ServiceProvider(Base):
     
     services = relationship("Service", back_populates="service_provider")
 
-class Service(Base):
+class ServiceType(Base):
+    """A kind of service (boarding, daycare, grooming); services store its id."""
+    __tablename__ = "service_types"
+
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    id = Column(SmallInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ServiceNames:
+    """The service type and staff member of a row by name, as the API exchanges them."""
+
+    @property
+    def service_type(self):
+        return service_types.name(self.service_type_id, object_session(self))
+
+    @property
+    def handled_by(self):
+        return staff.name(self.handled_by_id, object_session(self))
+
+class Service(ServiceNames, Base):
     __tablename__ = "services"
+    __table_args__ = (
+        Index("ix_services_provider_id_start_time", "service_provider_id", "start_time"),
+        Index("ix_services_customer_id_start_time", "customer_id", "start_time"),
+        # One row per occurrence of a recurring booking
+        Index("ux_services_series_id_start_time", "series_id", "start_time", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
     service_provider_id = Column(Integer, ForeignKey("service_providers.id"))
-    service_type = Column(String)  # boarding, daycare, grooming
-    start_date = Column(DateTime)
-    end_date = Column(DateTime)
+    service_type_id = Column(SmallInteger, ForeignKey("service_types.id"), index=True)
+    start_date = Column(DateTime, index=True)
+    end_date = Column(DateTime, index=True)
     start_time = Column(DateTime)
     end_time = Column(DateTime)
     total_price = Column(Float)
     notes = Column(Text)
-    handled_by = Column(String)
+    handled_by_id = Column(Integer, ForeignKey("users.id"), index=True)
+    series_id = Column(Integer, ForeignKey("service_series.id"), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = Column(DateTime, index=True)
     
     customer = relationship("Customer", back_populates="services")
     service_provider = relationship("ServiceProvider", back_populates="services")
     tasks = relationship("Task", back_populates="service")
 
+class ServiceSeries(ServiceNames, Base):
+    """A recurring booking; its occurrences are materialized as services by app.db.recurrence."""
+    __tablename__ = "service_series"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"))
+    service_provider_id = Column(Integer, ForeignKey("service_providers.id"))
+    service_type_id = Column(SmallInteger, ForeignKey("service_types.id"))
+    rrule = Column(String, nullable=False)
+    # Template for every occurrence; start_time is the recurrence's DTSTART
+    start_date = Column(DateTime)
+    end_date = Column(DateTime)
+    start_time = Column(DateTime)
+    end_time = Column(DateTime)
+    total_price = Column(Float)
+    notes = Column(Text)
+    handled_by_id = Column(Integer, ForeignKey("users.id"))
+    # Occurrences starting before this have been created
+    materialized_until = Column(DateTime, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    deleted_at = Column(DateTime, index=True)
+
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_is_completed_due_date", "is_completed", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    service_id = Column(Integer, ForeignKey("services.id"))
+    service_id = Column(Integer, ForeignKey("services.id"), index=True)
     title = Column(String)
     description = Column(Text)
     is_completed = Column(Boolean, default=False)
     due_date = Column(DateTime)
+    # Set on tasks generated from a template, so they follow the service's dates
+    template_id = Column(Integer, ForeignKey("task_templates.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = Column(DateTime, index=True)
     
     service = relationship("Service", back_populates="tasks")
 
+class TaskAnchor(str, enum.Enum):
+    START = "start"
+    END = "end"
+
+class TaskTemplate(Base):
+    """A checklist item created as a task on every service of its service type."""
+    __tablename__ = "task_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    service_type_id = Column(SmallInteger, ForeignKey("service_types.id"), nullable=False, index=True)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    # The task is due offset_minutes after the service's start or end time
+    anchor = Column(Enum(TaskAnchor), default=TaskAnchor.START, nullable=False)
+    offset_minutes = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def service_type(self):
+        return service_types.name(self.service_type_id, object_session(self))
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_id_is_read", "user_id", "is_read"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -90,5 +200,125 @@ class Notification(Base):
     message = Column(Text)
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    deleted_at = Column(DateTime, index=True)
     
-    user = relationship("User") 
\ No newline at end of file
+    user = relationship("User") 
+
+def placeholder_staff(name: str) -> dict:
+    """An inactive user that cannot sign in, standing for a staff member known only by name."""
+    return {
+        "email": f"staff-{secrets.token_hex(8)}@placeholder.invalid",
+        "full_name": name,
+        "hashed_password": get_password_hash(secrets.token_urlsafe(32)),
+        "role": UserRole.STAFF,
+        "is_active": False,
+    }
+
+# Names <-> ids of service types and staff. Staff are found by email or full
+# name and shown by full name; renamed users are picked up after the TTL.
+# handled_by was free text, so names that match no user get a placeholder
+# user, as migration 010 gave the names already stored.
+service_types = Lookup(select(ServiceType.id, ServiceType.name), table=ServiceType.__table__)
+staff = Lookup(
+    select(User.id, func.coalesce(User.full_name, User.email), User.email).order_by(User.id),
+    table=User.__table__,
+    ttl=settings.STAFF_LOOKUP_CACHE_SECONDS,
+    values=placeholder_staff
+)
+
+# Archive tables mirror the live tables' columns (without foreign keys) and
+# hold rows moved out by app.db.archive.
+def _archive_table(table: Table, *indexes: str) -> Table:
+    archive = Table(
+        f"{table.name}_archive",
+        Base.metadata,
+        *[Column(c.name, c.type, primary_key=c.primary_key) for c in table.columns],
+        Column("archived_at", DateTime, default=datetime.utcnow),
+    )
+    for name in indexes:
+        Index(f"ix_{archive.name}_{name}", archive.c[name])
+    return archive
+
+services_archive = _archive_table(Service.__table__, "customer_id", "start_date")
+tasks_archive = _archive_table(Task.__table__, "service_id")
+notifications_archive = _archive_table(Notification.__table__, "user_id")
+
+class Tombstone(Base):
+    """Record of a hard-deleted row, so offline clients can drop it on sync."""
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# Tables whose hard deletes are recorded as tombstones
+TOMBSTONED = {"customers", "services", "tasks"}
+
+@event.listens_for(Session, "before_flush")
+def _record_tombstones(session, flush_context, instances):
+    for obj in session.deleted:
+        table = getattr(obj, "__tablename__", None)
+        if table in TOMBSTONED:
+            session.add(Tombstone(entity=table, entity_id=obj.id))
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of the caller and the client supplied Idempotency-Key
+    key = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    # NULL while the original request is still being processed
+    status_code = Column(Integer)
+    content_type = Column(String)
+    response_body = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+class Job(Base):
+    """A unit of background work, claimed and run by app.db.jobs workers."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_priority_run_at", "status", "priority", "run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    payload = Column(JSON)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    # Higher priorities are claimed first
+    priority = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    progress = Column(Float, default=0.0)
+    progress_message = Column(String)
+    result = Column(JSON)
+    error = Column(Text)
+    # Not claimed before this; pushed back after a failed attempt
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = Column(String)
+    # Refreshed by the worker while it runs the job; stale locks are reclaimed
+    heartbeat_at = Column(DateTime)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class AuditLog(Base):
+    """A change to an audited row, written behind by app.db.audit."""
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_entity_entity_id_id", "entity", "entity_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    # NULL for bulk statements, which are logged once per statement
+    entity_id = Column(Integer)
+    action = Column(String, nullable=False)
+    # {column: [before, after]}, or the statement for bulk writes
+    changes = Column(JSON)
+    # JWT subject (email) of the caller, if the change came from a request
+    actor = Column(String, index=True)
+    route = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
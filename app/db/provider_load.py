@@ -0,0 +1,253 @@
+"""In-memory index of provider workload, for suggesting who should take a booking.
+
+Each provider's upcoming bookings are kept in a list sorted by start time,
+so the bookings overlapping a window are found by bisection instead of a
+query. The index is loaded on first use. It is then kept current in two
+ways. Services written in this process are applied as soon as their
+transaction commits. Changes from other processes and bulk statements are
+picked up by a delta query on ``updated_at``/``deleted_at``, the same
+indexed columns delta sync reads. That query runs when the index is older
+than ``PROVIDER_INDEX_REFRESH_SECONDS``, or right away after a local bulk
+write.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.context import current_tenant
+from app.db.models import Service, ServiceProvider
+
+# Bookings that ended this long ago are dropped from the index
+HISTORY = timedelta(days=1)
+
+# (start, service id, end)
+Booking = Tuple[datetime, int, datetime]
+
+
+class ProviderSchedule:
+    """One provider's bookings, sorted by start."""
+
+    __slots__ = ("bookings", "longest")
+
+    def __init__(self):
+        self.bookings: List[Booking] = []
+        self.longest = timedelta(0)
+
+    def add(self, service_id: int, start: datetime, end: datetime) -> None:
+        insort(self.bookings, (start, service_id, end))
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, service_id: int, start: datetime) -> None:
+        i = bisect_left(self.bookings, (start, service_id))
+        if i < len(self.bookings) and self.bookings[i][1] == service_id:
+            del self.bookings[i]
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Booking]:
+        # Nothing starting before start - longest can still be running at start
+        lo = bisect_left(self.bookings, (start - self.longest,))
+        hi = bisect_left(self.bookings, (end,))
+        return [booking for booking in self.bookings[lo:hi] if booking[2] > start]
+
+
+def booked_minutes(bookings: Iterable[Booking], start: datetime, end: datetime) -> float:
+    return sum((min(e, end) - max(s, start)).total_seconds() for s, _, e in bookings) / 60
+
+
+def peak_concurrency(bookings: List[Booking], start: datetime, end: datetime) -> int:
+    # Ends sort before starts at the same instant, so back-to-back bookings do not overlap
+    events = sorted(
+        [(max(s, start), 1) for s, _, _ in bookings] + [(min(e, end), -1) for _, _, e in bookings]
+    )
+    peak = running = 0
+    for _, change in events:
+        running += change
+        peak = max(peak, running)
+    return peak
+
+
+class ProviderLoadIndex:
+    """Upcoming bookings and served service types of every provider of one database."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schedules: Dict[int, ProviderSchedule] = {}
+        self._names: Dict[int, str] = {}
+        self._types: Dict[int, Counter] = {}
+        # service id -> (provider id, service type id, start)
+        self._services: Dict[int, Tuple[int, int, datetime]] = {}
+        self._watermark: Optional[datetime] = None
+        self._refreshed = 0.0
+        self._stale = True
+        self._refresh_lock = threading.Lock()
+
+    def expire(self) -> None:
+        self._stale = True
+
+    def apply(self, rows: Iterable[tuple]) -> None:
+        """Upsert ``(id, provider id, service type id, start, end, deleted)`` service rows."""
+        horizon = datetime.utcnow() - HISTORY
+        with self._lock:
+            for service_id, provider_id, service_type_id, start, end, deleted in rows:
+                previous = self._services.pop(service_id, None)
+                if previous is not None:
+                    old_provider, old_type, old_start = previous
+                    self._schedules[old_provider].remove(service_id, old_start)
+                    self._types[old_provider][old_type] -= 1
+                if deleted or provider_id is None:
+                    continue
+                self._types.setdefault(provider_id, Counter())[service_type_id] += 1
+                if start is None or end is None or end < horizon:
+                    continue
+                self._schedules.setdefault(provider_id, ProviderSchedule()).add(service_id, start, end)
+                self._services[service_id] = (provider_id, service_type_id, start)
+
+    def refresh(self, db: Session) -> None:
+        """Load the index, or apply the services and providers changed since the last refresh."""
+        if not self._stale and time.monotonic() - self._refreshed < settings.PROVIDER_INDEX_REFRESH_SECONDS:
+            return
+        # Only the first load makes callers wait; later ones answer from the current data meanwhile
+        if not self._refresh_lock.acquire(blocking=self._watermark is None):
+            return
+        try:
+            if self._stale or time.monotonic() - self._refreshed >= settings.PROVIDER_INDEX_REFRESH_SECONDS:
+                self._refresh(db)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, db: Session) -> None:
+        self._stale = False
+        now = datetime.utcnow()
+        columns = (
+            Service.id, Service.service_provider_id, Service.service_type_id,
+            Service.start_time, Service.end_time, Service.deleted_at.is_not(None)
+        )
+        if self._watermark is None:
+            with self._lock:
+                self._types = {}
+                for provider_id, service_type_id, count in db.execute(
+                    select(Service.service_provider_id, Service.service_type_id, func.count())
+                    .where(Service.deleted_at.is_(None), Service.end_time < now - HISTORY)
+                    .group_by(Service.service_provider_id, Service.service_type_id)
+                ):
+                    self._types.setdefault(provider_id, Counter())[service_type_id] += count
+            changed = db.execute(select(*columns).where(
+                Service.deleted_at.is_(None), Service.end_time >= now - HISTORY
+            )).all()
+            providers = db.execute(select(ServiceProvider.id, ServiceProvider.name)).all()
+        else:
+            since = self._watermark - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+            changed = db.execute(select(*columns).where(
+                or_(Service.updated_at > since, Service.deleted_at > since)
+            )).all()
+            providers = db.execute(
+                select(ServiceProvider.id, ServiceProvider.name).where(ServiceProvider.updated_at > since)
+            ).all()
+        self.apply(changed)
+        with self._lock:
+            self._names.update(providers)
+            for provider_id, _ in providers:
+                self._schedules.setdefault(provider_id, ProviderSchedule())
+        self._watermark = now
+        self._refreshed = time.monotonic()
+
+    def suggest(
+        self,
+        service_type_id: Optional[int],
+        start: datetime,
+        end: datetime,
+        limit: int
+    ) -> List[dict]:
+        """Providers with room for a booking from ``start`` to ``end``, least loaded first.
+
+        Providers are ranked by their peak number of simultaneous bookings in
+        the window, then by minutes booked in the window, then by minutes
+        booked over the days the window spans. With ``service_type_id``,
+        providers who have served that type come before those who have not,
+        who are still suggested when the others are full.
+        """
+        capacity = settings.PROVIDER_MAX_CONCURRENT_BOOKINGS
+        day_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        with self._lock:
+            ranked = []
+            for provider_id in self._schedules:
+                schedule = self._schedules[provider_id]
+                in_window = schedule.overlapping(start, end)
+                concurrent = peak_concurrency(in_window, start, end)
+                if concurrent >= capacity:
+                    continue
+                ranked.append({
+                    "provider_id": provider_id,
+                    "name": self._names.get(provider_id),
+                    "qualified": service_type_id is None or self._types.get(provider_id, {}).get(service_type_id, 0) > 0,
+                    "concurrent": concurrent,
+                    "booked_minutes": round(booked_minutes(in_window, start, end)),
+                    "day_minutes": round(booked_minutes(schedule.overlapping(day_start, day_end), day_start, day_end)),
+                })
+        ranked.sort(key=lambda p: (
+            not p["qualified"], p["concurrent"], p["booked_minutes"], p["day_minutes"], p["provider_id"]
+        ))
+        return ranked[:limit]
+
+
+_indexes: Dict[Optional[str], ProviderLoadIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def load_index(tenant: Optional[str] = None) -> ProviderLoadIndex:
+    with _indexes_lock:
+        index = _indexes.get(tenant)
+        if index is None:
+            index = _indexes[tenant] = ProviderLoadIndex()
+        return index
+
+
+def _row(service: Service, deleted: bool) -> tuple:
+    return (
+        service.id, service.service_provider_id, service.service_type_id,
+        service.start_time, service.end_time, deleted or service.deleted_at is not None
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _capture_services(session, flush_context):
+    pending = session.info.setdefault("provider_load", [])
+    pending.extend(_row(obj, False) for obj in session.new if isinstance(obj, Service))
+    pending.extend(_row(obj, False) for obj in session.dirty if isinstance(obj, Service))
+    pending.extend(_row(obj, True) for obj in session.deleted if isinstance(obj, Service))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _capture_bulk_services(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is Service:
+            orm_execute_state.session.info["provider_load_bulk"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    pending = session.info.pop("provider_load", None)
+    bulk = session.info.pop("provider_load_bulk", False)
+    if not (pending or bulk):
+        return
+    index = _indexes.get(current_tenant.get())
+    if index is None:
+        return
+    if pending:
+        index.apply(pending)
+    if bulk:
+        index.expire()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("provider_load", None)
+    session.info.pop("provider_load_bulk", None)
@@ -0,0 +1,159 @@
+"""Expand recurring bookings into ``Service`` rows.
+
+A ``ServiceSeries`` keeps the first occurrence as a template plus an RRULE.
+Occurrences are only materialized ``RECURRENCE_HORIZON_DAYS`` ahead; each
+window is written with one batched INSERT and checked against the provider's
+other bookings with one set-based query. ``extend_all`` tops every open
+series up as time moves on::
+
+    python -m app.db.recurrence [--tenant NAME]
+"""
+import argparse
+from datetime import datetime, timedelta
+from itertools import islice, takewhile
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dateutil.rrule import rrulestr
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.db import customer_stats  # noqa: F401  (keeps customer_stats current as occurrences are created)
+from app.db.jobs import job
+from app.db.models import Service, ServiceSeries
+from app.db.session import add_tenant_argument, cli_session
+from app.db.task_templates import generate_tasks
+
+# Columns copied from the series to every occurrence as-is
+COPIED = ("customer_id", "service_provider_id", "service_type_id", "total_price", "notes", "handled_by_id")
+# Columns shifted by the distance between the occurrence and the series start
+SHIFTED = ("start_date", "end_date", "start_time", "end_time")
+# Watermark of a series whose rule has no occurrences left, so extend_all skips it
+EXHAUSTED = datetime.max
+
+
+def parse_rule(rule: str, start: datetime):
+    """Parse an RRULE (with or without the ``RRULE:`` prefix); raises ValueError."""
+    try:
+        return rrulestr(rule, dtstart=start)
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid recurrence rule: {exc}")
+
+
+def occurrences(series: ServiceSeries, until: datetime) -> Tuple[List[datetime], datetime]:
+    """Occurrence starts after the series' watermark and before ``until``.
+
+    Returns the starts and the new watermark, which stops short of ``until``
+    when the window holds more than ``RECURRENCE_MAX_OCCURRENCES`` and is
+    ``EXHAUSTED`` once the rule has no occurrences after the window.
+    """
+    rule = parse_rule(series.rrule, series.start_time)
+    after = series.materialized_until
+    starts = rule.xafter(after, inc=True) if after else iter(rule)
+    limit = settings.RECURRENCE_MAX_OCCURRENCES
+    window = list(islice(takewhile(lambda start: start < until, starts), limit))
+    if len(window) == limit:
+        return window, window[-1] + timedelta(microseconds=1)
+    if rule.after(until, inc=True) is None:
+        return window, EXHAUSTED
+    return window, until
+
+
+def occurrence_row(series: ServiceSeries, start: datetime) -> dict:
+    offset = start - series.start_time
+    row = {name: getattr(series, name) for name in COPIED}
+    row.update({name: getattr(series, name) + offset for name in SHIFTED})
+    row["series_id"] = series.id
+    return row
+
+
+def find_conflicts(db: Session, series: ServiceSeries, after: Optional[datetime]) -> List[Tuple[int, datetime]]:
+    """(service id, start) of the series' occurrences that overlap another booking of the provider."""
+    occurrence, other = aliased(Service), aliased(Service)
+    criteria = [occurrence.series_id == series.id, occurrence.deleted_at.is_(None)]
+    if after is not None:
+        criteria.append(occurrence.start_time >= after)
+    return db.execute(
+        select(occurrence.id, occurrence.start_time)
+        .join(other, and_(
+            other.service_provider_id == occurrence.service_provider_id,
+            other.start_time < occurrence.end_time,
+            other.end_time > occurrence.start_time,
+            other.deleted_at.is_(None),
+            or_(other.series_id.is_(None), other.series_id != series.id),
+        ))
+        .where(*criteria)
+        .distinct()
+        .order_by(occurrence.start_time)
+    ).all()
+
+
+def materialize(db: Session, series: ServiceSeries, until: datetime, skip_conflicts: bool = True) -> Tuple[int, List[datetime]]:
+    """Create the series' occurrences up to ``until`` without committing.
+
+    Returns the number of services created and the starts of conflicting
+    occurrences. Conflicting occurrences are dropped when ``skip_conflicts``
+    is set; otherwise they are left in place for the caller to roll back.
+    Template tasks are generated for the occurrences that are kept.
+    """
+    after = series.materialized_until
+    starts, watermark = occurrences(series, until)
+    created = []
+    if starts:
+        created = db.execute(
+            insert(Service).returning(
+                Service.id, Service.service_type_id, Service.start_time, Service.end_time
+            ),
+            [occurrence_row(series, start) for start in starts]
+        ).all()
+    conflicts = find_conflicts(db, series, after) if starts else []
+    if conflicts and skip_conflicts:
+        conflicting = {service_id for service_id, _ in conflicts}
+        db.execute(
+            delete(Service).where(Service.id.in_(conflicting)),
+            execution_options={"synchronize_session": False}
+        )
+        created = [row for row in created if row.id not in conflicting]
+    generate_tasks(db, created)
+    series.materialized_until = watermark
+    return len(starts) - len(conflicts), [start for _, start in conflicts]
+
+
+def extend_all(
+    db: Session,
+    horizon_days: Optional[int] = None,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Dict[str, int]:
+    """Materialize every open series up to the horizon, committing one series at a time."""
+    until = datetime.utcnow() + timedelta(days=horizon_days or settings.RECURRENCE_HORIZON_DAYS)
+    series_ids = db.execute(
+        select(ServiceSeries.id).where(
+            ServiceSeries.deleted_at.is_(None),
+            or_(ServiceSeries.materialized_until.is_(None), ServiceSeries.materialized_until < until)
+        ).order_by(ServiceSeries.id)
+    ).scalars().all()
+    totals = {"series": 0, "created": 0, "skipped": 0}
+    for done, series_id in enumerate(series_ids):
+        if progress:
+            progress(done / len(series_ids), f"Extending series {series_id}")
+        series = db.get(ServiceSeries, series_id, with_for_update=True)
+        while series.materialized_until is None or series.materialized_until < until:
+            created, skipped = materialize(db, series, until)
+            db.commit()
+            totals["created"] += created
+            totals["skipped"] += len(skipped)
+        totals["series"] += 1
+    return totals
+
+
+@job("extend_series")
+def run_extend_series(db: Session, ctx, payload: dict) -> Dict[str, int]:
+    return extend_all(db, payload.get("horizon_days"), ctx.progress)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_tenant_argument(parser)
+    args = parser.parse_args()
+    with cli_session(args.tenant) as db:
+        print(extend_all(db))
@@ -0,0 +1,59 @@
+"""Pre-built statements for the lookups nearly every request makes.
+
+Each statement is built once, with bound parameters in place of the values,
+and reused for every call. SQLAlchemy then finds its compiled form in the
+engine's compiled cache without rebuilding the ORM query, and the driver
+receives the identical SQL string each time, so it can reuse a prepared
+statement (see ``engine_options`` in ``app.db.session``).
+
+``benchmarks.statements`` compares the Python-side cost with the legacy
+``db.query(...).filter(...)`` form.
+"""
+from functools import lru_cache
+from typing import List, Optional, Type
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.db.models import Notification, User
+
+
+@lru_cache(maxsize=None)
+def by_id(model: Type) -> Select:
+    """SELECT of the ``model`` row whose id is the ``id`` parameter; soft-deleted rows are excluded."""
+    stmt = select(model).where(model.id == bindparam("id"))
+    if hasattr(model, "deleted_at"):
+        stmt = stmt.where(model.deleted_at.is_(None))
+    return stmt
+
+
+user_by_email = select(User).where(User.email == bindparam("email")).limit(1)
+
+notification_for_user = select(Notification).where(
+    Notification.id == bindparam("id"),
+    Notification.user_id == bindparam("user_id"),
+    Notification.deleted_at.is_(None)
+)
+
+unread_notifications = select(Notification).where(
+    Notification.user_id == bindparam("user_id"),
+    Notification.is_read == False,
+    Notification.deleted_at.is_(None)
+)
+
+
+def get_by_id(db: Session, model: Type, id_: int) -> Optional[object]:
+    return db.execute(by_id(model), {"id": id_}).scalars().first()
+
+
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.execute(user_by_email, {"email": email}).scalars().first()
+
+
+def get_notification(db: Session, notification_id: int, user_id: int) -> Optional[Notification]:
+    return db.execute(notification_for_user, {"id": notification_id, "user_id": user_id}).scalars().first()
+
+
+def list_unread_notifications(db: Session, user_id: int) -> List[Notification]:
+    return db.execute(unread_notifications, {"user_id": user_id}).scalars().all()
@@ -1,22 +1,299 @@
-from sqlalchemy import create_engine
+import argparse
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.context import batch_session, current_subject, current_tenant
+from app.core.throttling import pool_wait
+from app.db import diagnostics
+
+logger = logging.getLogger(__name__)
+
+def engine_options(url: str) -> dict:
+    """create_engine() arguments that let the driver reuse prepared statements where it can.
+
+    psycopg2 has no server-side prepared statements; use a
+    ``postgresql+psycopg://`` URL (psycopg 3) to get them on Postgres.
+    """
+    options = {"query_cache_size": settings.DB_COMPILED_CACHE_SIZE}
+    driver = make_url(url).drivername
+    if driver == "postgresql+psycopg":
+        options["connect_args"] = {"prepare_threshold": settings.DB_PREPARE_THRESHOLD}
+    elif driver.startswith("sqlite"):
+        options["connect_args"] = {"cached_statements": settings.DB_STATEMENT_CACHE_SIZE}
+    return options
 
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+diagnostics.install(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+read_engine = None
+ReadSessionLocal = None
+if settings.READ_REPLICA_URL:
+    read_engine = create_engine(settings.READ_REPLICA_URL, **engine_options(settings.READ_REPLICA_URL))
+    diagnostics.install(read_engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
+
+class UnknownTenant(Exception):
+    pass
+
+
+class TenantEngines:
+    """Engines of the tenant databases, created on first use.
+
+    At most ``maxsize`` are kept; the least recently used one is disposed
+    (sessions already using it keep their connection until they close).
+    """
+
+    def __init__(self, urls: dict, maxsize: int):
+        self.urls = urls
+        self.maxsize = maxsize
+        self._engines: "OrderedDict[str, Engine]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant: Optional[str]) -> Engine:
+        if tenant is None:
+            return engine
+        with self._lock:
+            tenant_engine = self._engines.get(tenant)
+            if tenant_engine is not None:
+                self._engines.move_to_end(tenant)
+                return tenant_engine
+            if tenant not in self.urls:
+                raise UnknownTenant(tenant)
+            url = self.urls[tenant]
+            tenant_engine = self._engines[tenant] = create_engine(url, **engine_options(url))
+            diagnostics.install(tenant_engine)
+            evicted = self._engines.popitem(last=False)[1] if len(self._engines) > self.maxsize else None
+        if evicted is not None:
+            evicted.dispose()
+        return tenant_engine
+
+
+tenant_engines = TenantEngines(settings.TENANT_DATABASE_URLS, settings.TENANT_ENGINE_CACHE_SIZE)
+
+def tenant_session(tenant: Optional[str] = None):
+    """A session on ``tenant``'s database (the default database for None)."""
+    return SessionLocal(bind=tenant_engines.get(tenant))
+
+def add_tenant_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--tenant", choices=sorted(settings.TENANT_DATABASE_URLS),
+        help="use this tenant's database instead of the default one"
+    )
+
+def cli_session(tenant: Optional[str]):
+    """A session for a command-line run on ``tenant``'s database, which acts as that tenant."""
+    current_tenant.set(tenant)
+    return tenant_session(tenant)
+
+class RecentWriters:
+    """Callers that committed a write recently; their reads go to the primary.
+
+    Kept in this process only, so with several workers a read served by
+    another worker can miss the write. Use RedisRecentWriters there.
+    """
+
+    def __init__(self, ttl: float):
+        self._writers = LRUCache(maxsize=100_000, ttl=ttl)
+
+    def mark(self, key: str) -> None:
+        self._writers.set(key, True)
+
+    def recent(self, key: str) -> bool:
+        return bool(self._writers.get(key))
+
+
+class RedisRecentWriters(RecentWriters):
+    """Recent writers shared by every worker through Redis.
+
+    Requires the optional ``redis`` package. When Redis cannot be reached,
+    reads go to the primary.
+    """
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("RedisRecentWriters requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self._ttl_ms = int(ttl * 1000)
+
+    def mark(self, key: str) -> None:
+        try:
+            self._client.set(f"recent_writer:{key}", 1, px=self._ttl_ms)
+        except Exception:
+            logger.warning("Could not record a recent writer", exc_info=True)
+
+    def recent(self, key: str) -> bool:
+        try:
+            return bool(self._client.exists(f"recent_writer:{key}"))
+        except Exception:
+            return True
+
+
+def _recent_writers() -> RecentWriters:
+    url = settings.READ_YOUR_WRITES_BACKEND_URL or settings.RATE_LIMIT_BACKEND_URL
+    if url and url.startswith(("redis://", "rediss://")):
+        return RedisRecentWriters(url, settings.READ_YOUR_WRITES_SECONDS)
+    return RecentWriters(settings.READ_YOUR_WRITES_SECONDS)
+
+
+recent_writers = _recent_writers()
+
+def _writer_key(subject: str) -> str:
+    # The same subject can exist in several tenant databases
+    return f"{current_tenant.get() or ''}\0{subject}"
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flag_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_writer(session):
+    if session.info.pop("wrote", False):
+        subject = current_subject.get()
+        if subject:
+            recent_writers.mark(_writer_key(subject))
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
+# Pool wait for the load shedder: from the moment a session first needs a
+# connection until it has one. Sessions that never query check none out.
+def _start_checkout(session):
+    if "connected" not in session.info:
+        session.info.setdefault("checkout_started", time.perf_counter())
+
+@event.listens_for(SessionLocal, "before_flush")
+def _checkout_for_flush(session, flush_context, instances):
+    _start_checkout(session)
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _checkout_for_execute(orm_execute_state):
+    _start_checkout(orm_execute_state.session)
+
+@event.listens_for(SessionLocal, "after_begin")
+def _observe_checkout(session, transaction, connection):
+    session.info["connected"] = True
+    started = session.info.pop("checkout_started", None)
+    if started is not None:
+        pool_wait.observe(time.perf_counter() - started)
+
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _release_checkout(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("connected", None)
+        session.info.pop("checkout_started", None)
+
+
+class ReplicaHealth:
+    """Periodically checked replica availability and replication lag."""
+
+    def __init__(self, interval: float, max_lag: float):
+        self.interval = interval
+        self.max_lag = max_lag
+        self._healthy = False
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def healthy(self) -> bool:
+        if time.monotonic() - self._checked < self.interval:
+            return self._healthy
+        # Only one request pays for the check; the others keep using the last result
+        if not self._lock.acquire(blocking=False):
+            return self._healthy
+        try:
+            self._healthy = self._check()
+            self._checked = time.monotonic()
+        finally:
+            self._lock.release()
+        return self._healthy
+
+    def _check(self) -> bool:
+        try:
+            with read_engine.connect() as conn:
+                if read_engine.dialect.name == "postgresql":
+                    lag = conn.execute(text(
+                        "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+                    )).scalar()
+                    return lag is None or float(lag) <= self.max_lag
+                conn.execute(text("SELECT 1"))
+                return True
+        except Exception:
+            return False
+
+
+replica_health = ReplicaHealth(
+    settings.READ_REPLICA_CHECK_INTERVAL_SECONDS,
+    settings.READ_REPLICA_MAX_LAG_SECONDS
+)
+
 # Create all tables
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+def create_tables(tenant: Optional[str] = None):
+    Base.metadata.create_all(bind=tenant_engines.get(tenant))
 
 # Dependency
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    shared = batch_session.get()
+    if shared is not None:
+        # Sub-request of POST /batch; the batch owns and closes the session
+        yield shared
+        return
+    db = getattr(request.state, "db", None)
+    if db is not None:
+        # Opened by another dependency of this request (get_read_db falling
+        # back to the primary), which closes it
+        yield db
+        return
+    try:
+        db = tenant_session(current_tenant.get())
+    except UnknownTenant:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown tenant"
+        )
+    request.state.db = db
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency for read-only endpoints: uses the replica unless it is down or
+# lagging, or the caller wrote recently and must see their own changes.
+# Tenant databases have no replica.
+def get_read_db(request: Request):
+    subject = current_subject.get()
+    if (
+        batch_session.get() is not None
+        or ReadSessionLocal is None
+        or current_tenant.get() is not None
+        or (subject and recent_writers.recent(_writer_key(subject)))
+        or not replica_health.healthy()
+    ):
+        yield from get_db(request)
+        return
+    db = ReadSessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,86 @@
+"""Generate and reschedule the checklist tasks of services from task templates.
+
+Templates are cached per service type, so creating a service costs one bulk
+INSERT for its tasks, and moving a service costs one UPDATE whose CASE maps
+each template to the task's new due date.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, insert, update
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.context import current_tenant
+from app.db.models import Task, TaskAnchor, TaskTemplate
+
+# (tenant, service_type_id) -> [(template id, title, description, anchor, offset_minutes)]
+template_cache = LRUCache(maxsize=256, ttl=settings.TASK_TEMPLATE_CACHE_SECONDS)
+
+Template = Tuple[int, str, str, TaskAnchor, int]
+
+
+def templates_for(db: Session, service_type_id: Optional[int]) -> List[Template]:
+    if service_type_id is None:
+        return []
+    key = (current_tenant.get(), service_type_id)
+    templates = template_cache.get(key)
+    if templates is None:
+        templates = [
+            (t.id, t.title, t.description, t.anchor, t.offset_minutes)
+            for t in db.query(TaskTemplate).filter(
+                TaskTemplate.service_type_id == service_type_id
+            ).order_by(TaskTemplate.id)
+        ]
+        template_cache.set(key, templates)
+    return templates
+
+
+def due_date(anchor: TaskAnchor, offset_minutes: int, start_time: datetime, end_time: datetime) -> datetime:
+    base = end_time if anchor == TaskAnchor.END else start_time
+    return base + timedelta(minutes=offset_minutes)
+
+
+def generate_tasks(db: Session, services: Iterable) -> int:
+    """Insert the template tasks of ``services`` without committing.
+
+    ``services`` yields objects or rows with ``id``, ``service_type_id``,
+    ``start_time`` and ``end_time``. Returns the number of tasks created.
+    """
+    rows = []
+    for service in services:
+        for template_id, title, description, anchor, offset in templates_for(db, service.service_type_id):
+            rows.append({
+                "service_id": service.id,
+                "template_id": template_id,
+                "title": title,
+                "description": description,
+                "is_completed": False,
+                "due_date": due_date(anchor, offset, service.start_time, service.end_time),
+            })
+    if rows:
+        db.execute(insert(Task), rows)
+    return len(rows)
+
+
+def reschedule_tasks(db: Session, service) -> int:
+    """Move the open template tasks of ``service`` to its current dates, without committing."""
+    due_dates = {
+        template_id: due_date(anchor, offset, service.start_time, service.end_time)
+        for template_id, _, _, anchor, offset in templates_for(db, service.service_type_id)
+    }
+    if not due_dates:
+        return 0
+    result = db.execute(
+        update(Task)
+        .where(
+            Task.service_id == service.id,
+            Task.template_id.in_(due_dates),
+            Task.is_completed == False,
+            Task.deleted_at.is_(None)
+        )
+        .values(due_date=case(due_dates, value=Task.template_id), updated_at=datetime.utcnow()),
+        execution_options={"synchronize_session": False}
+    )
+    return result.rowcount
@@ -1,6 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.throttling import LoadSheddingMiddleware
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.context import RequestContextMiddleware
+from app.core.compression import CompressionMiddleware
+from app.db.audit import audit_queue
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -8,6 +13,28 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
+# Make the route and caller available to diagnostics and session hooks
+app.add_middleware(RequestContextMiddleware)
+
+# Replay responses for retried POSTs that carry an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware, prefix=settings.API_V1_STR)
+
+# Shed load before requests queue up on the database pool
+app.add_middleware(
+    LoadSheddingMiddleware,
+    max_in_flight=settings.LOAD_SHED_MAX_IN_FLIGHT,
+    max_pool_wait_ms=settings.LOAD_SHED_MAX_POOL_WAIT_MS,
+)
+
+# Compress large JSON responses
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    cache_size=settings.COMPRESSION_CACHE_SIZE,
+)
+
 # Set all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
@@ -21,6 +48,15 @@ app.add_middleware(
 from app.api.api_v1.api import api_router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+def replay_audit_log():
+    # Entries a previous process could not write before it stopped
+    audit_queue.replay()
+
+@app.on_event("shutdown")
+def flush_audit_log():
+    audit_queue.close()
+
 @app.get("/")
 def root():
     return {"message": "Welcome to BuddyBoard API"} 
\ No newline at end of file
@@ -1,10 +1,30 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import AfterValidator, BaseModel, ValidationInfo, field_validator
+from datetime import datetime, timezone
+from typing import Annotated, Any, ClassVar, FrozenSet, Optional
+
+def naive_utc(value: datetime) -> datetime:
+    """``value`` as the naive UTC datetime the database stores; naive values are taken to be UTC."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+# A datetime accepted with or without an offset and stored as naive UTC
+UTCDatetime = Annotated[datetime, AfterValidator(naive_utc)]
 
 class TimestampModel(BaseModel):
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class UpdateModel(BaseModel):
+    """Partial update: fields left out are unchanged, and only ``nullable`` ones may be set to null."""
+    nullable: ClassVar[FrozenSet[str]] = frozenset()
+
+    @field_validator("*")
+    @classmethod
+    def reject_null(cls, value: Any, info: ValidationInfo) -> Any:
+        if value is None and info.field_name not in cls.nullable:
+            raise ValueError("may not be null")
+        return value
@@ -1,7 +1,8 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
-from .base import TimestampModel
+from typing import Any, Dict, Optional, List
+from datetime import date, datetime
+from app.db.models import TaskAnchor
+from .base import TimestampModel, UpdateModel, UTCDatetime
 
 # User schemas
 class UserBase(BaseModel):
@@ -11,6 +12,11 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserUpdate(UpdateModel):
+    email: Optional[EmailStr] = None
+    full_name: Optional[str] = None
+    password: Optional[str] = None
+
 class User(UserBase, TimestampModel):
     id: int
     is_active: bool
@@ -29,6 +35,12 @@ class CustomerBase(BaseModel):
 class CustomerCreate(CustomerBase):
     pass
 
+class CustomerUpdate(UpdateModel):
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+
 class Customer(CustomerBase, TimestampModel):
     id: int
 
@@ -55,10 +67,10 @@ class ServiceBase(BaseModel):
     customer_id: int
     service_provider_id: int
     service_type: str
-    start_date: datetime
-    end_date: datetime
-    start_time: datetime
-    end_time: datetime
+    start_date: UTCDatetime
+    end_date: UTCDatetime
+    start_time: UTCDatetime
+    end_time: UTCDatetime
     total_price: float
     notes: Optional[str] = None
     handled_by: str
@@ -66,12 +78,73 @@ class ServiceBase(BaseModel):
 class ServiceCreate(ServiceBase):
     pass
 
+class ServiceUpdate(UpdateModel):
+    nullable = frozenset({"notes"})
+
+    customer_id: Optional[int] = None
+    service_provider_id: Optional[int] = None
+    service_type: Optional[str] = None
+    start_date: Optional[UTCDatetime] = None
+    end_date: Optional[UTCDatetime] = None
+    start_time: Optional[UTCDatetime] = None
+    end_time: Optional[UTCDatetime] = None
+    total_price: Optional[float] = None
+    notes: Optional[str] = None
+    handled_by: Optional[str] = None
+
 class Service(ServiceBase, TimestampModel):
     id: int
+    series_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+# Recurring booking schemas
+class ServiceSeriesCreate(ServiceBase):
+    rrule: str
+
+class ServiceSeries(ServiceBase, TimestampModel):
+    id: int
+    rrule: str
+    materialized_until: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class ServiceSeriesResult(BaseModel):
+    series: ServiceSeries
+    created: int
+    skipped: List[datetime] = []
+
+class ProviderSuggestion(BaseModel):
+    provider_id: int
+    name: Optional[str] = None
+    # Has served the requested service type before (always true without one)
+    qualified: bool = True
+    # Most bookings the provider already has at once during the window
+    concurrent: int
+    booked_minutes: int
+    # Minutes booked over the days the window spans
+    day_minutes: int
+
+# Customer history schemas
+class CustomerHistory(BaseModel):
+    customer_id: int
+    # Over the bookings that were not deleted and have started, archived ones included
+    visit_count: int
+    lifetime_spend: float
+    first_visit: Optional[datetime] = None
+    last_visit: Optional[datetime] = None
+    # Bookings that have not started yet
+    upcoming_count: int = 0
+    next_visit: Optional[datetime] = None
+    # Average days from one visit to the next
+    days_between_visits: Optional[float] = None
+    bookings: List[Service]
+    # Pass as before_start and before_id to get the next page; unset on the last one
+    next_before_start: Optional[datetime] = None
+    next_before_id: Optional[int] = None
+
 # Task schemas
 class TaskBase(BaseModel):
     service_id: int
@@ -83,8 +156,35 @@ class TaskBase(BaseModel):
 class TaskCreate(TaskBase):
     pass
 
+class TaskUpdate(UpdateModel):
+    nullable = frozenset({"description"})
+
+    service_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    is_completed: Optional[bool] = None
+    due_date: Optional[datetime] = None
+
 class Task(TaskBase, TimestampModel):
     id: int
+    template_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+# Task template schemas
+class TaskTemplateBase(BaseModel):
+    service_type: str
+    title: str
+    description: Optional[str] = None
+    anchor: TaskAnchor = TaskAnchor.START
+    offset_minutes: int = 0
+
+class TaskTemplateCreate(TaskTemplateBase):
+    pass
+
+class TaskTemplate(TaskTemplateBase, TimestampModel):
+    id: int
 
     class Config:
         from_attributes = True
@@ -104,4 +204,134 @@ class Notification(NotificationBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class NotificationBroadcast(BaseModel):
+    title: str
+    message: str
+    role: Optional[str] = None
+    user_ids: Optional[List[int]] = None
+
+class NotificationBroadcastResult(BaseModel):
+    recipients: int
+
+# Sync schemas
+class SyncTombstone(BaseModel):
+    entity: str
+    id: int
+    deleted_at: datetime
+
+class SyncResponse(BaseModel):
+    token: str
+    customers: List[Customer] = []
+    services: List[Service] = []
+    tasks: List[Task] = []
+    deleted: List[SyncTombstone] = []
+    has_more: bool = False
+
+# Dashboard schemas
+class DashboardBooking(Service):
+    customer_name: Optional[str] = None
+
+class DashboardKPIs(BaseModel):
+    active_stays: int
+    check_ins: int
+    check_outs: int
+    revenue_today: float
+    tasks_due_today: int
+    overdue_tasks: int
+
+class DashboardToday(BaseModel):
+    date: datetime
+    check_ins: List[DashboardBooking]
+    check_outs: List[DashboardBooking]
+    overdue_tasks: List[Task]
+    unread_notifications: int
+    kpis: DashboardKPIs
+
+# Calendar schemas
+class CalendarDay(BaseModel):
+    date: date
+    total: int
+    by_type: Dict[str, int]
+    occupancy: Optional[float] = None
+
+class ServiceCalendar(BaseModel):
+    start: date
+    end: date
+    capacity: Optional[int] = None
+    days: List[CalendarDay]
+
+# Background job schemas
+class JobCreate(BaseModel):
+    name: str
+    payload: Dict[str, Any] = {}
+    priority: int = 0
+
+class Job(BaseModel):
+    id: int
+    name: str
+    payload: Optional[Dict[str, Any]] = None
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    progress: Optional[float] = None
+    progress_message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    run_at: datetime
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Audit log schemas
+class AuditEntry(BaseModel):
+    id: int
+    entity: str
+    entity_id: Optional[int] = None
+    action: str
+    changes: Optional[Dict[str, Any]] = None
+    actor: Optional[str] = None
+    route: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Cross-branch report schemas
+class TenantSummary(BaseModel):
+    tenant: str
+    customers: int = 0
+    bookings: int = 0
+    revenue: float = 0.0
+    open_tasks: int = 0
+    error: Optional[str] = None
+
+class TenantReport(BaseModel):
+    start: datetime
+    end: datetime
+    tenants: List[TenantSummary]
+    totals: TenantSummary
+
+# Batch request schemas
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    # Path below the API prefix, with an optional query string
+    path: str
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class BatchItemResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchItemResult]
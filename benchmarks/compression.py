@@ -0,0 +1,106 @@
+"""Measure CPU time against bytes saved for response compression.
+
+Compresses JSON list payloads shaped like ``read_services`` responses at a
+few sizes with each gzip level and, when the optional ``brotli`` package is
+installed, each brotli quality::
+
+    python -m benchmarks.compression --output compression.json
+"""
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+GZIP_LEVELS = [1, 6, 9]
+BROTLI_QUALITIES = [1, 4, 9]
+
+
+def payload(target_size: int) -> bytes:
+    """A JSON list of service records at least ``target_size`` bytes long."""
+    start = datetime(2026, 1, 1)
+    services = []
+    body = b"[]"
+    while len(body) < target_size:
+        day = start + timedelta(days=len(services))
+        services.extend({
+            "id": len(services) + i,
+            "customer_id": 1000 + (len(services) + i) * 7 % 997,
+            "service_provider_id": 1 + i % 40,
+            "service_type": ("boarding", "daycare", "grooming")[i % 3],
+            "start_date": day.isoformat(),
+            "end_date": (day + timedelta(days=2)).isoformat(),
+            "start_time": day.replace(hour=9).isoformat(),
+            "end_time": (day + timedelta(days=2)).replace(hour=17).isoformat(),
+            "total_price": 45.0 + i,
+            "notes": None,
+            "handled_by": "Front desk",
+            "created_at": day.isoformat(),
+            "updated_at": day.isoformat(),
+        } for i in range(10))
+        body = json.dumps(services).encode()
+    return body
+
+
+def measure(name: str, compress, body: bytes, repeat: int) -> dict:
+    compressed = compress(body)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        compress(body)
+    elapsed = (time.perf_counter() - started) / repeat
+    return {
+        "codec": name,
+        "input_bytes": len(body),
+        "output_bytes": len(compressed),
+        "ratio": round(len(body) / len(compressed), 2),
+        "cpu_ms": round(elapsed * 1000, 3),
+        "mb_per_s": round(len(body) / elapsed / 1_000_000, 1),
+    }
+
+
+def run(sizes: List[int], repeat: int) -> List[dict]:
+    results = []
+    for size in sizes:
+        body = payload(size)
+        for level in GZIP_LEVELS:
+            results.append(measure(
+                f"gzip-{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0),
+                body, repeat
+            ))
+        if brotli is not None:
+            for quality in BROTLI_QUALITIES:
+                results.append(measure(
+                    f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality),
+                    body, repeat
+                ))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES, help="payload sizes in bytes")
+    parser.add_argument("--repeat", type=int, default=20, help="compressions per measurement")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    print(f"{'codec':<8} {'input':>10} {'output':>10} {'ratio':>7} {'cpu ms':>9} {'MB/s':>8}")
+    for row in results:
+        print(
+            f"{row['codec']:<8} {row['input_bytes']:>10} {row['output_bytes']:>10} "
+            f"{row['ratio']:>7} {row['cpu_ms']:>9} {row['mb_per_s']:>8}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
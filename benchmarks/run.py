@@ -0,0 +1,220 @@
+"""Drive the API v1 routers in-process and record latency and SQL counts.
+
+Run against a database prepared with ``benchmarks.seed``::
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.run --output results.json
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.run --baseline results.json --threshold 0.15
+
+With ``--baseline`` the run fails (exit code 1) when any scenario's p50,
+p99 or SQL count per request is worse than the baseline by more than the
+threshold fraction.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Benchmarks measure the endpoints, not the throttling in front of them
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from sqlalchemy import event, func, select
+
+from app.core.config import settings
+from app.db.models import Customer, Notification, Service, ServiceProvider, Task, User
+from app.db.session import SessionLocal, engine
+from app.main import app
+from benchmarks.seed import BENCH_PASSWORD
+
+API = settings.API_V1_STR
+# (name, method, path factory, body factory)
+Scenario = Tuple[str, str, Callable[[random.Random], str], Optional[Callable[[random.Random], dict]]]
+
+
+class SQLCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+def _max_ids() -> Dict[str, int]:
+    with SessionLocal() as db:
+        return {
+            model.__tablename__: db.execute(select(func.max(model.id))).scalar() or 1
+            for model in (User, Customer, ServiceProvider, Service, Task, Notification)
+        }
+
+
+def scenarios(ids: Dict[str, int]) -> List[Scenario]:
+    def pick(table: str) -> Callable[[random.Random], int]:
+        return lambda rng: rng.randint(1, ids[table])
+
+    customer, service, task = pick("customers"), pick("services"), pick("tasks")
+
+    def service_body(rng: random.Random) -> dict:
+        start = datetime.utcnow() + timedelta(days=rng.randint(1, 90))
+        return {
+            "customer_id": customer(rng),
+            "service_provider_id": pick("service_providers")(rng),
+            "service_type": "daycare",
+            "start_date": start.isoformat(),
+            "end_date": start.isoformat(),
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=8)).isoformat(),
+            "total_price": 45.0,
+            "handled_by": "Staff 0",
+        }
+
+    return [
+        ("auth.me", "GET", lambda rng: f"{API}/auth/me", None),
+        ("users.list", "GET", lambda rng: f"{API}/users/", None),
+        ("users.get", "GET", lambda rng: f"{API}/users/1", None),
+        ("customers.list", "GET", lambda rng: f"{API}/customers/?skip={rng.randrange(1000)}", None),
+        ("customers.get", "GET", lambda rng: f"{API}/customers/{customer(rng)}", None),
+        ("customers.create", "POST", lambda rng: f"{API}/customers/", lambda rng: {
+            "name": "Bench Customer", "email": "bench@example.com", "phone": "5550000000", "address": "1 Bench Way"
+        }),
+        ("customers.history", "GET", lambda rng: f"{API}/customers/{customer(rng)}/history", None),
+        ("customers.patch", "PATCH", lambda rng: f"{API}/customers/{customer(rng)}", lambda rng: {
+            "phone": f"555{rng.randrange(10**7):07d}"
+        }),
+        ("services.list", "GET", lambda rng: f"{API}/services/?skip={rng.randrange(1000)}", None),
+        ("services.get", "GET", lambda rng: f"{API}/services/{service(rng)}", None),
+        ("services.upcoming", "GET", lambda rng: f"{API}/services/upcoming/?days=3", None),
+        ("services.create", "POST", lambda rng: f"{API}/services/", service_body),
+        ("services.patch", "PATCH", lambda rng: f"{API}/services/{service(rng)}", lambda rng: {
+            "notes": f"Updated {rng.random()}"
+        }),
+        ("tasks.list", "GET", lambda rng: f"{API}/tasks/?skip={rng.randrange(1000)}", None),
+        ("tasks.get", "GET", lambda rng: f"{API}/tasks/{task(rng)}", None),
+        ("tasks.pending", "GET", lambda rng: f"{API}/tasks/pending/", None),
+        ("tasks.complete", "PUT", lambda rng: f"{API}/tasks/{task(rng)}/complete", None),
+        ("notifications.list", "GET", lambda rng: f"{API}/notifications/", None),
+        ("notifications.unread", "GET", lambda rng: f"{API}/notifications/unread/", None),
+        ("notifications.create", "POST", lambda rng: f"{API}/notifications/", lambda rng: {
+            "user_id": 1, "title": "Bench", "message": "Benchmark notification"
+        }),
+    ]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    counter: SQLCounter,
+    scenario: Scenario,
+    requests: int,
+    rng: random.Random
+) -> dict:
+    name, method, path, body = scenario
+    latencies = []
+    errors = 0
+    sql_before = counter.count
+    started = time.perf_counter()
+    for _ in range(requests):
+        kwargs = {"json": body(rng)} if body else {}
+        request_started = time.perf_counter()
+        response = await client.request(method, path(rng), **kwargs)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        if response.status_code >= 400 and response.status_code != 404:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "sql_per_request": round((counter.count - sql_before) / requests, 2),
+    }
+
+
+async def run(requests: int, warmup: int, only: Optional[List[str]], random_seed: int) -> dict:
+    counter = SQLCounter()
+    rng = random.Random(random_seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post(
+            f"{API}/auth/login",
+            data={"username": "staff0@bench.buddyboard.com", "password": BENCH_PASSWORD}
+        )
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+        results = {}
+        for scenario in scenarios(_max_ids()):
+            if only and scenario[0] not in only:
+                continue
+            if warmup:
+                await run_scenario(client, counter, scenario, warmup, rng)
+            results[scenario[0]] = await run_scenario(client, counter, scenario, requests, rng)
+            print(f"{scenario[0]:<24} {json.dumps(results[scenario[0]])}")
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "database": engine.url.get_backend_name(),
+            "python": platform.python_version(),
+            "requests_per_scenario": requests,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Return a description of every metric that regressed by more than ``threshold``."""
+    regressions = []
+    for name, metrics in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p99_ms", "sql_per_request"):
+            if base[metric] and metrics[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}.{metric}: {base[metric]} -> {metrics[metric]} "
+                    f"(+{(metrics[metric] / base[metric] - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--seed", type=int, default=7, help="random seed for request parameters")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed regression as a fraction")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.warmup, args.only, args.seed))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Seed the configured database with synthetic BuddyBoard data.
+
+Volumes at ``--scale 1`` are 500k customers, 1M services, 5M tasks and 10M
+notifications. Customer, provider and user activity follow a power law
+so a few hot rows get most of the traffic, as in production::
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.seed --scale 0.01
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterator
+
+from sqlalchemy import insert
+
+from app.core.security import get_password_hash
+from app.db.customer_stats import rebuild
+from app.db.models import Customer, Notification, Service, ServiceProvider, ServiceType, Task, User, UserRole
+from app.db.session import SessionLocal, create_tables
+
+VOLUMES = {
+    "users": 500,
+    "service_providers": 2_000,
+    "customers": 500_000,
+    "services": 1_000_000,
+    "tasks": 5_000_000,
+    "notifications": 10_000_000,
+}
+SERVICE_TYPES = [("boarding", 0.45), ("daycare", 0.4), ("grooming", 0.15)]
+TASK_TITLES = ["Feed", "Walk", "Medication", "Play time", "Clean kennel", "Photo update", "Check-out prep"]
+CHUNK_SIZE = 10_000
+BENCH_PASSWORD = "benchmark"
+
+
+def skewed_id(rng: random.Random, count: int, skew: float = 3.0) -> int:
+    """Pick an id in 1..count, heavily favouring low ids (power-law distributed)."""
+    return 1 + int(count * rng.random() ** skew)
+
+
+def users(rng: random.Random, count: int) -> Iterator[dict]:
+    hashed = get_password_hash(BENCH_PASSWORD)
+    now = datetime.utcnow()
+    for i in range(count):
+        yield {
+            "email": f"staff{i}@bench.buddyboard.com",
+            "hashed_password": hashed,
+            "full_name": f"Staff {i}",
+            "role": UserRole.ADMIN if i == 0 else UserRole.STAFF,
+            "is_active": rng.random() > 0.05,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def providers(rng: random.Random, count: int) -> Iterator[dict]:
+    now = datetime.utcnow()
+    for i in range(count):
+        yield {
+            "name": f"Provider {i}",
+            "email": f"provider{i}@bench.buddyboard.com",
+            "phone": f"555{rng.randrange(10**7):07d}",
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def customers(rng: random.Random, count: int) -> Iterator[dict]:
+    now = datetime.utcnow()
+    for i in range(count):
+        created = now - timedelta(days=rng.randrange(3 * 365))
+        yield {
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": f"555{rng.randrange(10**7):07d}",
+            "address": f"{rng.randrange(1, 9999)} Main Street",
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def service_types() -> Iterator[dict]:
+    for service_type, _ in SERVICE_TYPES:
+        yield {"name": service_type}
+
+
+def services(rng: random.Random, count: int, n_customers: int, n_providers: int, n_users: int) -> Iterator[dict]:
+    now = datetime.utcnow()
+    types, weights = zip(*SERVICE_TYPES)
+    # Ids follow the insertion order of service_types() and users()
+    type_ids = {service_type: i + 1 for i, service_type in enumerate(types)}
+    for _ in range(count):
+        service_type = rng.choices(types, weights)[0]
+        start = now + timedelta(days=rng.randint(-730, 180), hours=rng.randint(7, 10))
+        if service_type == "boarding":
+            end = start + timedelta(days=rng.randint(1, 14))
+        elif service_type == "daycare":
+            end = start + timedelta(hours=rng.randint(4, 10))
+        else:
+            end = start + timedelta(hours=rng.randint(1, 3))
+        yield {
+            "customer_id": skewed_id(rng, n_customers),
+            "service_provider_id": skewed_id(rng, n_providers),
+            "service_type_id": type_ids[service_type],
+            "start_date": start.replace(hour=0),
+            "end_date": end.replace(hour=0),
+            "start_time": start,
+            "end_time": end,
+            "total_price": round(rng.uniform(20, 80) * max(1, (end - start).days), 2),
+            "notes": None if rng.random() < 0.7 else "Needs extra attention",
+            "handled_by_id": 1 + rng.randrange(min(20, n_users)),
+            "created_at": start - timedelta(days=rng.randint(1, 60)),
+            "updated_at": start - timedelta(days=rng.randint(0, 1)),
+        }
+
+
+def tasks(rng: random.Random, count: int, n_services: int) -> Iterator[dict]:
+    now = datetime.utcnow()
+    for _ in range(count):
+        due = now + timedelta(days=rng.randint(-730, 180), hours=rng.randint(0, 23))
+        yield {
+            "service_id": rng.randint(1, n_services),
+            "title": rng.choice(TASK_TITLES),
+            "description": None,
+            "is_completed": due < now and rng.random() < 0.95,
+            "due_date": due,
+            "created_at": due - timedelta(days=1),
+            "updated_at": due,
+        }
+
+
+def notifications(rng: random.Random, count: int, n_users: int) -> Iterator[dict]:
+    now = datetime.utcnow()
+    for _ in range(count):
+        created = now - timedelta(minutes=rng.randrange(730 * 24 * 60))
+        yield {
+            "user_id": skewed_id(rng, n_users),
+            "title": "Booking update",
+            "message": "A booking you follow was updated.",
+            "is_read": created < now - timedelta(days=7) or rng.random() < 0.5,
+            "created_at": created,
+        }
+
+
+def load(db, model, rows: Iterator[dict], total: int, progress: Callable[[str], None]) -> None:
+    table = model.__table__
+    started = time.perf_counter()
+    batch = []
+    done = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            db.execute(insert(table), batch)
+            db.commit()
+            done += len(batch)
+            batch = []
+            progress(f"{table.name}: {done}/{total}")
+    if batch:
+        db.execute(insert(table), batch)
+        db.commit()
+        done += len(batch)
+    progress(f"{table.name}: {done} rows in {time.perf_counter() - started:.1f}s")
+
+
+def seed(scale: float = 1.0, random_seed: int = 42, progress: Callable[[str], None] = print) -> dict:
+    rng = random.Random(random_seed)
+    counts = {name: max(1, int(volume * scale)) for name, volume in VOLUMES.items()}
+    create_tables()
+    with SessionLocal() as db:
+        load(db, User, users(rng, counts["users"]), counts["users"], progress)
+        load(db, ServiceProvider, providers(rng, counts["service_providers"]), counts["service_providers"], progress)
+        load(db, Customer, customers(rng, counts["customers"]), counts["customers"], progress)
+        load(db, ServiceType, service_types(), len(SERVICE_TYPES), progress)
+        load(
+            db, Service,
+            services(rng, counts["services"], counts["customers"], counts["service_providers"], counts["users"]),
+            counts["services"], progress
+        )
+        started = time.perf_counter()
+        progress(f"customer_stats: {rebuild(db)} rows in {time.perf_counter() - started:.1f}s")
+        load(db, Task, tasks(rng, counts["tasks"], counts["services"]), counts["tasks"], progress)
+        load(
+            db, Notification,
+            notifications(rng, counts["notifications"], counts["users"]),
+            counts["notifications"], progress
+        )
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of the full data volume to generate")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for reproducible data")
+    args = parser.parse_args()
+    seed(args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
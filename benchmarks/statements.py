@@ -0,0 +1,126 @@
+"""Measure the Python-side cost of the hot lookups, per statement style.
+
+Runs each lookup of ``app.db.repository`` against an in-memory SQLite
+database, where the query itself is nearly free, so the time is dominated by
+building, caching and executing the statement in Python. Each lookup is
+timed in three forms: the legacy ``db.query(...).filter(...)`` the endpoints
+used before, a ``lambda_stmt`` and the repository's pre-built statement::
+
+    python -m benchmarks.statements --output statements.json
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine, insert, lambda_stmt, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.models import Customer, Notification, Service, User
+from app.db.repository import get_by_id, get_user_by_email, list_unread_notifications
+from app.db.session import Base
+
+
+def database() -> Session:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"} for i in range(1, 101)
+        ])
+        conn.execute(insert(Customer), [{"name": f"Customer {i}", "email": f"c{i}@example.com"} for i in range(1, 101)])
+        conn.execute(insert(Service), [{"customer_id": i, "service_type_id": 1} for i in range(1, 101)])
+        conn.execute(insert(Notification), [
+            {"user_id": 1 + i % 100, "title": "t", "message": "m", "is_read": i % 3 == 0} for i in range(1000)
+        ])
+    return sessionmaker(bind=engine)()
+
+
+def lookups(db: Session) -> Dict[str, Dict[str, Callable[[int], object]]]:
+    """lookup -> style -> function of an id in 1..100."""
+    def user_by_email_lambda(i: int):
+        # Values inside a lambda_stmt must be plain closure variables
+        email = f"user{i}@example.com"
+        return db.execute(
+            lambda_stmt(lambda: select(User).where(User.email == email).limit(1))
+        ).scalars().first()
+
+    return {
+        "customer by id": {
+            "query": lambda i: db.query(Customer).filter(Customer.id == i).first(),
+            "lambda_stmt": lambda i: db.execute(
+                lambda_stmt(lambda: select(Customer).where(Customer.id == i))
+            ).scalars().first(),
+            "repository": lambda i: get_by_id(db, Customer, i),
+        },
+        "live service by id": {
+            "query": lambda i: db.query(Service).filter(Service.id == i, Service.deleted_at.is_(None)).first(),
+            "lambda_stmt": lambda i: db.execute(
+                lambda_stmt(lambda: select(Service).where(Service.id == i, Service.deleted_at.is_(None)))
+            ).scalars().first(),
+            "repository": lambda i: get_by_id(db, Service, i),
+        },
+        "user by email": {
+            "query": lambda i: db.query(User).filter(User.email == f"user{i}@example.com").first(),
+            "lambda_stmt": user_by_email_lambda,
+            "repository": lambda i: get_user_by_email(db, f"user{i}@example.com"),
+        },
+        "unread notifications": {
+            "query": lambda i: db.query(Notification).filter(
+                Notification.user_id == i,
+                Notification.is_read == False,
+                Notification.deleted_at.is_(None)
+            ).all(),
+            "lambda_stmt": lambda i: db.execute(lambda_stmt(lambda: select(Notification).where(
+                Notification.user_id == i,
+                Notification.is_read == False,
+                Notification.deleted_at.is_(None)
+            ))).scalars().all(),
+            "repository": lambda i: list_unread_notifications(db, i),
+        },
+    }
+
+
+def measure(lookup: Callable[[int], object], db: Session, repeat: int) -> float:
+    """Mean microseconds per call; the identity map is cleared so every call loads its rows."""
+    lookup(1)
+    started = time.perf_counter()
+    for n in range(repeat):
+        lookup(1 + n % 100)
+        db.expunge_all()
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+def run(repeat: int) -> List[dict]:
+    db = database()
+    results = []
+    for name, styles in lookups(db).items():
+        timings = {style: measure(lookup, db, repeat) for style, lookup in styles.items()}
+        for style, us in timings.items():
+            results.append({
+                "lookup": name,
+                "style": style,
+                "us_per_call": round(us, 1),
+                "vs_query": round(us / timings["query"], 2),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5000, help="calls per measurement")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(f"{'lookup':<22} {'style':<12} {'us/call':>9} {'vs query':>9}")
+    for row in results:
+        print(f"{row['lookup']:<22} {row['style']:<12} {row['us_per_call']:>9} {row['vs_query']:>9}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()